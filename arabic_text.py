@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+أدوات تطبيع النص العربي المشتركة بين أنظمة مطابقة الرسائل
+"""
+
+# التطويل والتشكيل وعلامات القرآن التي لا تغير الكلمة عند المطابقة
+_STRIPPED = (
+    [0x0640]                        # التطويل ـ
+    + list(range(0x0610, 0x061B))   # علامات فوق الحروف
+    + list(range(0x064B, 0x0660))   # الحركات والتنوين والشدة والسكون
+    + [0x0670]                      # الألف الخنجرية
+    + list(range(0x06D6, 0x06DD))   # علامات الوقف
+    + list(range(0x06DF, 0x06E9))
+    + list(range(0x06EA, 0x06EE))
+)
+_TABLE = dict.fromkeys(_STRIPPED)
+
+def strip_arabic_marks(text: str) -> str:
+    """حذف التطويل والتشكيل فقط دون تغيير حالة الأحرف
+    
+    آمن على التعبيرات النمطية لأن الأحرف المحذوفة ليست من رموزها الخاصة، بخلاف
+    casefold الذي يحول \\S إلى \\s مثلاً.
+    """
+    return text.translate(_TABLE)
+
+def normalize_arabic(text: str) -> str:
+    """حذف التطويل والتشكيل وتوحيد حالة الأحرف اللاتينية"""
+    return strip_arabic_marks(text).casefold()
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+نظام الردود التلقائية في المجموعات
+يُجمّع محفزات كل مجموعة (مطابقة تامة، بادئة، تعبير نمطي) من groups.auto_responses في مطابق واحد
+"""
+
+import re
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import config
+from arabic_text import normalize_arabic, strip_arabic_marks
+from shortcuts import ShortcutTrie
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# أنواع المحفزات المدعومة بترتيب أولويتها
+TRIGGER_TYPES = ('exact', 'prefix', 'regex')
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+
+def _subpatterns(value):
+    """الأنماط الفرعية داخل معامل عقدة في شجرة التعبير (مجموعات، بدائل، تأكيدات)"""
+    if isinstance(value, sre_parse.SubPattern):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _subpatterns(item)
+
+def has_nested_quantifier(pattern: str) -> bool:
+    """هل في التعبير تكرار داخل تكرار مثل (a+)+ أو (a*b?)*
+    
+    هذا الشكل هو مصدر التراجع الأسي في محرك re، فيُرفض في محفزات المستخدمين.
+    لا يكشف كل التعبيرات البطيئة (مثل بدائل متداخلة داخل تكرار)، لذا تبقى المطابقة
+    في خيوط منفصلة بمهلة.
+    """
+    def visit(parsed, inside_repeat: bool) -> bool:
+        for op, value in parsed:
+            repeats = op in _REPEATS and value[1] > 1
+            if repeats and inside_repeat:
+                return True
+            if any(visit(sub, inside_repeat or repeats) for sub in _subpatterns(value)):
+                return True
+        return False
+    
+    return visit(sre_parse.parse(pattern), False)
+
+def compile_trigger(pattern: str):
+    """ترجمة تعبير محفز كما يُطابق، أو None إن كان غير صالح أو بتكرار متداخل"""
+    try:
+        if has_nested_quantifier(pattern):
+            return None
+        return re.compile(pattern, re.IGNORECASE)
+    except (re.error, RecursionError):
+        return None
+
+class ResponseMatcher:
+    """مطابق الردود لمجموعة واحدة
+    
+    المطابقة التامة بحث في قاموس، والبادئات شجرة بادئات، والتعبيرات النمطية بلا مجموعات
+    مدمجة في تعبير واحد بمجموعات مسماة يُفحص به أول AUTO_RESPONSE_SCAN_CHARS حرف فقط.
+    التعبيرات ذات المجموعات تبقى منفصلة لأن الدمج يعيد ترقيم مجموعاتها فيغير معنى
+    المراجع الخلفية مثل \\1، وتُفحص بترتيبها بعد التعبير المدمج.
+    التعبيرات لا تُطبع بـ normalize_arabic لأن casefold يغير معنى رموزها (\\S و\\W)؛
+    يُحذف التشكيل من النمط والنص معاً وتُتجاهل حالة الأحرف بـ re.IGNORECASE.
+    """
+    
+    def __init__(self, responses: Dict):
+        self.exact = {}
+        self.prefixes = ShortcutTrie()
+        self.regex = None
+        self.separate_regex = []
+        self._regex_responses = {}
+        self.size = 0
+        
+        for trigger_type in TRIGGER_TYPES:
+            for pattern, response in (responses.get(trigger_type) or {}).items():
+                if self.size >= config.MAX_AUTO_RESPONSES_PER_GROUP:
+                    break
+                self._add(trigger_type, pattern, response)
+        
+        # المفاتيح الأخرى في الجذر تُعامل كمطابقة تامة (الصيغة البسيطة {"المحفز": "الرد"})
+        for pattern, response in responses.items():
+            if pattern not in TRIGGER_TYPES and isinstance(response, str):
+                if self.size >= config.MAX_AUTO_RESPONSES_PER_GROUP:
+                    break
+                self._add('exact', pattern, response)
+        
+        self._compile_regex()
+        
+        # قياسات زمن المطابقة
+        self.checks = 0
+        self.matches = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+    
+    def _add(self, trigger_type: str, pattern: str, response: str):
+        if trigger_type == 'exact':
+            self.exact[normalize_arabic(pattern).strip()] = response
+        elif trigger_type == 'prefix':
+            self.prefixes.insert(normalize_arabic(pattern).strip(), (self.size, response))
+        elif len(self._regex_responses) < config.MAX_AUTO_RESPONSE_REGEX:
+            pattern = strip_arabic_marks(pattern)
+            compiled = compile_trigger(pattern)
+            if compiled is None:
+                logging.warning(f"تعبير نمطي غير صالح أو بتكرار متداخل في الردود التلقائية: {pattern!r}")
+                return
+            self._regex_responses[f'r{len(self._regex_responses)}'] = (compiled, response)
+        else:
+            return
+        self.size += 1
+    
+    def _compile_regex(self):
+        """دمج التعبيرات التي بلا مجموعات في تعبير واحد، وإبقاء البقية منفصلة
+        
+        إن تعارضت التعبيرات عند الدمج (علامات مضمنة مثلاً) تبقى كلها منفصلة.
+        """
+        mergeable = {name: (compiled, response) for name, (compiled, response) in self._regex_responses.items()
+                     if not compiled.groups}
+        self.separate_regex = [(compiled, response) for name, (compiled, response) in self._regex_responses.items()
+                               if name not in mergeable]
+        if not mergeable:
+            return
+        combined = '|'.join(f'(?P<{name}>{compiled.pattern})' for name, (compiled, _) in mergeable.items())
+        try:
+            self.regex = re.compile(combined, re.IGNORECASE)
+        except re.error:
+            self.separate_regex = list(self._regex_responses.values())
+    
+    def match(self, text: str) -> Optional[str]:
+        """الرد المناسب للرسالة، أو None"""
+        started = time.perf_counter()
+        normalized = normalize_arabic(text).strip()
+        response = self.exact.get(normalized)
+        if response is None:
+            found = self.prefixes.match(normalized)
+            if found is not None:
+                response = found[1][1]
+        if response is None and self._regex_responses:
+            window = strip_arabic_marks(text.strip()[:config.AUTO_RESPONSE_SCAN_CHARS])
+            if self.regex is not None:
+                found = self.regex.search(window)
+                if found is not None:
+                    response = self._regex_responses[found.lastgroup][1]
+            if response is None:
+                response = next((reply for pattern, reply in self.separate_regex if pattern.search(window)), None)
+        
+        elapsed = time.perf_counter() - started
+        self.checks += 1
+        self.matches += response is not None
+        self.latency_total += elapsed
+        if elapsed > self.latency_max:
+            self.latency_max = elapsed
+        return response
+
+class MatchWorkers:
+    """خيوط مطابقة الرسائل بتعبيرات المستخدمين، منفصلة عن خيوط قاعدة البيانات
+    
+    تعبير نمطي بدأ لا يمكن مقاطعته في Python، لذا الخيوط daemon حتى لا يمنع فحص عالق
+    إيقاف البوت، ويمكن إضافة خيط بديل عن كل خيط عالق حتى max_extra خيطاً إضافياً.
+    """
+    
+    def __init__(self, workers: int = config.MATCH_EXECUTOR_WORKERS,
+                 max_extra: int = config.MATCH_MAX_EXTRA_WORKERS, name: str = 'hina-match'):
+        self.name = name
+        self.max_threads = workers + max_extra
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._threads = []
+        for _ in range(workers):
+            self.add_worker()
+    
+    def add_worker(self) -> bool:
+        """إضافة خيط مطابقة، وتعيد False عند بلوغ الحد"""
+        with self._lock:
+            if len(self._threads) >= self.max_threads:
+                return False
+            thread = threading.Thread(target=self._run, name=f'{self.name}-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+        thread.start()
+        return True
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, func, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+    
+    def submit(self, func, *args) -> Future:
+        future = Future()
+        self._queue.put((future, func, args))
+        return future
+    
+    def shutdown(self):
+        """إيقاف الخيوط بعد إنهاء ما في الطابور، دون انتظار خيط عالق"""
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+
+class AutoResponder:
+    """مطابقات الردود لكل مجموعة، تُبنى عند أول رسالة وتُسقط عند تعديل الردود"""
+    
+    def __init__(self, manager):
+        self.manager = manager
+        self._matchers = {}
+        self._generations = {}
+        self._running = {}  # خيط المطابقة -> [المجموعة، بدء المطابقة، هل أُوقفت بسببها]
+        self._lock = threading.Lock()
+    
+    def _matcher(self, group_id: int) -> Optional[ResponseMatcher]:
+        try:
+            return self._matchers[group_id]
+        except KeyError:
+            pass
+        # رقم الجيل يُقرأ قبل الردود: إن عُدلت أثناء البناء لا يُحفظ المطابق القديم
+        with self._lock:
+            generation = self._generations.get(group_id, 0)
+        matcher = ResponseMatcher(self.manager.get_group_auto_responses(group_id))
+        matcher = matcher if matcher.size else None
+        with self._lock:
+            if self._generations.get(group_id, 0) == generation:
+                self._matchers[group_id] = matcher
+        return matcher
+    
+    def suspend(self, group_id: int):
+        """إيقاف ردود المجموعة حتى يُعدّل أحد محفزاتها (بعد تجاوز مهلة المطابقة)"""
+        with self._lock:
+            self._suspend(group_id)
+    
+    def _suspend(self, group_id: int):
+        self._matchers[group_id] = None
+        self._generations[group_id] = self._generations.get(group_id, 0) + 1
+    
+    def is_suspended(self, group_id: int) -> bool:
+        """هل المجموعة بلا مطابق (موقفة أو بلا ردود)"""
+        return group_id in self._matchers and self._matchers[group_id] is None
+    
+    def suspend_overrunning(self, limit: float) -> List[int]:
+        """إيقاف المجموعات التي تجري مطابقتها منذ أكثر من limit ثانية، وتعيدها
+        
+        الزمن يُقاس داخل خيط المطابقة من بدء match نفسها، فلا يدخل فيه انتظار الطابور ولا
+        بناء المطابق من قاعدة البيانات، ولا تُوقف مجموعة لأن مجموعة أخرى حجزت الخيوط.
+        كل مجموعة تُعاد مرة واحدة لكل مطابقة عالقة.
+        """
+        now = time.monotonic()
+        suspended = []
+        with self._lock:
+            for running in self._running.values():
+                group_id, started, reported = running
+                if not reported and now - started > limit:
+                    running[2] = True
+                    self._suspend(group_id)
+                    suspended.append(group_id)
+        return suspended
+    
+    def respond(self, group_id: int, text: str) -> Optional[str]:
+        """الرد التلقائي لرسالة في مجموعة، أو None"""
+        matcher = self._matcher(group_id)
+        if matcher is None:
+            return None
+        key = threading.get_ident()
+        with self._lock:
+            self._running[key] = [group_id, time.monotonic(), False]
+        try:
+            return matcher.match(text)
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+    
+    def get_responses(self, group_id: int) -> Dict:
+        return self.manager.get_group_auto_responses(group_id)
+    
+    def set_response(self, group_id: int, trigger_type: str, pattern: str, response: str) -> bool:
+        """إضافة محفز أو تعديله، وتعيد False عند تجاوز الحد أو تعبير غير صالح أو بتكرار متداخل"""
+        if trigger_type == 'regex' and compile_trigger(strip_arabic_marks(pattern)) is None:
+            return False
+        responses = self.get_responses(group_id)
+        triggers = responses.setdefault(trigger_type, {})
+        total = sum(len(value) if isinstance(value, dict) else 1 for value in responses.values())
+        if pattern not in triggers and total >= config.MAX_AUTO_RESPONSES_PER_GROUP:
+            return False
+        if (trigger_type == 'regex' and pattern not in triggers
+                and len(triggers) >= config.MAX_AUTO_RESPONSE_REGEX):
+            return False
+        triggers[pattern] = response
+        return self._save(group_id, responses)
+    
+    def remove_response(self, group_id: int, pattern: str) -> bool:
+        """حذف محفز من كل الأنواع"""
+        responses = self.get_responses(group_id)
+        removed = responses.pop(pattern, None) is not None
+        for trigger_type in TRIGGER_TYPES:
+            removed |= (responses.get(trigger_type) or {}).pop(pattern, None) is not None
+        return removed and self._save(group_id, responses)
+    
+    def _save(self, group_id: int, responses: Dict) -> bool:
+        if not self.manager.set_group_auto_responses(group_id, responses):
+            return False
+        with self._lock:
+            self._matchers.pop(group_id, None)
+            self._generations[group_id] = self._generations.get(group_id, 0) + 1
+        return True
+    
+    def get_stats(self) -> Dict[int, Dict]:
+        """عدد المحفزات وزمن المطابقة لكل مجموعة"""
+        stats = {}
+        for group_id, matcher in list(self._matchers.items()):
+            if matcher is None:
+                continue
+            stats[group_id] = {
+                'triggers': matcher.size,
+                'checks': matcher.checks,
+                'matches': matcher.matches,
+                'latency_avg_us': matcher.latency_total / matcher.checks * 1e6 if matcher.checks else 0.0,
+                'latency_max_us': matcher.latency_max * 1e6,
+            }
+        return stats
+
+def format_responses(responses: Dict) -> List[str]:
+    """أسطر عرض الردود للمستخدم"""
+    labels = {'exact': '=', 'prefix': 'يبدأ بـ', 'regex': 'نمط'}
+    lines = []
+    for trigger_type in TRIGGER_TYPES:
+        for pattern, response in (responses.get(trigger_type) or {}).items():
+            lines.append(f"• [{labels[trigger_type]}] {pattern} ⟣ {response}")
+    for pattern, response in responses.items():
+        if pattern not in TRIGGER_TYPES and isinstance(response, str):
+            lines.append(f"• [=] {pattern} ⟣ {response}")
+    return lines
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+نظام الكلمات المحظورة في المجموعات
+آلة Aho-Corasick لكل مجموعة تُبنى من groups.banned_words وتُحفظ في الذاكرة حتى تتغير القائمة
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from arabic_text import normalize_arabic
+
+class AhoCorasick:
+    """آلة مطابقة متعددة الأنماط: فحص الرسالة يمر على أحرفها مرة واحدة مهما كان عدد الكلمات"""
+    
+    def __init__(self, terms: List[str]):
+        self.terms = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [-1]
+        for term in terms:
+            term = normalize_arabic(term).strip()
+            if term:
+                self._add(term)
+        self._build_failure_links()
+    
+    def _add(self, term: str):
+        state = 0
+        for char in term:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(-1)
+            state = next_state
+        if self._output[state] == -1:
+            self._output[state] = len(self.terms)
+            self.terms.append(term)
+    
+    def _build_failure_links(self):
+        """روابط الفشل بالعرض أولاً، مع وراثة المخرج من رابط الفشل"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                if self._output[next_state] == -1:
+                    self._output[next_state] = self._output[self._fail[next_state]]
+    
+    def __len__(self) -> int:
+        return len(self.terms)
+    
+    def search(self, text: str) -> Optional[str]:
+        """أول كلمة محظورة تظهر في النص بعد تطبيعه، أو None"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in normalize_arabic(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] != -1:
+                return self.terms[output[state]]
+        return None
+
+class BannedWordsFilter:
+    """آلات الكلمات المحظورة لكل مجموعة، تُبنى عند أول رسالة وتُعاد عند تغيير القائمة فقط"""
+    
+    def __init__(self, manager):
+        self.manager = manager
+        self._automata = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+    
+    def _automaton(self, group_id: int) -> Optional[AhoCorasick]:
+        try:
+            return self._automata[group_id]
+        except KeyError:
+            pass
+        # رقم الجيل يُقرأ قبل القائمة: إن تغيرت أثناء البناء لا تُحفظ الآلة القديمة
+        with self._lock:
+            generation = self._generations.get(group_id, 0)
+        automaton = AhoCorasick(self.manager.get_group_banned_words(group_id))
+        automaton = automaton if len(automaton) else None
+        with self._lock:
+            if self._generations.get(group_id, 0) == generation:
+                self._automata[group_id] = automaton
+            self.builds += 1
+        return automaton
+    
+    def check(self, group_id: int, text: str) -> Optional[str]:
+        """الكلمة المحظورة الموجودة في رسالة المجموعة، أو None"""
+        automaton = self._automaton(group_id)
+        return automaton.search(text) if automaton is not None else None
+    
+    def get_words(self, group_id: int) -> List[str]:
+        return self.manager.get_group_banned_words(group_id)
+    
+    def set_words(self, group_id: int, words: List[str]) -> bool:
+        """حفظ القائمة وإسقاط آلة المجموعة لتُبنى من جديد عند الرسالة التالية"""
+        if not self.manager.set_group_banned_words(group_id, words):
+            return False
+        with self._lock:
+            self._automata.pop(group_id, None)
+            self._generations[group_id] = self._generations.get(group_id, 0) + 1
+        return True
+    
+    def add_words(self, group_id: int, words: List[str]) -> bool:
+        current = self.get_words(group_id)
+        known = {normalize_arabic(word) for word in current}
+        return self.set_words(group_id, current + [word for word in words if normalize_arabic(word) not in known])
+    
+    def remove_words(self, group_id: int, words: List[str]) -> bool:
+        removed = {normalize_arabic(word) for word in words}
+        return self.set_words(group_id, [word for word in self.get_words(group_id)
+                                         if normalize_arabic(word) not in removed])
+    
+    def get_stats(self) -> Dict:
+        """عدد الآلات المبنية والكلمات فيها"""
+        automata = [automaton for automaton in list(self._automata.values()) if automaton is not None]
+        return {
+            'groups_cached': len(self._automata),
+            'groups_with_words': len(automata),
+            'terms': sum(len(automaton) for automaton in automata),
+            'builds': self.builds,
+        }
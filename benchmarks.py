@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+قياسات أداء مكونات بوت Hina-Bot
+الاستخدام: python benchmarks.py [اسم القياس ...]
+تعمل كل القياسات داخل مجلد مؤقت فلا تلمس قاعدة بيانات البوت الحقيقية.
+"""
+
+import sys
+import os
+import json
+import time
+import sqlite3
+import resource
+import tempfile
+import threading
+import multiprocessing
+
+# إضافة مجلد المشروع إلى مسار Python
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PROJECT_DIR)
+
+BENCHMARKS = {}
+
+def benchmark(name: str):
+    """تسجيل دالة قياس باسم معين"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+def enter_temp_dir() -> str:
+    """الانتقال إلى مجلد مؤقت حتى تُنشأ قاعدة البيانات والملفات داخله"""
+    path = tempfile.mkdtemp(prefix='hina-bench-')
+    os.chdir(path)
+    return path
+
+def peak_rss_kb() -> int:
+    """أعلى استهلاك للذاكرة المقيمة للعملية الحالية بالكيلوبايت"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def print_row(label: str, **values):
+    """طباعة سطر نتيجة موحد"""
+    details = '  '.join(f'{key}={value}' for key, value in values.items())
+    print(f'  {label:<28} {details}')
+
+def fill_users(db_path: str, count: int):
+    """تعبئة جدول المستخدمين ببيانات تجريبية"""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT OR REPLACE INTO users (user_id, username, first_name, last_name, total_commands) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ((i, f'user_{i}', f'مستخدم {i}', 'تجريبي', i % 100) for i in range(1, count + 1))
+    )
+    conn.commit()
+    conn.close()
+
+# ==================== النسخ الاحتياطي JSON ====================
+
+def _legacy_backup_to_json(db_path: str, file_path: str):
+    """التنفيذ السابق: تحميل كل الصفوف في الذاكرة ثم كتابتها دفعة واحدة"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM users')
+    users = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('SELECT * FROM groups')
+    groups = [dict(row) for row in cursor.fetchall()]
+    cursor.execute('SELECT * FROM reminders WHERE is_active = 1')
+    reminders = [dict(row) for row in cursor.fetchall()]
+    backup_data = {
+        'backup_date': time.time(),
+        'users': users,
+        'groups': groups,
+        'reminders': reminders,
+        'total_users': len(users),
+        'total_groups': len(groups),
+        'total_reminders': len(reminders)
+    }
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(backup_data, f, ensure_ascii=False, indent=2, default=str)
+    conn.close()
+
+def _json_backup_worker(work_dir: str, mode: str, results):
+    """تشغيل نمط تصدير واحد في عملية مستقلة لقياس ذروة الذاكرة بدقة"""
+    os.chdir(work_dir)
+    from database import db
+    baseline = peak_rss_kb()
+    started = time.perf_counter()
+    if mode == 'legacy':
+        _legacy_backup_to_json(db.db_path, 'legacy.json')
+        path = 'legacy.json'
+    elif mode == 'streaming':
+        db.backup_to_json('streaming.json')
+        path = 'streaming.json'
+    else:
+        db.backup_to_json('streaming.json.gz')
+        path = 'streaming.json.gz'
+    results.put((mode, time.perf_counter() - started, peak_rss_kb() - baseline, os.path.getsize(path)))
+
+@benchmark('json_backup')
+def bench_json_backup(users: int = 200000):
+    """مقارنة ذروة الذاكرة بين التصدير القديم والتصدير المتدفق"""
+    work_dir = enter_temp_dir()
+    from database import db, close_db
+    fill_users(db.db_path, users)
+    close_db(reopen=True)
+
+    print(f'json_backup: {users} مستخدم')
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    for mode in ('legacy', 'streaming', 'streaming_gzip'):
+        process = ctx.Process(target=_json_backup_worker, args=(work_dir, mode, results))
+        process.start()
+        process.join()
+        mode, duration, rss_delta, size = results.get()
+        print_row(mode, seconds=f'{duration:.2f}', peak_rss_delta_mb=f'{rss_delta / 1024:.1f}',
+                  file_mb=f'{size / 1048576:.1f}')
+
+def _legacy_restore_from_json(db_path: str, file_path: str):
+    """التنفيذ السابق: json.load للملف كاملاً ثم execute لكل مستخدم"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        backup_data = json.load(f)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    for user in backup_data.get('users', []):
+        cursor.execute('''
+            INSERT OR REPLACE INTO users
+            (user_id, username, first_name, last_name, language_code,
+             timezone, is_owner, is_admin, is_banned, ban_reason,
+             warnings, join_date, last_activity, total_commands,
+             preferences, shortcuts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user.get('user_id'), user.get('username'),
+              user.get('first_name'), user.get('last_name'),
+              user.get('language_code', 'ar'), user.get('timezone', 'Asia/Riyadh'),
+              user.get('is_owner', False), user.get('is_admin', False),
+              user.get('is_banned', False), user.get('ban_reason'),
+              user.get('warnings', 0), user.get('join_date'),
+              user.get('last_activity'), user.get('total_commands', 0),
+              user.get('preferences', '{}'), user.get('shortcuts', '{}')))
+    conn.commit()
+    conn.close()
+
+# فهارس ثانوية على جدول المستخدمين حتى تظهر كلفة تحديثها أثناء الاستعادة
+BENCH_USER_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS bench_users_activity ON users(last_activity)',
+    'CREATE INDEX IF NOT EXISTS bench_users_username ON users(username)',
+)
+
+@benchmark('json_restore')
+def bench_json_restore(users: int = 200000):
+    """مقارنة سرعة الاستعادة القديمة صفاً بصف مع الاستعادة المجمعة"""
+    enter_temp_dir()
+    from database import db, close_db, DatabaseManager
+    fill_users(db.db_path, users)
+    db.backup_to_json()
+
+    print(f'json_restore: {users} مستخدم')
+    legacy = DatabaseManager('legacy.db')
+    bulk = DatabaseManager('bulk.db')
+    for target in (legacy, bulk):
+        with target.pool.writer() as conn:
+            for sql in BENCH_USER_INDEXES:
+                conn.execute(sql)
+    started = time.perf_counter()
+    _legacy_restore_from_json(legacy.db_path, db.json_backup_path)
+    duration = time.perf_counter() - started
+    print_row('legacy', seconds=f'{duration:.2f}', rows_per_sec=f'{users / duration:.0f}')
+
+    bulk.restore_from_json(db.json_backup_path)
+    report = bulk.last_restore_report
+    print_row('bulk', seconds=f'{report["duration"]:.2f}', rows_per_sec=f'{report["rows_per_sec"]:.0f}')
+    close_db(reopen=True)
+
+@benchmark('user_upsert')
+def bench_user_upsert(users: int = 100000, single_calls: int = 5000):
+    """مقارنة إضافة المستخدمين واحداً واحداً مع الإضافة المجمعة في معاملة واحدة"""
+    enter_temp_dir()
+    from database import db, close_db
+    members = [{'user_id': i, 'username': f'user_{i}', 'first_name': f'عضو {i}', 'last_name': 'تجريبي'}
+               for i in range(1, users + 1)]
+
+    print(f'user_upsert: {users} عضو')
+    started = time.perf_counter()
+    for member in members[:single_calls]:
+        db.add_user(member['user_id'], member['username'], member['first_name'], member['last_name'])
+    duration = time.perf_counter() - started
+    print_row(f'add_user x{single_calls}', seconds=f'{duration:.2f}', rows_per_sec=f'{single_calls / duration:.0f}')
+
+    # المرور الثاني يحدّث صفوفاً موجودة، ويجب أن تبقى العدادات والصلاحيات كما هي
+    for label in ('add_users_bulk (insert)', 'add_users_bulk (update)'):
+        started = time.perf_counter()
+        db.add_users_bulk(members)
+        duration = time.perf_counter() - started
+        print_row(label, seconds=f'{duration:.2f}', rows_per_sec=f'{users / duration:.0f}')
+
+    groups = [{'group_id': -i, 'title': f'مجموعة {i}', 'member_count': i % 500} for i in range(1, users + 1)]
+    started = time.perf_counter()
+    db.upsert_groups_bulk(groups)
+    duration = time.perf_counter() - started
+    print_row('upsert_groups_bulk', seconds=f'{duration:.2f}', rows_per_sec=f'{users / duration:.0f}')
+    close_db(reopen=True)
+
+@benchmark('timeseries')
+def bench_timeseries(samples: int = 43200, baseline_history: int = 100):
+    """مقارنة ذاكرة وقرص السلاسل الزمنية مع قائمة القواميس وصفوف system_monitoring
+    
+    القائمة الأصلية ping_history كانت تحتفظ بآخر baseline_history قياس فقط، فتُقاس بحجمها
+    الحقيقي لا بعدد قياسات المخزن؛ ذاكرة المخزن هي كائنات Python فقط لأن صفحات mmap
+    مدعومة بالملفات ولا يتتبعها tracemalloc.
+    """
+    import datetime
+    import tracemalloc
+    enter_temp_dir()
+    from database import db, close_db
+    from timeseries import TimeSeriesStore
+    started_at = time.time() - samples * 60
+
+    print(f'timeseries: {samples} قياس لكل مقياس (القائمة الأصلية: آخر {baseline_history} قياس)')
+    tracemalloc.start()
+    history = [{'time': datetime.datetime.fromtimestamp(started_at + i * 60), 'ping': float(i)}
+               for i in range(samples - baseline_history, samples)]
+    print_row('ping_history (baseline)', retained=len(history),
+              memory_kb=f'{tracemalloc.get_traced_memory()[0] / 1024:.1f}')
+    tracemalloc.stop()
+    del history
+
+    size_before = os.path.getsize(db.db_path)
+    with db.pool.writer() as conn:
+        conn.executemany(
+            'INSERT INTO system_monitoring (cpu_usage, memory_usage, disk_usage, response_time, '
+            'active_users, total_commands, errors_count) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((i % 100, i % 90, 50.0, 0.2, i % 500, i, 0) for i in range(samples)))
+    close_db(reopen=True)
+    print_row('system_monitoring rows', disk_kb=(os.path.getsize(db.db_path) - size_before) // 1024)
+
+    store = TimeSeriesStore('metrics', capacity=samples)
+    tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(samples):
+        store.append_many({'cpu_usage': i % 100, 'memory_usage': i % 90, 'disk_usage': 50.0,
+                           'response_time': 0.2, 'active_users': i % 500}, started_at + i * 60)
+    duration = time.perf_counter() - started
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    disk = sum(os.path.getsize(os.path.join('metrics', name)) for name in os.listdir('metrics'))
+    print_row('ring buffers (5 metrics)', retained=samples, heap_kb=memory // 1024, disk_kb=disk // 1024,
+              appends_per_sec=f'{samples * 5 / duration:.0f}')
+
+    started = time.perf_counter()
+    hourly = store.downsample('cpu_usage', 3600, start=started_at + samples * 30)
+    print_row('downsample half range', buckets=len(hourly),
+              ms=f'{(time.perf_counter() - started) * 1000:.1f}')
+    store.close()
+
+@benchmark('reminders')
+def bench_reminders(pending: int = 1000000, overdue: int = 20000):
+    """جدولة التذكيرات فوق مليون تذكير معلق: زمن البدء والذاكرة والإرسال ودقة الاستيقاظ"""
+    import datetime
+    import tracemalloc
+    enter_temp_dir()
+    from database import db, close_db
+    from reminders import ReminderScheduler, format_time
+
+    now = datetime.datetime.now().replace(microsecond=0)
+    with db.pool.writer() as conn:
+        conn.executemany(
+            'INSERT INTO reminders (user_id, message, reminder_time, is_recurring, recurrence_pattern) '
+            'VALUES (?, ?, ?, ?, ?)',
+            ((i % 50000, f'تذكير {i}',
+              format_time(now - datetime.timedelta(seconds=i + 1) if i < overdue
+                          else now + datetime.timedelta(seconds=60 + (i * 2.6) % (30 * 86400))),
+              i % 10 == 0, 'daily' if i % 10 == 0 else None)
+             for i in range(pending)))
+    print(f'reminders: {pending} تذكير معلق، {overdue} منها متأخر')
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with db.pool.reader() as conn:
+        everything = conn.execute(
+            'SELECT id, user_id, message, reminder_time, recurrence_pattern FROM reminders '
+            'WHERE is_active = 1').fetchall()
+    duration = time.perf_counter() - started
+    print_row('full reload (old approach)', rows=len(everything), seconds=f'{duration:.2f}',
+              memory_mb=f'{tracemalloc.get_traced_memory()[0] / 1048576:.1f}')
+    del everything
+    tracemalloc.stop()
+
+    sent = []
+    finished = threading.Event()
+    def send(reminder):
+        sent.append(time.perf_counter())
+        if len(sent) == overdue:
+            finished.set()
+
+    tracemalloc.start()
+    scheduler = ReminderScheduler(db, send)
+    started = time.perf_counter()
+    scheduler.start()
+    finished.wait(120)
+    duration = time.perf_counter() - started
+    time.sleep(0.5)
+    stats = scheduler.get_stats()
+    print_row('dispatch overdue', sent=len(sent), seconds=f'{duration:.2f}',
+              per_sec=f'{len(sent) / duration:.0f}', loads=stats['loads'])
+    print_row('scheduler memory', queued=stats['queued'],
+              peak_mb=f'{tracemalloc.get_traced_memory()[1] / 1048576:.1f}')
+    tracemalloc.stop()
+
+    # دقة الاستيقاظ لتذكير جديد بعد ثانيتين دون أي فحص دوري
+    wakeups_before = scheduler.get_stats()['wakeups']
+    target = datetime.datetime.now().replace(microsecond=0) + datetime.timedelta(seconds=2)
+    sent.clear()
+    scheduler.add(1, 'دقة الاستيقاظ', target)
+    while not sent:
+        time.sleep(0.01)
+    late = datetime.datetime.now().timestamp() - target.timestamp() - (time.perf_counter() - sent[0])
+    print_row('wake precision', late_ms=f'{late * 1000:.1f}',
+              wakeups=scheduler.get_stats()['wakeups'] - wakeups_before)
+    scheduler.stop()
+    close_db(reopen=True)
+
+@benchmark('banned_words')
+def bench_banned_words(terms: int = 10000, messages: int = 2000):
+    """كلفة فحص الرسالة الواحدة مقابل 10 آلاف كلمة محظورة: حلقة in مقابل Aho-Corasick"""
+    import random
+    from banned_words import AhoCorasick
+    from arabic_text import normalize_arabic
+    rng = random.Random(42)
+    letters = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+    words = list({''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(terms)})
+    texts = [' '.join(''.join(rng.choice(letters) for _ in range(rng.randint(2, 7)))
+                      for _ in range(20)) for _ in range(messages)]
+
+    print(f'banned_words: {len(words)} كلمة، {messages} رسالة')
+    normalized = [normalize_arabic(word) for word in words]
+    started = time.perf_counter()
+    naive_hits = 0
+    for text in texts:
+        text = normalize_arabic(text)
+        naive_hits += any(word in text for word in normalized)
+    duration = time.perf_counter() - started
+    print_row('loop of in checks', us_per_message=f'{duration / messages * 1e6:.0f}', hits=naive_hits)
+
+    started = time.perf_counter()
+    automaton = AhoCorasick(words)
+    print_row('compile automaton', ms=f'{(time.perf_counter() - started) * 1000:.0f}')
+    started = time.perf_counter()
+    hits = sum(automaton.search(text) is not None for text in texts)
+    duration = time.perf_counter() - started
+    print_row('aho-corasick', us_per_message=f'{duration / messages * 1e6:.0f}', hits=hits)
+
+class _RouteTarget:
+    """هدف وهمي يحمل أسماء دوال HinaBot للموجه"""
+
+    def __getattr__(self, name: str):
+        return lambda update, context, **options: name
+
+def _legacy_route(target, registry, text: str):
+    """التنفيذ السابق: بناء قاموس الأوامر مع كل رسالة ثم سلسلة startswith"""
+    arabic_commands = {}
+    for spec in registry:
+        if spec.args is None:
+            for name in spec.names:
+                arabic_commands[name] = lambda u, c, handler=getattr(target, spec.handler): (handler, u, c)
+    words = text.split()
+    if text in arabic_commands:
+        return arabic_commands[text]
+    if words and words[0] in ('.تذكير', '.تذكير_يومي', '.تذكير_اسبوعي', '.تذكير_شهري'):
+        return words[1:]
+    for prefix in ('.الغاء_تذكير', '.منع_كلمة', '.الغاء_منع_كلمة', '.رد', '.رد_يبدأ', '.رد_نمط',
+                   '.حذف_رد', '.اختصار', '.حذف_اختصار'):
+        if words and words[0] == prefix:
+            return words[1:]
+    if text.startswith('/طقس ') or text.startswith('طقس '):
+        return text.replace('/طقس ', '').replace('طقس ', '').split()
+    if text.startswith('/ترجمة ') or text.startswith('ترجمة '):
+        return text.replace('/ترجمة ', '').replace('ترجمة ', '').split(' ', 1)
+    if text.startswith('/آلة_حاسبة ') or text.startswith('حاسبة '):
+        return [text.replace('/آلة_حاسبة ', '').replace('حاسبة ', '')]
+    return None
+
+@benchmark('command_router')
+def bench_command_router(messages: int = 200000):
+    """كلفة توجيه الرسالة: بناء القاموس مع كل رسالة مقابل الموجه المبني مرة واحدة"""
+    import random
+    from command_router import CommandRouter, ARABIC_COMMANDS
+    rng = random.Random(42)
+    commands = ['.بنج', 'مساعدة', '.الاوامر3', '.تذكير 30 اجتماع', 'طقس الرياض', 'ترجمة en مرحبا بك',
+                'حاسبة 2 + 2', '.رد_نمط صباح\\s+الخير = صباح النور', '.Menu', 'احصائيات البوت']
+    chatter = ['السلام عليكم', 'كيف حالكم يا شباب', 'هههههه', 'تمام الحمد لله والله',
+               'وين الناس اليوم؟', 'صباح الخير ' * 20]
+    # رسالة من كل خمس رسائل أمر، والبقية محادثة عادية
+    texts = [rng.choice(commands) if rng.random() < 0.2 else rng.choice(chatter) for _ in range(messages)]
+
+    print(f'command_router: {messages} رسالة')
+    target = _RouteTarget()
+    started = time.perf_counter()
+    legacy_hits = sum(_legacy_route(target, ARABIC_COMMANDS, text) is not None for text in texts)
+    duration = time.perf_counter() - started
+    print_row('dict per message', us_per_message=f'{duration / messages * 1e6:.2f}', hits=legacy_hits)
+
+    started = time.perf_counter()
+    router = CommandRouter(target, ARABIC_COMMANDS)
+    print_row('build router', ms=f'{(time.perf_counter() - started) * 1000:.2f}', **router.get_stats())
+    started = time.perf_counter()
+    hits = sum(router.resolve(text) is not None for text in texts)
+    duration = time.perf_counter() - started
+    print_row('precompiled router', us_per_message=f'{duration / messages * 1e6:.2f}', hits=hits)
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f'❌ قياس غير معروف: {name} (المتاح: {", ".join(BENCHMARKS)})')
+            sys.exit(1)
+    for name in names:
+        BENCHMARKS[name]()
+
+if __name__ == '__main__':
+    main()
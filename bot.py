@@ -10,22 +10,28 @@ import time
 import os
 import json
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
 from telegram import Update, Bot, BotCommand, InputMediaPhoto
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
-    filters, ContextTypes, CallbackContext
+    filters, ContextTypes, CallbackContext, ApplicationHandlerStop
 )
 
 # استيراد الوحدات المحلية
 import config
-from database import DatabaseManager
+from database import db, async_db, close_db
 from monitoring import SystemMonitor
-from web_monitor import WebMonitor
+import web_monitor
 from commands_menu import get_commands_menu
 from smart_monitoring import SmartMonitoring
+from reminders import ReminderScheduler, parse_reminder_time, to_zone
+from shortcuts import ShortcutStore
+from banned_words import BannedWordsFilter
+from auto_responses import AutoResponder, MatchWorkers, format_responses
+from command_router import CommandRouter, ARABIC_COMMANDS
 
 # إعداد نظام السجلات
 logging.basicConfig(
@@ -44,7 +50,15 @@ class HinaBot:
         self.start_time = datetime.now()
         self.command_stats = {}
         self.user_last_command = {}
-        self.shortcuts = {}
+        self.shortcuts = ShortcutStore(db)
+        self.banned_words = BannedWordsFilter(db)
+        self.auto_responder = AutoResponder(db)
+        # فحص الرسائل في خيوط خاصة حتى لا يحجز خيوط قاعدة البيانات: الكلمات المحظورة في
+        # مجمع مستقل حتى لا يعطلها تعبير نمطي بطيء في الردود التلقائية
+        self.filter_executor = ThreadPoolExecutor(max_workers=config.FILTER_EXECUTOR_WORKERS,
+                                                  thread_name_prefix='hina-filter')
+        self.match_workers = MatchWorkers()
+        self.router = CommandRouter(self, ARABIC_COMMANDS)
         self.session_command_count = 0  # عداد الأوامر في الجلسة الحالية
         self.session_start_time = datetime.now()  # وقت بداية الجلسة
         self.temp_data = {}  # بيانات مؤقتة للجلسة
@@ -52,6 +66,10 @@ class HinaBot:
         # تهيئة نظام المراقبة الذكي
         self.smart_monitor = SmartMonitoring(self)
         
+        # جدولة التذكيرات (تبدأ بعد تشغيل حلقة أحداث البوت)
+        self.event_loop = None
+        self.reminders = ReminderScheduler(db, self.deliver_reminder)
+        
         # تحميل الاختصارات من قاعدة البيانات
         self.load_shortcuts()
         
@@ -64,8 +82,8 @@ class HinaBot:
     def load_shortcuts(self):
         """تحميل الاختصارات من قاعدة البيانات"""
         try:
-            # سيتم تنفيذ هذا لاحقاً عند إضافة جدول الاختصارات
-            pass
+            self.shortcuts.load()
+            self.shortcuts.start()
         except Exception as e:
             logger.error(f"خطأ في تحميل الاختصارات: {e}")
     
@@ -120,7 +138,7 @@ class HinaBot:
         user = update.effective_user
         
         # إضافة المستخدم إلى قاعدة البيانات
-        db.add_user(
+        await async_db.add_user(
             user_id=user.id,
             username=user.username,
             first_name=user.first_name,
@@ -163,7 +181,7 @@ class HinaBot:
             await update.message.reply_text(welcome_text, parse_mode='HTML')
         
         # تسجيل النشاط
-        db.update_user_activity(user.id)
+        await async_db.update_user_activity(user.id)
         await self.log_command_usage(update, context, 'start')
     
     async def session_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -248,7 +266,7 @@ class HinaBot:
     async def my_info_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """أمر عرض معلومات المستخدم"""
         user = update.effective_user
-        user_data = db.get_user(user.id)
+        user_data = await async_db.get_user(user.id)
         
         if not user_data:
             await update.message.reply_text("❌ لم يتم العثور على بياناتك في النظام.")
@@ -358,7 +376,7 @@ class HinaBot:
             return
         
         try:
-            stats = db.get_stats()
+            stats = await async_db.get_stats()
             
             stats_text = f"""
 📊 **إحصائيات البوت الشاملة**
@@ -394,6 +412,332 @@ class HinaBot:
         
         await self.log_command_usage(update, context, 'bot_stats')
     
+    async def db_metrics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر قياسات أداء قاعدة البيانات"""
+        if not await self.is_owner(update.effective_user.id):
+            await update.message.reply_text("❌ هذا الأمر متاح للمالك فقط.")
+            return
+        
+        try:
+            metrics = await async_db.get_query_metrics()
+            
+            lines = ["🗄️ **أداء قاعدة البيانات** (الأعلى زمناً)\n"]
+            for name, values in list(metrics.items())[:10]:
+                lines.append(
+                    f"• `{name}`: {values['calls']} استدعاء، "
+                    f"متوسط {values['latency_avg'] * 1000:.1f}ms، "
+                    f"أقصى {values['latency_max'] * 1000:.1f}ms، "
+                    f"انتظار أقفال {values['lock_wait_total'] * 1000:.0f}ms، "
+                    f"إعادات {values['locked_retries']}، أخطاء {values['errors']}"
+                )
+            if len(lines) == 1:
+                lines.append("لا توجد قياسات بعد.")
+            
+            settings = await async_db.get_settings_cache_stats()
+            lines.append(
+                f"\n⚙️ **الإعدادات المحللة:** {settings['size']} قيمة، "
+                f"إصابة {settings['hit_ratio'] * 100:.0f}%، معلقة {settings['dirty']}، "
+                f"مكتوبة {settings['rows_written']}"
+            )
+            
+            await update.message.reply_text('\n'.join(lines), parse_mode='Markdown')
+            
+        except Exception as e:
+            await update.message.reply_text(f"❌ خطأ في الحصول على قياسات قاعدة البيانات: {str(e)}")
+        
+        await self.log_command_usage(update, context, 'db_metrics')
+    
+    async def reminder_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                               recurrence_pattern: str = None):
+        """أمر إنشاء تذكير: .تذكير <دقائق أو HH:MM> <النص>"""
+        args = context.args or []
+        timezone = await self.get_user_timezone(update.effective_user.id)
+        when = parse_reminder_time(args[0], tz=timezone) if args else None
+        if when is None or len(args) < 2:
+            await update.message.reply_text(
+                "❌ الاستخدام: .تذكير <عدد الدقائق أو الساعة HH:MM> <نص التذكير>"
+            )
+            return
+        
+        reminder_id = await async_db.run(self.reminders.add, update.effective_user.id,
+                                         ' '.join(args[1:]), when, recurrence_pattern)
+        if reminder_id is None:
+            await update.message.reply_text(
+                f"❌ لا يمكن إنشاء التذكير، الحد الأقصى {config.MAX_REMINDERS_PER_USER} تذكير نشط."
+            )
+        else:
+            await update.message.reply_text(
+                f"✅ تم إنشاء التذكير رقم {reminder_id}\n"
+                f"⏰ الموعد: {to_zone(when, timezone).strftime('%Y-%m-%d %H:%M')} ({timezone.zone})"
+            )
+        
+        await self.log_command_usage(update, context, 'reminder')
+    
+    async def my_reminders_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر عرض تذكيرات المستخدم"""
+        reminders = await async_db.get_user_reminders(update.effective_user.id)
+        if not reminders:
+            await update.message.reply_text("📅 لا توجد لديك تذكيرات نشطة.")
+        else:
+            timezone = await self.get_user_timezone(update.effective_user.id)
+            lines = [f"📅 تذكيراتك النشطة ({timezone.zone}):\n"]
+            for reminder in reminders:
+                repeat = f" 🔁 {reminder['recurrence_pattern']}" if reminder['recurrence_pattern'] else ''
+                when = to_zone(datetime.fromisoformat(str(reminder['reminder_time'])), timezone)
+                lines.append(f"• {reminder['id']} ⟣ {when.strftime('%Y-%m-%d %H:%M')}{repeat}\n  {reminder['message']}")
+            await update.message.reply_text('\n'.join(lines))
+        
+        await self.log_command_usage(update, context, 'my_reminders')
+    
+    async def cancel_reminder_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر إلغاء تذكير: .الغاء_تذكير <رقم التذكير>"""
+        args = context.args or []
+        if not args or not args[0].isdigit():
+            await update.message.reply_text("❌ الاستخدام: .الغاء_تذكير <رقم التذكير>")
+            return
+        
+        if await async_db.run(self.reminders.cancel, update.effective_user.id, int(args[0])):
+            await update.message.reply_text(f"✅ تم إلغاء التذكير رقم {args[0]}")
+        else:
+            await update.message.reply_text("❌ لا يوجد تذكير نشط بهذا الرقم.")
+        
+        await self.log_command_usage(update, context, 'cancel_reminder')
+    
+    async def shortcut_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر إنشاء اختصار: .اختصار <الاختصار> <الأمر الكامل>"""
+        args = context.args or []
+        if len(args) < 2:
+            await update.message.reply_text("❌ الاستخدام: .اختصار <الاختصار> <الأمر الكامل>")
+            return
+        
+        shortcut, full_command = args[0], ' '.join(args[1:])
+        if len(shortcut) > config.MAX_SHORTCUT_LENGTH:
+            await update.message.reply_text(
+                f"❌ الاختصار طويل جداً، الحد الأقصى {config.MAX_SHORTCUT_LENGTH} حرف."
+            )
+            return
+        
+        shortcut_id = await async_db.run(self.shortcuts.add, update.effective_user.id, shortcut, full_command)
+        if shortcut_id is None:
+            await update.message.reply_text(
+                f"❌ لا يمكن إنشاء الاختصار، الحد الأقصى {config.MAX_SHORTCUTS_PER_USER} اختصار."
+            )
+        else:
+            await update.message.reply_text(f"✅ تم حفظ الاختصار: {shortcut} ⟣ {full_command}")
+        
+        await self.log_command_usage(update, context, 'shortcut')
+    
+    async def my_shortcuts_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر عرض اختصارات المستخدم"""
+        shortcuts = await async_db.get_user_shortcuts(update.effective_user.id)
+        if not shortcuts:
+            await update.message.reply_text("📝 لا توجد لديك اختصارات.")
+        else:
+            lines = ["📝 اختصاراتك:\n"]
+            for shortcut in shortcuts:
+                lines.append(f"• {shortcut['shortcut']} ⟣ {shortcut['full_command']} ({shortcut['usage_count']} استخدام)")
+            await update.message.reply_text('\n'.join(lines))
+        
+        await self.log_command_usage(update, context, 'my_shortcuts')
+    
+    async def delete_shortcut_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر حذف اختصار: .حذف_اختصار <الاختصار>"""
+        args = context.args or []
+        if not args:
+            await update.message.reply_text("❌ الاستخدام: .حذف_اختصار <الاختصار>")
+            return
+        
+        if await async_db.run(self.shortcuts.delete, update.effective_user.id, args[0]):
+            await update.message.reply_text(f"✅ تم حذف الاختصار {args[0]}")
+        else:
+            await update.message.reply_text("❌ لا يوجد اختصار بهذا الاسم.")
+        
+        await self.log_command_usage(update, context, 'delete_shortcut')
+    
+    async def ban_word_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, remove: bool = False):
+        """أمر منع كلمات في المجموعة أو إلغاء منعها"""
+        chat = update.effective_chat
+        if chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر يعمل في المجموعات فقط.")
+            return
+        if not await self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ هذا الأمر متاح للمشرفين فقط.")
+            return
+        
+        words = context.args or []
+        if not words:
+            await update.message.reply_text("❌ الاستخدام: .منع_كلمة <كلمة> [كلمة ...]")
+            return
+        
+        await async_db.add_group(chat.id, chat.title, chat.type)
+        change = self.banned_words.remove_words if remove else self.banned_words.add_words
+        if await async_db.run(change, chat.id, words):
+            action = "إلغاء منع" if remove else "منع"
+            await update.message.reply_text(f"✅ تم {action}: {' '.join(words)}")
+        else:
+            await update.message.reply_text("❌ حدث خطأ أثناء تحديث الكلمات المحظورة.")
+        
+        await self.log_command_usage(update, context, 'unban_word' if remove else 'ban_word')
+    
+    async def banned_words_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر عرض الكلمات المحظورة في المجموعة"""
+        chat = update.effective_chat
+        if chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر يعمل في المجموعات فقط.")
+            return
+        
+        words = await async_db.run(self.banned_words.get_words, chat.id)
+        if words:
+            await update.message.reply_text("🚫 الكلمات المحظورة:\n" + '، '.join(words))
+        else:
+            await update.message.reply_text("🚫 لا توجد كلمات محظورة في هذه المجموعة.")
+        
+        await self.log_command_usage(update, context, 'banned_words')
+    
+    async def match_auto_response(self, chat_id: int, text: str) -> Optional[str]:
+        """مطابقة رسالة بالردود التلقائية في خيوط المطابقة
+        
+        كل MATCH_TIMEOUT_SECONDS من الانتظار تُوقف المجموعات التي تجاوزت مطابقتها نفسها
+        المهلة ويُضاف خيط بدل كل خيط عالق، فلا تُعاقب مجموعة على انتظار الطابور. يتوقف
+        الانتظار إن أُوقفت مجموعة الرسالة أو بعد MATCH_MAX_WAIT_SECONDS.
+        """
+        future = asyncio.wrap_future(self.match_workers.submit(self.auto_responder.respond, chat_id, text))
+        deadline = time.monotonic() + config.MATCH_MAX_WAIT_SECONDS
+        while True:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), config.MATCH_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            for group_id in self.auto_responder.suspend_overrunning(config.MATCH_TIMEOUT_SECONDS):
+                logger.warning(f"تجاوزت مطابقة الردود التلقائية المهلة في {group_id}، أوقفت حتى تعديلها")
+                if not self.match_workers.add_worker():
+                    logger.error("بلغت خيوط المطابقة حدها الأقصى بسبب تعبيرات عالقة")
+            if self.auto_responder.is_suspended(chat_id) or time.monotonic() >= deadline:
+                return None
+    
+    async def enforce_banned_words(self, update: Update, text: str) -> bool:
+        """حذف رسالة المجموعة إن احتوت كلمة محظورة، وتعيد True عند الحذف"""
+        chat = update.effective_chat
+        if chat.type == 'private' or await self.is_admin(update.effective_user.id):
+            return False
+        
+        loop = asyncio.get_running_loop()
+        word = await loop.run_in_executor(self.filter_executor, self.banned_words.check, chat.id, text)
+        if word is None:
+            return False
+        
+        try:
+            await update.message.delete()
+            await chat.send_message(f"⚠️ تم حذف رسالة تحتوي على كلمة محظورة من {update.effective_user.mention_html()}",
+                                    parse_mode='HTML')
+        except Exception as e:
+            logger.warning(f"تعذر حذف رسالة بكلمة محظورة في {chat.id}: {e}")
+        return True
+    
+    async def auto_response_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                    trigger_type: str = 'exact'):
+        """أمر إضافة رد تلقائي: .رد <المحفز> = <الرد>"""
+        chat = update.effective_chat
+        if chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر يعمل في المجموعات فقط.")
+            return
+        if not await self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ هذا الأمر متاح للمشرفين فقط.")
+            return
+        
+        pattern, separator, response = ' '.join(context.args or []).partition('=')
+        pattern, response = pattern.strip(), response.strip()
+        if not separator or not pattern or not response:
+            await update.message.reply_text("❌ الاستخدام: .رد <المحفز> = <الرد>")
+            return
+        
+        await async_db.add_group(chat.id, chat.title, chat.type)
+        if await async_db.run(self.auto_responder.set_response, chat.id, trigger_type, pattern, response):
+            await update.message.reply_text(f"✅ تم حفظ الرد التلقائي: {pattern}")
+        else:
+            await update.message.reply_text(
+                f"❌ لا يمكن حفظ الرد (تعبير غير صالح أو بتكرار متداخل أو تجاوز الحد {config.MAX_AUTO_RESPONSES_PER_GROUP})."
+            )
+        
+        await self.log_command_usage(update, context, 'auto_response')
+    
+    async def delete_auto_response_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر حذف رد تلقائي: .حذف_رد <المحفز>"""
+        chat = update.effective_chat
+        if chat.type == 'private' or not await self.is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ هذا الأمر متاح لمشرفي المجموعات فقط.")
+            return
+        
+        pattern = ' '.join(context.args or []).strip()
+        if await async_db.run(self.auto_responder.remove_response, chat.id, pattern):
+            await update.message.reply_text(f"✅ تم حذف الرد التلقائي: {pattern}")
+        else:
+            await update.message.reply_text("❌ لا يوجد رد تلقائي بهذا المحفز.")
+        
+        await self.log_command_usage(update, context, 'delete_auto_response')
+    
+    async def auto_responses_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """أمر عرض الردود التلقائية في المجموعة"""
+        chat = update.effective_chat
+        if chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر يعمل في المجموعات فقط.")
+            return
+        
+        lines = format_responses(await async_db.run(self.auto_responder.get_responses, chat.id))
+        if lines:
+            stats = self.auto_responder.get_stats().get(chat.id)
+            if stats:
+                lines.append(f"\n⏱️ زمن المطابقة: متوسط {stats['latency_avg_us']:.0f}µs، "
+                             f"أقصى {stats['latency_max_us']:.0f}µs ({stats['checks']} رسالة)")
+            await update.message.reply_text("💬 الردود التلقائية:\n" + '\n'.join(lines))
+        else:
+            await update.message.reply_text("💬 لا توجد ردود تلقائية في هذه المجموعة.")
+        
+        await self.log_command_usage(update, context, 'auto_responses')
+    
+    async def handle_auto_responses(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """الرد التلقائي على رسائل المجموعات (يعمل بجانب معالج الأوامر العربية)"""
+        text = update.message.text.strip()
+        if text.startswith('.'):
+            return
+        
+        response = await self.match_auto_response(update.effective_chat.id, text)
+        if response:
+            await update.message.reply_text(response)
+    
+    def deliver_reminder(self, reminder: Dict):
+        """إرسال تذكير مستحق من خيط الجدولة عبر حلقة أحداث البوت"""
+        if self.event_loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(
+            self.application.bot.send_message(
+                chat_id=reminder['user_id'],
+                text=f"⏰ تذكير:\n\n{reminder['message']}"
+            ),
+            self.event_loop
+        )
+        
+        def log_failure(done):
+            if not done.cancelled() and done.exception() is not None:
+                logger.error(f"تعذر إرسال التذكير {reminder['id']} إلى {reminder['user_id']}: {done.exception()}")
+        
+        future.add_done_callback(log_failure)
+    
+    async def get_user_timezone(self, user_id: int):
+        """المنطقة الزمنية للمستخدم من users.timezone كما يستخدمها أمر الوقت"""
+        import pytz
+        
+        user_data = await async_db.get_user(user_id)
+        try:
+            return pytz.timezone((user_data or {}).get('timezone') or 'Asia/Riyadh')
+        except pytz.UnknownTimeZoneError:
+            return pytz.timezone('Asia/Riyadh')
+    
+    async def post_init(self, application: Application):
+        """تشغيل الخدمات التي تحتاج حلقة أحداث البوت"""
+        self.event_loop = asyncio.get_running_loop()
+        self.reminders.start()
+    
     async def dice_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """أمر رمي النرد"""
         import random
@@ -490,7 +834,7 @@ class HinaBot:
         import pytz
         
         # الحصول على المنطقة الزمنية للمستخدم
-        user_data = db.get_user(update.effective_user.id)
+        user_data = await async_db.get_user(update.effective_user.id)
         timezone_str = user_data.get('timezone', 'Asia/Riyadh') if user_data else 'Asia/Riyadh'
         
         try:
@@ -660,7 +1004,7 @@ class HinaBot:
     
     async def is_admin(self, user_id: int) -> bool:
         """التحقق من كون المستخدم مشرف"""
-        user_data = db.get_user(user_id)
+        user_data = await async_db.get_user(user_id)
         return user_data and (user_data['is_admin'] or user_data['is_owner'])
     
     def get_uptime(self) -> str:
@@ -687,11 +1031,8 @@ class HinaBot:
             user_id = update.effective_user.id
             group_id = update.effective_chat.id if update.effective_chat.type != 'private' else None
             
-            # تحديث نشاط المستخدم
-            db.update_user_activity(user_id)
-            
-            # تسجيل الأمر
-            db.log_command(user_id, group_id, command, response_time)
+            # تسجيل الأمر وتحديث نشاط المستخدم عبر الكتابة المؤجلة
+            await async_db.record_command(user_id, group_id, command, response_time)
             
             # تحديث إحصائيات الأوامر
             self.command_stats[command] = self.command_stats.get(command, 0) + 1
@@ -772,89 +1113,23 @@ class HinaBot:
         """معالج الأوامر العربية"""
         text = update.message.text.strip()
         
-        # قاموس الأوامر العربية
-        arabic_commands = {
-            # أوامر القوائم
-            '.الاوامر': lambda u, c: self.commands_menu_handler(u, c, 0),
-            '.Menu': lambda u, c: self.commands_menu_handler(u, c, 0),
-            '.الاوامر1': lambda u, c: self.commands_menu_handler(u, c, 1),
-            '.الاوامر2': lambda u, c: self.commands_menu_handler(u, c, 2),
-            '.الاوامر3': lambda u, c: self.commands_menu_handler(u, c, 3),
-            '.الاوامر4': lambda u, c: self.commands_menu_handler(u, c, 4),
-            '.الاوامر5': lambda u, c: self.commands_menu_handler(u, c, 5),
-            '.الاوامر6': lambda u, c: self.commands_menu_handler(u, c, 6),
-            '.الاوامر7': lambda u, c: self.commands_menu_handler(u, c, 7),
-            '.الاوامر8': lambda u, c: self.commands_menu_handler(u, c, 8),
-            
-            # الأوامر العادية
-            '/مساعدة': self.help_command,
-            'مساعدة': self.help_command,
-            '.مساعدة': self.help_command,
-            '/ايدي': self.my_id_command,
-            'ايدي': self.my_id_command,
-            '.ايدي': self.my_id_command,
-            '/معلوماتي': self.my_info_command,
-            'معلوماتي': self.my_info_command,
-            '.معلوماتي': self.my_info_command,
-            '/بنج': self.ping_command,
-            'بنج': self.ping_command,
-            '.بنج': self.ping_command,
-            '/جلسة': self.session_command,
-            'جلسة': self.session_command,
-            '.جلسة': self.session_command,
-            '/سيرفر': self.server_info_command,
-            'سيرفر': self.server_info_command,
-            '.سيرفر': self.server_info_command,
-            '/احصائيات_البوت': self.bot_stats_command,
-            'احصائيات البوت': self.bot_stats_command,
-            '.احصائيات': self.bot_stats_command,
-            '/نرد': self.dice_command,
-            'نرد': self.dice_command,
-            '.نرد': self.dice_command,
-            '/عملة': self.coin_command,
-            'عملة': self.coin_command,
-            '.عملة': self.coin_command,
-            '/نكتة': self.joke_command,
-            'نكتة': self.joke_command,
-            '.نكتة': self.joke_command,
-            '/اقتباس': self.quote_command,
-            'اقتباس': self.quote_command,
-            '.اقتباس': self.quote_command,
-            '/وقت': self.time_command,
-            'وقت': self.time_command,
-            '.وقت': self.time_command,
-            '.الوقت': self.time_command,
-            '/طقس': self.weather_command,
-            '/ترجمة': self.translate_command,
-            '/آلة_حاسبة': self.calculator_command,
-            'حاسبة': self.calculator_command,
-            '.حاسبة': self.calculator_command,
-        }
-        
-        # البحث عن الأمر
-        command_func = None
-        if text in arabic_commands:
-            command_func = arabic_commands[text]
-        elif text.startswith('/طقس ') or text.startswith('طقس '):
-            # معالجة خاصة لأمر الطقس مع المدينة
-            city = text.replace('/طقس ', '').replace('طقس ', '')
-            context.args = city.split()
-            command_func = self.weather_command
-        elif text.startswith('/ترجمة ') or text.startswith('ترجمة '):
-            # معالجة خاصة لأمر الترجمة
-            parts = text.replace('/ترجمة ', '').replace('ترجمة ', '').split(' ', 1)
-            if len(parts) >= 2:
-                context.args = [parts[0]] + parts[1].split()
-                command_func = self.translate_command
-        elif text.startswith('/آلة_حاسبة ') or text.startswith('حاسبة '):
-            # معالجة خاصة للحاسبة
-            expression = text.replace('/آلة_حاسبة ', '').replace('حاسبة ', '')
-            context.args = [expression]
-            command_func = self.calculator_command
-        
-        # تنفيذ الأمر إذا وُجد
-        if command_func:
-            await command_func(update, context)
+        # فحص الكلمات المحظورة في المجموعات قبل أي معالجة (وإيقاف بقية المعالجات كالردود التلقائية)
+        if await self.enforce_banned_words(update, text):
+            raise ApplicationHandlerStop
+        
+        # توسيع الاختصارات: اختصارات المستخدم ثم المجموعة ثم العامة
+        chat = update.effective_chat
+        group_id = chat.id if chat.type != 'private' else None
+        text = self.shortcuts.expand(text, update.effective_user.id, group_id)
+        
+        # البحث عن الأمر في الموجه المبني عند البدء
+        found = self.router.resolve(text)
+        if found is None:
+            return
+        route, args = found
+        if args is not None:
+            context.args = args
+        await route.handler(update, context)
     
     async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE):
         """معالج الأخطاء"""
@@ -871,7 +1146,7 @@ class HinaBot:
     def run(self):
         """تشغيل البوت"""
         # إنشاء التطبيق
-        self.application = Application.builder().token(config.BOT_TOKEN).build()
+        self.application = Application.builder().token(config.BOT_TOKEN).post_init(self.post_init).build()
         
         # إضافة معالجات الأوامر
         self.application.add_handler(CommandHandler("start", self.start_command))
@@ -880,6 +1155,7 @@ class HinaBot:
         self.application.add_handler(CommandHandler("session", self.session_command))
         self.application.add_handler(CommandHandler("server", self.server_info_command))
         self.application.add_handler(CommandHandler("stats", self.bot_stats_command))
+        self.application.add_handler(CommandHandler("dbstats", self.db_metrics_command))
         self.application.add_handler(CommandHandler("dice", self.dice_command))
         self.application.add_handler(CommandHandler("coin", self.coin_command))
         self.application.add_handler(CommandHandler("joke", self.joke_command))
@@ -896,6 +1172,12 @@ class HinaBot:
         # معالج الرسائل للأوامر العربية
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_arabic_commands))
         
+        # الردود التلقائية في مجموعة معالجات منفصلة حتى تعمل بجانب الأوامر العربية
+        self.application.add_handler(
+            MessageHandler(filters.TEXT & ~filters.COMMAND & filters.ChatType.GROUPS, self.handle_auto_responses),
+            group=1
+        )
+        
         # إضافة معالج الأخطاء
         self.application.add_error_handler(self.error_handler)
         
@@ -910,7 +1192,14 @@ class HinaBot:
         monitoring_thread.start()
         
         # تشغيل البوت
-        self.application.run_polling(drop_pending_updates=True)
+        try:
+            self.application.run_polling(drop_pending_updates=True)
+        finally:
+            self.reminders.stop()
+            self.shortcuts.stop()
+            self.match_workers.shutdown()
+            self.filter_executor.shutdown(wait=False, cancel_futures=True)
+            close_db()
 
 if __name__ == '__main__':
     # إنشاء المجلدات المطلوبة
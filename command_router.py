@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+موجه الأوامر العربية لبوت Hina
+يُبنى مرة واحدة عند البدء من سجل تصريحي للأوامر، فتكلف كل رسالة بحثاً في قاموس بدل
+بناء قاموس الأوامر وسلسلة startswith مع كل رسالة
+"""
+
+import functools
+from typing import Dict, List, Optional, Tuple
+
+from arabic_text import normalize_arabic
+
+# أنماط معاملات الأوامر
+WORDS = 'words'  # بقية الرسالة مقسمة إلى كلمات
+RAW = 'raw'  # بقية الرسالة كما هي في معامل واحد (تعبيرات نمطية، عمليات حسابية)
+
+# البادئات المعتادة: شرطة، نقطة، ودون بادئة
+ALL_PREFIXES = ('/', '.', '')
+
+def aliases(*names: str, prefixes: Tuple[str, ...] = ALL_PREFIXES) -> Tuple[str, ...]:
+    """كل صيغ الأسماء مع البادئات المحددة"""
+    return tuple(prefix + name for name in names for prefix in prefixes)
+
+class CommandSpec:
+    """تعريف أمر في السجل
+    
+    args=None يعني أمراً بلا معاملات يُطابق النص كاملاً، وإلا فالأسماء هي الكلمة الأولى
+    في الرسالة وبقيتها معاملات، ولا يُنفذ الأمر بأقل من min_args معامل.
+    """
+    
+    def __init__(self, names: Tuple[str, ...], handler: str, args: str = None,
+                 min_args: int = 0, **options):
+        self.names = names
+        self.handler = handler
+        self.args = args
+        self.min_args = min_args
+        self.options = options
+
+class Route:
+    """أمر مترجم: الدالة المربوطة ونمط معاملاته"""
+    
+    __slots__ = ('handler', 'name', 'args', 'min_args')
+    
+    def __init__(self, handler, name: str, args: Optional[str], min_args: int):
+        self.handler = handler
+        self.name = name
+        self.args = args
+        self.min_args = min_args
+
+def normalize_command(text: str) -> str:
+    """صيغة المطابقة: دون تشكيل أو تطويل، بحالة أحرف موحدة ومسافات مفردة"""
+    return ' '.join(normalize_arabic(text).split())
+
+class CommandRouter:
+    """جدولا بحث مبنيان من السجل: مطابقة تامة للنص، وكلمة أولى لأوامر المعاملات
+    
+    تعارض الأسماء داخل الجدول نفسه خطأ في السجل ويُرفض عند البناء لا عند الرسالة.
+    """
+    
+    def __init__(self, target, registry):
+        self.exact = {}
+        self.with_args = {}
+        for spec in registry:
+            handler = getattr(target, spec.handler)
+            if spec.options:
+                handler = functools.partial(handler, **spec.options)
+            route = Route(handler, spec.handler, spec.args, spec.min_args)
+            table = self.exact if spec.args is None else self.with_args
+            for name in spec.names:
+                key = normalize_command(name)
+                if key in table:
+                    raise ValueError(f'اسم أمر مكرر في السجل: {name}')
+                table[key] = route
+        
+        # رسالة أطول من هذا لا يمكن أن تطابق أمراً تاماً حتى مع التشكيل، فلا داعي لتطبيعها
+        self._exact_scan_limit = 4 * max(map(len, self.exact), default=0)
+    
+    def resolve(self, text: str) -> Optional[Tuple[Route, Optional[List[str]]]]:
+        """الأمر المطابق للرسالة ومعاملاته (None لأمر بلا معاملات)، أو None"""
+        if len(text) <= self._exact_scan_limit:
+            route = self.exact.get(normalize_command(text))
+            if route is not None:
+                return route, None
+        
+        parts = text.split(None, 1)
+        if not parts:
+            return None
+        route = self.with_args.get(normalize_arabic(parts[0]))
+        if route is None:
+            return None
+        rest = parts[1].strip() if len(parts) > 1 else ''
+        if route.args == RAW:
+            args = [rest] if rest else []
+        else:
+            args = rest.split()
+        if len(args) < route.min_args:
+            return None
+        return route, args
+    
+    def get_stats(self) -> Dict:
+        """عدد الأسماء في كل جدول"""
+        return {'exact': len(self.exact), 'with_args': len(self.with_args)}
+
+# سجل الأوامر العربية: الأسماء، ودالة HinaBot، ونمط المعاملات، وخياراتها
+ARABIC_COMMANDS = (
+    # أوامر القوائم
+    CommandSpec(('.الاوامر', '.Menu'), 'commands_menu_handler', section=0),
+    *(CommandSpec((f'.الاوامر{section}',), 'commands_menu_handler', section=section) for section in range(1, 9)),
+    
+    # الأوامر العادية
+    CommandSpec(aliases('مساعدة'), 'help_command'),
+    CommandSpec(aliases('ايدي'), 'my_id_command'),
+    CommandSpec(aliases('معلوماتي'), 'my_info_command'),
+    CommandSpec(aliases('بنج'), 'ping_command'),
+    CommandSpec(aliases('جلسة'), 'session_command'),
+    CommandSpec(aliases('سيرفر'), 'server_info_command'),
+    CommandSpec(('/احصائيات_البوت', 'احصائيات البوت', '.احصائيات'), 'bot_stats_command'),
+    CommandSpec(('/قاعدة_البيانات', '.قاعدة_البيانات'), 'db_metrics_command'),
+    CommandSpec(('.تذكيراتي',), 'my_reminders_command'),
+    CommandSpec(('.اختصاراتي',), 'my_shortcuts_command'),
+    CommandSpec(('.الكلمات_الممنوعة',), 'banned_words_command'),
+    CommandSpec(('.الردود',), 'auto_responses_command'),
+    CommandSpec(aliases('نرد'), 'dice_command'),
+    CommandSpec(aliases('عملة'), 'coin_command'),
+    CommandSpec(aliases('نكتة'), 'joke_command'),
+    CommandSpec(aliases('اقتباس'), 'quote_command'),
+    CommandSpec(aliases('وقت') + ('.الوقت',), 'time_command'),
+    CommandSpec(('/طقس',), 'weather_command'),
+    CommandSpec(('/ترجمة',), 'translate_command'),
+    CommandSpec(('/آلة_حاسبة', 'حاسبة', '.حاسبة'), 'calculator_command'),
+    
+    # أوامر التذكيرات مع نمط تكرار كل منها
+    CommandSpec(('.تذكير',), 'reminder_command', WORDS),
+    CommandSpec(('.تذكير_يومي',), 'reminder_command', WORDS, recurrence_pattern='daily'),
+    CommandSpec(('.تذكير_اسبوعي',), 'reminder_command', WORDS, recurrence_pattern='weekly'),
+    CommandSpec(('.تذكير_شهري',), 'reminder_command', WORDS, recurrence_pattern='monthly'),
+    CommandSpec(('.الغاء_تذكير',), 'cancel_reminder_command', WORDS),
+    
+    # الكلمات الممنوعة والردود التلقائية (نص الرد الخام حتى تبقى مسافات التعبير النمطي)
+    CommandSpec(('.منع_كلمة',), 'ban_word_command', WORDS),
+    CommandSpec(('.الغاء_منع_كلمة',), 'ban_word_command', WORDS, remove=True),
+    CommandSpec(('.رد',), 'auto_response_command', RAW, trigger_type='exact'),
+    CommandSpec(('.رد_يبدأ',), 'auto_response_command', RAW, trigger_type='prefix'),
+    CommandSpec(('.رد_نمط',), 'auto_response_command', RAW, trigger_type='regex'),
+    CommandSpec(('.حذف_رد',), 'delete_auto_response_command', WORDS),
+    
+    # الاختصارات
+    CommandSpec(('.اختصار',), 'shortcut_command', WORDS),
+    CommandSpec(('.حذف_اختصار',), 'delete_shortcut_command', WORDS),
+    
+    # أوامر بمعاملات: المدينة، اللغة والنص، العملية الحسابية
+    CommandSpec(('/طقس', 'طقس'), 'weather_command', WORDS, min_args=1),
+    CommandSpec(('/ترجمة', 'ترجمة'), 'translate_command', WORDS, min_args=2),
+    CommandSpec(('/آلة_حاسبة', 'حاسبة'), 'calculator_command', RAW, min_args=1),
+)
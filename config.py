@@ -22,6 +22,32 @@ SERVER_PASSWORD = "Alone#001"
 
 # إعدادات قاعدة البيانات
 DATABASE_PATH = "hina_bot.db"
+DB_READER_CONNECTIONS = 4  # عدد اتصالات القراءة الدائمة في المجمع
+DB_BUSY_TIMEOUT_MS = 5000  # مهلة انتظار قفل قاعدة البيانات بالمللي ثانية
+DB_EXECUTOR_WORKERS = 4  # خيوط تنفيذ استعلامات قاعدة البيانات غير المتزامنة
+WEB_READER_CONNECTIONS = 4  # اتصالات القراءة فقط المخصصة للوحة الويب
+DB_LOCKED_RETRIES = 3  # إعادة المحاولة عند خطأ database is locked
+DB_LOCKED_RETRY_DELAY_MS = 50  # المهلة الأساسية بين محاولات الإعادة
+STATS_CACHE_TTL = 10  # مدة صلاحية الإحصائيات العامة المخزنة بالثواني
+USER_CACHE_SIZE = 5000  # أقصى عدد من سجلات المستخدمين في الذاكرة المؤقتة
+USER_CACHE_TTL = 60  # مدة صلاحية سجل المستخدم المخزن بالثواني
+ACTIVE_USERS_BATCH_ROWS = 500  # حجم دفعة المرور على المستخدمين النشطين
+SETTINGS_CACHE_SIZE = 10000  # أقصى عدد من قيم أعمدة JSON المحللة في الذاكرة
+SETTINGS_FLUSH_SECONDS = 5  # مدة تجميع تعديلات الإعدادات والتفضيلات قبل كتابتها
+
+# إعدادات الكتابة المؤجلة لسجلات الأوامر
+WRITE_BEHIND_FLUSH_MS = 500  # أقصى مدة قبل كتابة الدفعة
+WRITE_BEHIND_BATCH_ROWS = 200  # عدد الصفوف الذي يفرض الكتابة فوراً
+WRITE_BEHIND_MAX_PENDING = 10000  # الحد الأقصى للعناصر المعلقة قبل انتظار المرسل
+
+# إعدادات السلاسل الزمنية لمقاييس النظام
+TIMESERIES_CAPACITY = 43200  # عدد القياسات المحفوظة لكل مقياس (30 يوماً بقياس كل دقيقة)
+SYSTEM_STATS_DB_INTERVAL = 3600  # حفظ متوسطات المقاييس في قاعدة البيانات كل ساعة بدل كل دقيقة
+
+# إعدادات الاحتفاظ بسجلات الأوامر
+LOG_RETENTION_DAYS = 30  # مدة الاحتفاظ بالسجلات التفصيلية قبل تجميعها لكل ساعة
+LOG_RETENTION_BATCH_ROWS = 2000  # عدد السجلات المجمعة والمحذوفة في كل معاملة
+LOG_RETENTION_PAUSE_MS = 20  # استراحة بين الدفعات لإفساح المجال للكتابة
 
 # إعدادات السجلات
 LOG_LEVEL = logging.INFO
@@ -35,12 +61,23 @@ SPAM_THRESHOLD = 5
 # إعدادات الاختصارات
 MAX_SHORTCUTS_PER_USER = 50
 MAX_SHORTCUT_LENGTH = 20
+SHORTCUT_USAGE_FLUSH_SECONDS = 60  # مدة تجميع عدادات استخدام الاختصارات قبل كتابتها
 
 # إعدادات التنبيهات
 MAX_REMINDERS_PER_USER = 100
+REMINDER_WINDOW_SECONDS = 3600  # مدة نافذة التذكيرات المحملة في الذاكرة مسبقاً
+REMINDER_LOAD_BATCH = 5000  # أقصى عدد تذكيرات يحمل أو يرسل في دفعة واحدة
 
 # إعدادات المجموعات
 MAX_GROUPS_TO_MANAGE = 1000
+MAX_AUTO_RESPONSES_PER_GROUP = 200  # أقصى عدد من محفزات الردود التلقائية لكل مجموعة
+MAX_AUTO_RESPONSE_REGEX = 20  # أقصى عدد من محفزات التعبيرات النمطية لكل مجموعة
+AUTO_RESPONSE_SCAN_CHARS = 512  # عدد الأحرف الأولى من الرسالة التي تُفحص بالتعبيرات النمطية
+MATCH_EXECUTOR_WORKERS = 2  # خيوط مطابقة الرسائل بتعبيرات الردود التلقائية (منفصلة عن خيوط قاعدة البيانات)
+MATCH_MAX_EXTRA_WORKERS = 8  # أقصى عدد خيوط تُضاف بدل خيوط علقت في تعبير بطيء
+MATCH_TIMEOUT_SECONDS = 0.5  # أقصى زمن لمطابقة رسالة واحدة قبل إيقاف ردود مجموعتها
+MATCH_MAX_WAIT_SECONDS = 5  # أقصى انتظار لنتيجة المطابقة (يشمل الطابور) قبل تجاوز الرسالة
+FILTER_EXECUTOR_WORKERS = 2  # خيوط فحص الكلمات المحظورة (Aho-Corasick خطي فلا يحتاج مهلة)
 
 # إعدادات القنوات
 MAX_CHANNELS_TO_MANAGE = 100
@@ -48,6 +85,8 @@ MAX_CHANNELS_TO_MANAGE = 100
 # إعدادات النسخ الاحتياطي
 BACKUP_INTERVAL_HOURS = 24
 MAX_BACKUP_FILES = 7
+JSON_BACKUP_COMPACT_EVERY = 24  # عدد النسخ التزايدية قبل دمجها في لقطة JSON كاملة
+JSON_BACKUP_CHUNK_ROWS = 1000  # عدد الصفوف المقروءة في كل دفعة أثناء تصدير JSON
 
 # رسائل النظام
 WELCOME_MESSAGE = "مرحباً بك في بوت Hina! اكتب /مساعدة لعرض الأوامر المتاحة."
@@ -64,9 +103,10 @@ DEFAULT_TIMEZONE = "Asia/Riyadh"
 TEMP_DIR = "temp"
 BACKUP_DIR = "backups"
 LOGS_DIR = "logs"
+METRICS_DIR = "metrics"
 
 # إنشاء المجلدات المطلوبة
-for directory in [TEMP_DIR, BACKUP_DIR, LOGS_DIR]:
+for directory in [TEMP_DIR, BACKUP_DIR, LOGS_DIR, METRICS_DIR]:
     if not os.path.exists(directory):
         os.makedirs(directory)
 
@@ -6,156 +6,1382 @@
 
 import sqlite3
 import json
+import gzip
 import os
 import datetime
 import logging
+import queue
+import asyncio
+import atexit
+import functools
+import inspect
+import itertools
+import operator
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Dict, List, Any, Optional
 import threading
 import time
+import types
 
+import config
+
+# سياق الاستدعاء الجاري في كل خيط، تملؤه المجمعات بزمن انتظار الأقفال والصفوف المعدلة
+_call_context = threading.local()
+
+def _current_call() -> Optional[Dict]:
+    """إطار قياس الاستدعاء الجاري في هذا الخيط إن وجد"""
+    stack = getattr(_call_context, 'stack', None)
+    return stack[-1] if stack else None
+
+# أرقام قواعد البيانات في الذاكرة المشتركة بين اتصالات المجمع الواحد
+_memory_ids = itertools.count(1)
+
+def _is_locked_error(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+class ConnectionPool:
+    """مجمع اتصالات SQLite دائمة: كاتب واحد وعدة قراء بنمط WAL
+    
+    مع read_only تُفتح الاتصالات بـ mode=ro ولا يوجد اتصال كتابة، فلا يستطيع
+    مستخدمو المجمع (مثل لوحة الويب) حجز قفل الكتابة أبداً. المسار ":memory:" يُنشئ
+    قاعدة بيانات في الذاكرة مشتركة بين اتصالات المجمع (cache=shared) تبقى ما دام مفتوحاً.
+    """
+    
+    def __init__(self, db_path: str, readers: int = config.DB_READER_CONNECTIONS,
+                 busy_timeout_ms: int = config.DB_BUSY_TIMEOUT_MS, read_only: bool = False,
+                 uri: str = None):
+        self.db_path = db_path
+        self.max_readers = max(1, readers)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.read_only = read_only
+        self.in_memory = db_path == ':memory:'
+        if uri is not None:
+            self.uri = uri
+        elif self.in_memory:
+            self.uri = f'file:hina-memory-{next(_memory_ids)}?mode=memory&cache=shared'
+        else:
+            self.uri = f'file:{urllib.parse.quote(os.path.abspath(db_path))}' + ('?mode=ro' if read_only else '')
+        
+        # اتصال الكتابة الوحيد محمي بقفل لأن SQLite يسمح بكاتب واحد فقط
+        self._writer = None if read_only else self._connect()
+        self._writer_lock = threading.Lock()
+        
+        # اتصالات القراءة تُنشأ عند الحاجة حتى الحد الأقصى ثم يعاد استخدامها
+        self._readers = queue.LifoQueue()
+        self._readers_created = 0
+        self._create_lock = threading.Lock()
+        
+        # إحصائيات التنافس على الاتصالات
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'writer_acquires': 0,
+            'writer_wait_total': 0.0,
+            'writer_wait_max': 0.0,
+            'writer_hold_total': 0.0,
+            'writer_hold_max': 0.0,
+            'reader_acquires': 0,
+            'reader_wait_total': 0.0,
+            'reader_wait_max': 0.0,
+        }
+    
+    def _connect(self) -> sqlite3.Connection:
+        """فتح اتصال جديد وضبط إعداداته"""
+        conn = sqlite3.connect(self.uri, uri=True, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        if self.in_memory:
+            # الذاكرة المشتركة تقفل الجداول لا الملف ولا تنتظر busy_timeout، فالقراءة لا تنتظر الكاتب
+            conn.execute('PRAGMA read_uncommitted=ON')
+        if self.read_only:
+            conn.execute('PRAGMA query_only=ON')
+            return conn
+        
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # حتى يُطلق INSERT OR REPLACE مشغلات الحذف فتبقى العدادات صحيحة
+        conn.execute('PRAGMA recursive_triggers=ON')
+        return conn
+    
+    def _record_wait(self, kind: str, waited: float):
+        """تسجيل زمن انتظار الحصول على اتصال"""
+        with self._stats_lock:
+            self._stats[f'{kind}_acquires'] += 1
+            self._stats[f'{kind}_wait_total'] += waited
+            if waited > self._stats[f'{kind}_wait_max']:
+                self._stats[f'{kind}_wait_max'] = waited
+        call = _current_call()
+        if call is not None:
+            call['lock_wait'] += waited
+    
+    def _record_hold(self, held: float):
+        """تسجيل مدة الاحتفاظ بقفل الكتابة"""
+        with self._stats_lock:
+            self._stats['writer_hold_total'] += held
+            if held > self._stats['writer_hold_max']:
+                self._stats['writer_hold_max'] = held
+    
+    @contextmanager
+    def writer(self):
+        """الحصول على اتصال الكتابة مع تثبيت المعاملة أو التراجع عنها"""
+        if self.read_only:
+            raise sqlite3.OperationalError('مجمع الاتصالات للقراءة فقط')
+        started = time.perf_counter()
+        with self._writer_lock:
+            acquired = time.perf_counter()
+            self._record_wait('writer', acquired - started)
+            changes_before = self._writer.total_changes
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception as e:
+                self._writer.rollback()
+                if _is_locked_error(e) and _current_call() is not None:
+                    _current_call()['locked'] = True
+                raise
+            finally:
+                self._record_hold(time.perf_counter() - acquired)
+                call = _current_call()
+                if call is not None:
+                    call['rows'] += self._writer.total_changes - changes_before
+    
+    @contextmanager
+    def uncached_reader(self):
+        """اتصال قراءة مؤقت خارج المجمع دون ذاكرة الجمل المحضرة
+        
+        جمل EXPLAIN المحضرة في اتصالات المجمع لا تُعاد تهيئتها بعد تغير المخطط، فتعيد
+        خطة قديمة بعد حذف فهرس مثلاً؛ الاتصال الجديد يقرأ المخطط الحالي.
+        """
+        conn = sqlite3.connect(self.uri, uri=True, timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False, cached_statements=0)
+        try:
+            conn.row_factory = sqlite3.Row
+            if self.in_memory:
+                conn.execute('PRAGMA read_uncommitted=ON')
+            conn.execute('PRAGMA query_only=ON')
+            yield conn
+        finally:
+            conn.close()
+    
+    @contextmanager
+    def reader(self):
+        """استعارة اتصال قراءة من المجمع وإعادته بعد الاستخدام"""
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._create_lock:
+                if self._readers_created < self.max_readers:
+                    self._readers_created += 1
+                    conn = self._connect()
+            if conn is None:
+                conn = self._readers.get()
+        self._record_wait('reader', time.perf_counter() - started)
+        try:
+            yield conn
+        except Exception as e:
+            if _is_locked_error(e) and _current_call() is not None:
+                _current_call()['locked'] = True
+            raise
+        finally:
+            # إنهاء أي معاملة قراءة مفتوحة حتى لا تمنع نقاط تفتيش WAL
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+    
+    def get_stats(self) -> Dict:
+        """إحصائيات حجم المجمع وأزمنة الانتظار"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['readers_max'] = self.max_readers
+        stats['readers_created'] = self._readers_created
+        stats['readers_idle'] = self._readers.qsize()
+        stats['read_only'] = self.read_only
+        stats['writer_busy'] = self._writer_lock.locked()
+        stats['writer_hold_avg'] = (stats['writer_hold_total'] / stats['writer_acquires']
+                                    if stats['writer_acquires'] else 0.0)
+        for kind in ('writer', 'reader'):
+            acquires = stats[f'{kind}_acquires']
+            stats[f'{kind}_wait_avg'] = stats[f'{kind}_wait_total'] / acquires if acquires else 0.0
+        return stats
+    
+    def close(self):
+        """إغلاق جميع الاتصالات"""
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+class WriteBehindBuffer:
+    """مخزن كتابة مؤجلة لسجلات الأوامر وتحديثات نشاط المستخدمين
+    
+    تتجمع العناصر في طابور محدود الحجم وتُكتب كل فترة أو عند اكتمال دفعة في معاملة واحدة،
+    وعند امتلاء الطابور ينتظر المُرسل بدلاً من نمو الذاكرة بلا حد.
+    """
+    
+    def __init__(self, pool: ConnectionPool, flush_interval_ms: int = config.WRITE_BEHIND_FLUSH_MS,
+                 batch_rows: int = config.WRITE_BEHIND_BATCH_ROWS,
+                 max_pending: int = config.WRITE_BEHIND_MAX_PENDING, on_write=None):
+        self.pool = pool
+        self.on_write = on_write
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_rows = max(1, batch_rows)
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._flush_lock = threading.Lock()
+        self._retained = []  # عناصر فشلت كتابتها، تُعاد مع التفريغ التالي
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {
+            'flushes': 0,
+            'failed_flushes': 0,
+            'rows_written': 0,
+            'rows_dropped': 0,
+            'blocked_puts': 0,
+            'last_flush_rows': 0,
+            'last_flush_duration': 0.0,
+        }
+    
+    def start(self):
+        """بدء خيط التفريغ الدوري"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._worker, name='hina-write-behind', daemon=True)
+        self._thread.start()
+    
+    def put(self, user_id: int, group_id: Optional[int], command: str,
+            response_time: float, status: str = 'success'):
+        """إضافة أمر منفذ إلى الطابور (ينتظر إذا كان الطابور ممتلئاً)"""
+        item = (user_id, group_id, command, response_time, status,
+                datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                datetime.datetime.now())
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.stats['blocked_puts'] += 1
+            self._wakeup.set()
+            self.queue.put(item)
+        if self.queue.qsize() >= self.batch_rows:
+            self._wakeup.set()
+    
+    def _worker(self):
+        """تفريغ الطابور عند اكتمال دفعة أو مرور الفترة المحددة"""
+        while not self._stop_event.is_set():
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+    
+    def _drain(self) -> List[tuple]:
+        """سحب كل العناصر الموجودة حالياً في الطابور"""
+        items = []
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                return items
+    
+    def _write(self, items: List[tuple]) -> bool:
+        """كتابة دفعة من العناصر في معاملة واحدة"""
+        # دمج تحديثات النشاط لكل مستخدم في صف واحد
+        activity = {}
+        for user_id, _, _, _, _, _, local_time in items:
+            count, _ = activity.get(user_id, (0, None))
+            activity[user_id] = (count + 1, local_time)
+        
+        started = time.perf_counter()
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany('''
+                    INSERT INTO logs 
+                    (user_id, group_id, command, response_time, status, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', [item[:6] for item in items])
+                conn.executemany('''
+                    UPDATE users 
+                    SET last_activity = ?, total_commands = total_commands + ?
+                    WHERE user_id = ?
+                ''', [(last, count, user_id) for user_id, (count, last) in activity.items()])
+        except Exception as e:
+            self.stats['failed_flushes'] += 1
+            logging.error(f"خطأ في تفريغ الكتابة المؤجلة ({len(items)} عنصر، يعاد في التفريغ التالي): {e}")
+            return False
+        self.stats['flushes'] += 1
+        self.stats['rows_written'] += len(items)
+        self.stats['last_flush_rows'] = len(items)
+        self.stats['last_flush_duration'] = time.perf_counter() - started
+        if self.on_write:
+            self.on_write(activity.keys())
+        return True
+    
+    def flush(self):
+        """كتابة كل العناصر المعلقة فوراً
+        
+        السحب والكتابة يتمان تحت القفل نفسه، فعند عودة الدالة تكون كل العناصر المضافة
+        قبل استدعائها قد كُتبت حتى لو كان خيط التفريغ يكتب دفعة في اللحظة نفسها.
+        إن فشلت الكتابة تُحتفظ الدفعة وتُكتب قبل العناصر الجديدة في التفريغ التالي، حتى
+        max_pending عنصر؛ ما زاد عن ذلك يُسقط الأقدم منه ويُعد في rows_dropped.
+        """
+        with self._flush_lock:
+            items = self._retained + self._drain()
+            self._retained = []
+            if items and not self._write(items):
+                overflow = len(items) - self.queue.maxsize
+                if self.queue.maxsize > 0 and overflow > 0:
+                    self.stats['rows_dropped'] += overflow
+                    logging.error(f"أُسقط {overflow} عنصر من الكتابة المؤجلة بعد فشل التفريغ المتكرر")
+                    items = items[overflow:]
+                self._retained = items
+    
+    def stop(self):
+        """إيقاف خيط التفريغ وكتابة ما تبقى في الطابور"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval * 4 + 1)
+        self.flush()
+    
+    def get_stats(self) -> Dict:
+        """إحصائيات الطابور والتفريغ"""
+        stats = dict(self.stats)
+        stats['pending'] = self.queue.qsize() + len(self._retained)
+        stats['max_pending'] = self.queue.maxsize
+        return stats
+
+class ActivityWindow:
+    """نافذة نشاط مقسمة إلى دلاء زمنية لعدّ المستخدمين النشطين دون مسح جدول المستخدمين
+    
+    يُحفظ لكل مستخدم رقم آخر دلو نشط فيه، ولكل دلو عدد مستخدميه، فيكون العدّ مجموع
+    عدادات الدلاء داخل النافذة فقط.
+    """
+    
+    def __init__(self, window_seconds: int = 86400, bucket_seconds: int = 3600):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(1, -(-window_seconds // bucket_seconds))
+        self._user_bucket = {}
+        self._bucket_counts = {}
+        self._lock = threading.Lock()
+    
+    def touch(self, user_id: int, when: float = None):
+        """تسجيل نشاط مستخدم في الدلو الزمني المناسب"""
+        bucket = int((when or time.time()) // self.bucket_seconds)
+        with self._lock:
+            previous = self._user_bucket.get(user_id)
+            if previous is not None and previous >= bucket:
+                return
+            if previous in self._bucket_counts:
+                self._bucket_counts[previous] -= 1
+            self._bucket_counts[bucket] = self._bucket_counts.get(bucket, 0) + 1
+            self._user_bucket[user_id] = bucket
+    
+    def count(self, now: float = None) -> int:
+        """عدد المستخدمين النشطين داخل النافذة"""
+        oldest = int((now or time.time()) // self.bucket_seconds) - self.window_buckets + 1
+        with self._lock:
+            for bucket in [b for b in self._bucket_counts if b < oldest]:
+                del self._bucket_counts[bucket]
+            active = sum(self._bucket_counts.values())
+            # تنظيف المستخدمين المنتهية دلاؤهم عندما يتضاعف حجم الخريطة
+            if len(self._user_bucket) > 2 * active + 1024:
+                self._user_bucket = {user: b for user, b in self._user_bucket.items() if b >= oldest}
+            return active
+
+class StatsCache:
+    """ذاكرة مؤقتة لنتيجة حساب مكلف بمدة صلاحية محددة
+    
+    عند انتهاء الصلاحية يحسب طلب واحد فقط النتيجة الجديدة، وتنتظره بقية الطلبات
+    المتزامنة ثم تستخدم النتيجة نفسها بدلاً من تكرار الاستعلام.
+    """
+    
+    def __init__(self, compute, ttl: float = config.STATS_CACHE_TTL):
+        self.compute = compute
+        self.ttl = ttl
+        self._value = None
+        self._computed_at = 0.0
+        self._compute_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+    
+    def _fresh(self, max_age: float) -> bool:
+        return self._value is not None and time.monotonic() - self._computed_at < max_age
+    
+    def get(self, max_age: float = None) -> Dict:
+        """النتيجة المخزنة إن كانت حديثة، وإلا حسابها مرة واحدة"""
+        max_age = self.ttl if max_age is None else max_age
+        if self._fresh(max_age):
+            self.hits += 1
+            return dict(self._value)
+        
+        with self._compute_lock:
+            # طلب آخر ربما أنهى الحساب أثناء انتظارنا للقفل
+            if self._fresh(max_age):
+                self.waits += 1
+                return dict(self._value)
+            self.misses += 1
+            value = self.compute()
+            if value:
+                self._value = value
+                self._computed_at = time.monotonic()
+            return dict(value)
+    
+    def invalidate(self):
+        """إلغاء النتيجة المخزنة"""
+        self._value = None
+    
+    def get_stats(self) -> Dict:
+        """عدد الإصابات والإخفاقات وعمر النتيجة الحالية"""
+        requests = self.hits + self.waits + self.misses
+        return {
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'waits': self.waits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.waits) / requests if requests else 0.0,
+            'age': time.monotonic() - self._computed_at if self._value is not None else None,
+        }
+
+class UserCache:
+    """ذاكرة LRU محدودة الحجم لسجلات المستخدمين بمدة صلاحية
+    
+    تُلغى المدخلات عند كل كتابة على المستخدم، ويمنع رقم الجيل إعادة تخزين صف قديم
+    قُرئ قبل الكتابة وانتهت قراءته بعدها.
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, max_size: int = config.USER_CACHE_SIZE, ttl: float = config.USER_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, user_id: int):
+        """السجل المخزن (أو None لمستخدم غير موجود)، أو _MISSING إن لم يكن مخزناً"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl:
+                self.misses += 1
+                return self._MISSING
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(entry[0]) if entry[0] is not None else None
+    
+    def generation(self) -> int:
+        """رقم الجيل الحالي، يؤخذ قبل القراءة من قاعدة البيانات"""
+        return self._generation
+    
+    def put(self, user_id: int, value: Optional[Dict], generation: int):
+        """تخزين نتيجة قراءة ما لم تحدث كتابة منذ بدايتها"""
+        with self._lock:
+            if generation != self._generation or self.max_size <= 0:
+                return
+            self._entries[user_id] = (dict(value) if value is not None else None, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, user_ids=None):
+        """إلغاء مستخدمين محددين، أو كل المدخلات عند عدم تحديدهم"""
+        with self._lock:
+            self._generation += 1
+            if user_ids is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            for user_id in user_ids:
+                if self._entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+    
+    def get_stats(self) -> Dict:
+        """نسبة الإصابة وعدد الإخراجات والإلغاءات"""
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+class JsonSettingsCache:
+    """ذاكرة LRU لأعمدة JSON (preferences، shortcuts، settings) محللة مرة واحدة
+    
+    كل قيمة تُحلل عند أول قراءة وتُعاد عرضاً للقراءة فقط دون نسخ. التعديل ينشئ قاموساً
+    جديداً ويضعه في قائمة التعديلات المعلقة التي يكتبها خيط مستقل دفعة واحدة لكل عمود،
+    ولا تُحذف القيمة المعدلة من القائمة قبل كتابتها حتى لا تُقرأ نسخة قديمة من الجدول.
+    تعديل صف غير موجود بعد (مستخدم أو مجموعة لم تُسجل) يبقى معلقاً ويُكتب عند إنشاء الصف.
+    القيم قواميس للقراءة فقط لا أصناف بحقول محددة، لأن هذه الأعمدة بلا مخطط ثابت.
+    """
+    
+    # العمود: (الجدول، المفتاح الأساسي)
+    COLUMNS = {
+        'preferences': ('users', 'user_id'),
+        'shortcuts': ('users', 'user_id'),
+        'settings': ('groups', 'group_id'),
+    }
+    
+    def __init__(self, pool: ConnectionPool, max_size: int = config.SETTINGS_CACHE_SIZE,
+                 flush_interval: float = config.SETTINGS_FLUSH_SECONDS, on_write=None):
+        self.pool = pool
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.on_write = on_write
+        self._entries = OrderedDict()
+        self._dirty = {}
+        self._missing = set()  # مفاتيح معلقة لا صف لها في الجدول بعد
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.parse_errors = 0
+        self.flushes = 0
+        self.rows_written = 0
+    
+    def start(self):
+        """بدء خيط كتابة التعديلات المعلقة"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._worker, name='hina-settings-flush', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """إيقاف الخيط وكتابة ما تبقى"""
+        self._stop_event.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+    
+    def _worker(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+    
+    def _parse(self, text: Optional[str]) -> Dict:
+        try:
+            value = json.loads(text or '{}')
+        except ValueError:
+            self.parse_errors += 1
+            return {}
+        return value if isinstance(value, dict) else {}
+    
+    def get(self, column: str, owner_id: int) -> types.MappingProxyType:
+        """القيمة المحللة للعمود (عرض للقراءة فقط)، وقاموس فارغ لصف غير موجود"""
+        table, key_column = self.COLUMNS[column]
+        key = (column, owner_id)
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        
+        with self.pool.reader() as conn:
+            row = conn.execute(f'SELECT {column} FROM {table} WHERE {key_column} = ?', (owner_id,)).fetchone()
+        value = types.MappingProxyType(self._parse(row[0] if row else None))
+        with self._lock:
+            # تعديل متزامن أثناء القراءة يسبق القيمة المقروءة من الجدول
+            current = self._lookup(key)
+            if current is not None:
+                return current
+            self._store(key, value)
+        return value
+    
+    def _lookup(self, key: tuple) -> Optional[types.MappingProxyType]:
+        """القيمة المعلقة أو المخزنة، أو None (يُستدعى مع القفل)"""
+        value = self._dirty.get(key)
+        return self._entries.get(key) if value is None else value
+    
+    def _store(self, key: tuple, value: types.MappingProxyType):
+        """تخزين قيمة في ترتيب LRU (يُستدعى مع القفل)"""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def update(self, column: str, owner_id: int, changes: Dict = None, remove=()) -> types.MappingProxyType:
+        """تعديل مفاتيح في القيمة (None يحذف المفتاح) مع تأجيل الكتابة"""
+        key = (column, owner_id)
+        self.get(column, owner_id)
+        with self._lock:
+            value = dict(self._lookup(key) or {})
+            for name, item in (changes or {}).items():
+                if item is None:
+                    value.pop(name, None)
+                else:
+                    value[name] = item
+            for name in remove:
+                value.pop(name, None)
+            value = types.MappingProxyType(value)
+            self._dirty[key] = value
+            self._store(key, value)
+        return value
+    
+    def flush(self) -> int:
+        """كتابة التعديلات المعلقة بمعاملة واحدة، وتعيد عدد الصفوف المكتوبة"""
+        with self._flush_lock:
+            with self._lock:
+                pending = dict(self._dirty)
+            if not pending:
+                return 0
+            
+            by_column = {}
+            for (column, owner_id), value in pending.items():
+                by_column.setdefault(column, []).append(
+                    (json.dumps(dict(value), ensure_ascii=False, separators=(',', ':')), owner_id))
+            missing = set()
+            try:
+                with self.pool.writer() as conn:
+                    for column, rows in by_column.items():
+                        table, key_column = self.COLUMNS[column]
+                        cursor = conn.executemany(f'UPDATE {table} SET {column} = ? WHERE {key_column} = ?', rows)
+                        if cursor.rowcount < len(rows):
+                            owners = [owner_id for _, owner_id in rows]
+                            existing = set()
+                            for start in range(0, len(owners), 500):
+                                chunk = owners[start:start + 500]
+                                existing.update(row[0] for row in conn.execute(
+                                    f'SELECT {key_column} FROM {table} '
+                                    f'WHERE {key_column} IN ({",".join("?" * len(chunk))})', chunk))
+                            missing.update((column, owner_id) for owner_id in owners if owner_id not in existing)
+            except Exception as e:
+                logging.error(f"خطأ في كتابة الإعدادات المعلقة ({len(pending)} صف): {e}")
+                return 0
+            
+            written = [key for key in pending if key not in missing]
+            with self._lock:
+                # القيم التي عُدلت مرة أخرى أثناء الكتابة تبقى للدفعة التالية، وكذلك قيم الصفوف
+                # غير الموجودة حتى يُنشأ صفها
+                for key in written:
+                    if self._dirty.get(key) is pending[key]:
+                        del self._dirty[key]
+                new_missing = missing - self._missing
+                self._missing = missing
+            if new_missing:
+                logging.warning(f"إعدادات معلقة لصفوف غير موجودة بعد، تُكتب عند إنشائها: "
+                                f"{', '.join(f'{column}:{owner_id}' for column, owner_id in sorted(new_missing))}")
+            self.flushes += 1
+            self.rows_written += len(written)
+        if self.on_write:
+            self.on_write([owner_id for column, owner_id in written if self.COLUMNS[column][0] == 'users'])
+        return len(written)
+    
+    def invalidate(self):
+        """إسقاط القيم غير المعدلة بعد كتابة خارجية على الجداول (كالاستعادة)"""
+        with self._lock:
+            for key in [key for key in self._entries if key not in self._dirty]:
+                del self._entries[key]
+    
+    def get_stats(self) -> Dict:
+        """نسبة الإصابة وعدد التعديلات المعلقة وعمليات الكتابة"""
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'dirty': len(self._dirty),
+            'missing_rows': len(self._missing),
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'parse_errors': self.parse_errors,
+        }
+
+class QueryMetrics:
+    """قياسات لكل دالة من دوال قاعدة البيانات: العدد ومدرج الزمن وانتظار الأقفال والصفوف
+    
+    يُفصل زمن انتظار اتصالات المجمع عن زمن تنفيذ الاستعلام نفسه، فيمكن التمييز
+    بين استعلام بطيء واستعلام ينتظر قفلاً.
+    """
+    
+    # حدود مدرج زمن الاستدعاء بالمللي ثانية، والعمود الأخير لما يتجاوز آخر حد
+    LATENCY_BOUNDS_MS = (1, 5, 10, 50, 100, 500, 1000)
+    
+    def __init__(self):
+        self._methods = {}
+        self._lock = threading.Lock()
+    
+    def record(self, name: str, latency: float, lock_wait: float, rows: int,
+               retries: int, failed: bool):
+        """إضافة نتيجة استدعاء واحد"""
+        latency_ms = latency * 1000
+        bucket = len(self.LATENCY_BOUNDS_MS)
+        for i, bound in enumerate(self.LATENCY_BOUNDS_MS):
+            if latency_ms <= bound:
+                bucket = i
+                break
+        with self._lock:
+            method = self._methods.get(name)
+            if method is None:
+                method = self._methods[name] = {
+                    'calls': 0, 'errors': 0, 'locked_retries': 0, 'rows_written': 0,
+                    'latency_total': 0.0, 'latency_max': 0.0, 'lock_wait_total': 0.0,
+                    'histogram': [0] * (len(self.LATENCY_BOUNDS_MS) + 1),
+                }
+            method['calls'] += 1
+            method['errors'] += failed
+            method['locked_retries'] += retries
+            method['rows_written'] += rows
+            method['latency_total'] += latency
+            method['latency_max'] = max(method['latency_max'], latency)
+            method['lock_wait_total'] += lock_wait
+            method['histogram'][bucket] += 1
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """نسخة من القياسات مع المتوسطات، مرتبة حسب الزمن الإجمالي"""
+        with self._lock:
+            methods = {name: dict(values, histogram=list(values['histogram']))
+                       for name, values in self._methods.items()}
+        for values in methods.values():
+            calls = values['calls']
+            values['latency_avg'] = values['latency_total'] / calls if calls else 0.0
+            values['query_time_total'] = max(0.0, values['latency_total'] - values['lock_wait_total'])
+        return dict(sorted(methods.items(), key=lambda item: item[1]['latency_total'], reverse=True))
+    
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+query_metrics = QueryMetrics()
+
+def instrument_methods(prefix: str = ''):
+    """مزخرف أصناف يغلّف كل دالة عامة بقياس الزمن وانتظار الأقفال والصفوف المعدلة
+    
+    إذا فشل الاستدعاء الخارجي بخطأ 'database is locked' (حتى لو التقطته الدالة
+    وسجلته) يُعاد بعد مهلة قصيرة حتى DB_LOCKED_RETRIES مرات.
+    """
+    def wrap(name, func):
+        metric_name = prefix + name
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = getattr(_call_context, 'stack', None)
+            if stack is None:
+                stack = _call_context.stack = []
+            outermost = not stack
+            retries = 0
+            started = time.perf_counter()
+            while True:
+                call = {'lock_wait': 0.0, 'rows': 0, 'locked': False}
+                stack.append(call)
+                failed = False
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    failed = True
+                    error = e
+                finally:
+                    stack.pop()
+                    if stack:
+                        stack[-1]['lock_wait'] += call['lock_wait']
+                        stack[-1]['rows'] += call['rows']
+                        stack[-1]['locked'] |= call['locked']
+                if call['locked'] and outermost and retries < config.DB_LOCKED_RETRIES:
+                    retries += 1
+                    time.sleep(config.DB_LOCKED_RETRY_DELAY_MS * retries / 1000)
+                    continue
+                break
+            query_metrics.record(metric_name, time.perf_counter() - started, call['lock_wait'],
+                                 call['rows'], retries, failed or call['locked'])
+            if failed:
+                raise error
+            return result
+        return wrapper
+    
+    def decorator(cls):
+        for name, func in list(vars(cls).items()):
+            if (name.startswith('_') or not inspect.isfunction(func)
+                    or inspect.isgeneratorfunction(func) or name == 'get_query_metrics'):
+                continue
+            setattr(cls, name, wrap(name, func))
+        return cls
+    return decorator
+
+@instrument_methods()
 class DatabaseManager:
-    def __init__(self, db_path: str = "hina_bot.db", json_backup_path: str = "users_backup.json"):
+    # الفهارس الثانوية المُدارة للجداول كثيرة الاستخدام
+    MANAGED_INDEXES = {
+        'idx_users_last_activity': 'CREATE INDEX IF NOT EXISTS idx_users_last_activity ON users(last_activity)',
+        'idx_logs_user_time': 'CREATE INDEX IF NOT EXISTS idx_logs_user_time ON logs(user_id, timestamp)',
+        'idx_logs_timestamp': 'CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)',
+        'idx_system_monitoring_timestamp':
+            'CREATE INDEX IF NOT EXISTS idx_system_monitoring_timestamp ON system_monitoring(timestamp)',
+        'idx_reminders_active_time':
+            'CREATE INDEX IF NOT EXISTS idx_reminders_active_time ON reminders(is_active, reminder_time)',
+        'idx_shortcuts_user_shortcut':
+            'CREATE INDEX IF NOT EXISTS idx_shortcuts_user_shortcut ON shortcuts(user_id, shortcut)',
+        'idx_reminders_user_active':
+            'CREATE INDEX IF NOT EXISTS idx_reminders_user_active ON reminders(user_id, is_active)',
+    }
+    
+    # الاستعلامات الساخنة كما تنفذها الدوال، ليُفحص في HOT_QUERIES النص نفسه الذي يعمل
+    ACTIVITY_WINDOW_SQL = 'SELECT user_id, last_activity FROM users WHERE last_activity > ?'
+    ACTIVE_USERS_PAGE_SQL = '''
+        SELECT user_id, username, first_name, last_activity
+        FROM users 
+        WHERE last_activity > ? AND user_id > ?
+        ORDER BY user_id
+        LIMIT ?
+    '''
+    LOG_RETENTION_BATCH_SQL = '''
+        SELECT id, command, timestamp, response_time, status FROM logs 
+        WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+    '''
+    LAST_SYSTEM_STATS_SQL = 'SELECT * FROM system_monitoring ORDER BY timestamp DESC LIMIT 1'
+    REMINDERS_WINDOW_SQL = '''
+        SELECT id, user_id, message, reminder_time, recurrence_pattern FROM reminders 
+        WHERE is_active = 1 AND reminder_time >= ? AND reminder_time <= ?
+          AND (reminder_time > ? OR id > ?)
+        ORDER BY reminder_time, id
+        LIMIT ?
+    '''
+    USER_ACTIVE_REMINDERS_COUNT_SQL = 'SELECT COUNT(*) FROM reminders WHERE user_id = ? AND is_active = 1'
+    # +is_active يمنع المخطط من اختيار idx_reminders_active_time لتجنب الفرز، وهو مسح لكل التذكيرات النشطة
+    USER_REMINDERS_SQL = '''
+        SELECT id, message, reminder_time, recurrence_pattern FROM reminders 
+        WHERE user_id = ? AND +is_active = 1 ORDER BY reminder_time
+    '''
+    SHORTCUT_LOOKUP_SQL = '''
+        SELECT id FROM shortcuts 
+        WHERE user_id = ? AND shortcut = ? AND group_id IS ? AND is_global = ?
+    '''
+    USER_SHORTCUTS_COUNT_SQL = 'SELECT COUNT(*) FROM shortcuts WHERE user_id = ?'
+    USER_SHORTCUTS_SQL = '''
+        SELECT id, group_id, shortcut, full_command, is_global, usage_count FROM shortcuts 
+        WHERE user_id = ? ORDER BY shortcut
+    '''
+    
+    # الاستعلامات الساخنة وما يجب أن يظهر في خطة تنفيذها (الاستعلام، المعاملات، جزء الخطة)
+    HOT_QUERIES = {
+        'activity_window': (ACTIVITY_WINDOW_SQL, ('2000-01-01',), 'INDEX idx_users_last_activity'),
+        'active_users_page': (ACTIVE_USERS_PAGE_SQL, ('2000-01-01', 0, 100), 'INTEGER PRIMARY KEY'),
+        'log_retention_batch': (LOG_RETENTION_BATCH_SQL, ('2000-01-01', 100), 'INDEX idx_logs_timestamp'),
+        'last_system_stats': (LAST_SYSTEM_STATS_SQL, (), 'INDEX idx_system_monitoring_timestamp'),
+        'reminders_window': (
+            REMINDERS_WINDOW_SQL, ('2000-01-01', '2000-01-02', '2000-01-01', 0, 100),
+            'INDEX idx_reminders_active_time'),
+        'user_active_reminders': (USER_ACTIVE_REMINDERS_COUNT_SQL, (0,), 'INDEX idx_reminders_user_active'),
+        'user_reminders': (USER_REMINDERS_SQL, (0,), 'INDEX idx_reminders_user_active'),
+        'shortcut_lookup': (SHORTCUT_LOOKUP_SQL, (0, '', None, False), 'INDEX idx_shortcuts_user_shortcut'),
+        'user_shortcuts_count': (USER_SHORTCUTS_COUNT_SQL, (0,), 'INDEX idx_shortcuts_user_shortcut'),
+        'user_shortcuts': (USER_SHORTCUTS_SQL, (0,), 'INDEX idx_shortcuts_user_shortcut'),
+    }
+    
+    # إضافة مستخدم أو تحديث بياناته الأساسية مع الإبقاء على join_date والعدادات والصلاحيات
+    USER_UPSERT_SQL = '''
+        INSERT INTO users 
+        (user_id, username, first_name, last_name, language_code, last_activity)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            last_activity = COALESCE(excluded.last_activity, last_activity)
+    '''
+    
+    # إضافة مجموعة أو تحديثها مع الإبقاء على join_date والإعدادات والكلمات المحظورة والردود
+    GROUP_UPSERT_SQL = '''
+        INSERT INTO groups 
+        (group_id, title, type, member_count, last_activity)
+        VALUES (?, ?, ?, COALESCE(?, 0), ?)
+        ON CONFLICT(group_id) DO UPDATE SET
+            title = excluded.title,
+            type = excluded.type,
+            member_count = COALESCE(?, member_count),
+            last_activity = COALESCE(excluded.last_activity, last_activity)
+    '''
+    
+    # ترحيلات المخطط المرتبة: (الإصدار، الوصف، الدالة، بناء فهارس دون معاملة واحدة)
+    MIGRATIONS = (
+        (1, 'الجداول الأساسية', '_migration_base_schema', False),
+        (2, 'فهارس الجداول كثيرة الاستخدام', '_migration_hot_indexes', True),
+        (3, 'جدول العدادات ومشغلاته', '_migration_counters', False),
+        (4, 'جدول التجميع الساعي للسجلات', '_migration_logs_hourly', False),
+        (5, 'فهرس تذكيرات المستخدم', '_migration_reminder_user_index', True),
+    )
+    
+    def __init__(self, db_path: str = config.DATABASE_PATH, json_backup_path: str = "users_backup.json"):
         self.db_path = db_path
         self.json_backup_path = json_backup_path
+        self.json_delta_path = os.path.splitext(json_backup_path)[0] + '.delta.jsonl'
         self.lock = threading.Lock()
+        self.pool = ConnectionPool(db_path)
+        
+        # سجل التغييرات: معرفات المستخدمين المعدلين منذ آخر نسخة احتياطية
+        self._dirty_users = set()
+        self._deltas_since_snapshot = 0
+        
+        # تقارير لقطات قاعدة البيانات (المدة والحجم)
+        self.snapshot_dir = config.BACKUP_DIR
+        self.last_snapshot_report = None
+        self._last_snapshot_time = 0.0
+        self.last_restore_report = None
+        self.last_retention_report = None
+        self.migration_report = []
+        
+        # نافذة المستخدمين النشطين خلال آخر 24 ساعة
+        self.activity_window = ActivityWindow()
+        
+        # ذاكرة مؤقتة واحدة للإحصائيات العامة تشترك فيها لوحة الويب والمراقبة وأوامر البوت
+        self.stats_cache = StatsCache(self._compute_stats)
+        
+        # ذاكرة LRU لسجلات المستخدمين الأكثر طلباً
+        self.user_cache = UserCache()
+        
+        # أعمدة JSON محللة مرة واحدة مع كتابة التعديلات على دفعات
+        self.settings_cache = JsonSettingsCache(self.pool, on_write=self._on_settings_written)
+        
         self.init_database()
+        self.load_activity_window()
+        
+        # مسار قراءة فقط للوحة الويب (يُنشأ بعد المخطط لأن mode=ro لا ينشئ الملف)
+        self.web = ReadOnlyDatabase(self)
+        # الحساب يمر عبر اتصالات الويب للقراءة فقط فلا يشغل قراء البوت ولا قفل الكتابة
+        self.stats_cache.compute = functools.partial(self._compute_stats, self.web.pool)
+        self.write_buffer = WriteBehindBuffer(self.pool, on_write=self._on_users_written)
+        
+        # الخيوط الخلفية لا تبدأ إلا باستدعاء start() صريح
+        self._started = False
+        self._stop_event = threading.Event()
+        self._backup_thread = None
+    
+    def start(self):
+        """بدء الخيوط الخلفية: الكتابة المؤجلة، كتابة الإعدادات، النسخ الاحتياطي التلقائي"""
+        if self._started:
+            return
+        self._started = True
+        self._stop_event.clear()
+        self.write_buffer.start()
+        self.settings_cache.start()
         self.start_auto_backup()
+        atexit.register(self.stop)
+    
+    def stop(self):
+        """إيقاف الخيوط الخلفية بعد كتابة كل ما هو معلق"""
+        self._stop_event.set()
+        if self._backup_thread is not None and self._backup_thread is not threading.current_thread():
+            self._backup_thread.join(timeout=5)
+        self._backup_thread = None
+        self.write_buffer.stop()
+        self.settings_cache.stop()
+        if self._started:
+            self._started = False
+            atexit.unregister(self.stop)
+    
+    def _mark_dirty(self, user_ids):
+        """تسجيل مستخدمين معدلين لتضمينهم في النسخة الاحتياطية التزايدية التالية"""
+        with self.lock:
+            self._dirty_users.update(user_ids)
+    
+    def _on_users_written(self, user_ids):
+        """تحديث سجل التغييرات ونافذة النشاط بعد كتابة نشاط مستخدمين"""
+        user_ids = list(user_ids)
+        self.user_cache.invalidate(user_ids)
+        self._mark_dirty(user_ids)
+        now = time.time()
+        for user_id in user_ids:
+            self.activity_window.touch(user_id, now)
+    
+    def _on_settings_written(self, user_ids):
+        """تحديث الذاكرة المؤقتة وسجل التغييرات بعد كتابة تفضيلات المستخدمين"""
+        if user_ids:
+            self.user_cache.invalidate(user_ids)
+            self._mark_dirty(user_ids)
+    
+    def load_activity_window(self):
+        """تعبئة نافذة النشاط من المستخدمين النشطين مؤخراً عند البدء"""
+        window = self.activity_window.window_buckets * self.activity_window.bucket_seconds
+        cutoff = datetime.datetime.now() - datetime.timedelta(seconds=window)
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.execute(self.ACTIVITY_WINDOW_SQL, (cutoff,))
+                for user_id, last_activity in cursor:
+                    try:
+                        when = datetime.datetime.fromisoformat(str(last_activity)).timestamp()
+                    except ValueError:
+                        continue
+                    self.activity_window.touch(user_id, when)
+        except Exception as e:
+            logging.error(f"خطأ في تحميل نافذة النشاط: {e}")
+    
+    def get_pool_stats(self) -> Dict:
+        """إحصائيات مجمع الاتصالات"""
+        return self.pool.get_stats()
+    
+    def get_user_cache_stats(self) -> Dict:
+        """إحصائيات ذاكرة المستخدمين المؤقتة"""
+        return self.user_cache.get_stats()
+    
+    def get_settings_cache_stats(self) -> Dict:
+        """إحصائيات ذاكرة أعمدة JSON المحللة"""
+        return self.settings_cache.get_stats()
+    
+    def get_query_metrics(self) -> Dict[str, Dict]:
+        """قياسات الزمن وانتظار الأقفال والصفوف المعدلة لكل دالة في قاعدة البيانات"""
+        return query_metrics.snapshot()
+    
+    def get_write_buffer_stats(self) -> Dict:
+        """إحصائيات طابور الكتابة المؤجلة"""
+        return self.write_buffer.get_stats()
+    
+    def flush_pending(self):
+        """كتابة السجلات وتحديثات النشاط المعلقة فوراً"""
+        self.write_buffer.flush()
+    
+    def close(self):
+        """تفريغ الكتابة المؤجلة وإغلاق الاتصالات"""
+        self.stop()
+        self.web.close()
+        self.pool.close()
     
     def init_database(self):
-        """إنشاء جداول قاعدة البيانات"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # جدول المستخدمين
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    last_name TEXT,
-                    language_code TEXT DEFAULT 'ar',
-                    timezone TEXT DEFAULT 'Asia/Riyadh',
-                    is_owner BOOLEAN DEFAULT FALSE,
-                    is_admin BOOLEAN DEFAULT FALSE,
-                    is_banned BOOLEAN DEFAULT FALSE,
-                    ban_reason TEXT,
-                    warnings INTEGER DEFAULT 0,
-                    join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    total_commands INTEGER DEFAULT 0,
-                    preferences TEXT DEFAULT '{}',
-                    shortcuts TEXT DEFAULT '{}'
-                )
-            ''')
-            
-            # جدول المجموعات
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS groups (
-                    group_id INTEGER PRIMARY KEY,
-                    title TEXT,
-                    type TEXT,
-                    description TEXT,
-                    invite_link TEXT,
-                    member_count INTEGER DEFAULT 0,
-                    admin_count INTEGER DEFAULT 0,
-                    join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    settings TEXT DEFAULT '{}',
-                    banned_words TEXT DEFAULT '[]',
-                    auto_responses TEXT DEFAULT '{}'
-                )
-            ''')
-            
-            # جدول التنبيهات
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS reminders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    message TEXT,
-                    reminder_time TIMESTAMP,
-                    is_recurring BOOLEAN DEFAULT FALSE,
-                    recurrence_pattern TEXT,
-                    is_active BOOLEAN DEFAULT TRUE,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-            
-            # جدول الاختصارات
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS shortcuts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    group_id INTEGER,
-                    shortcut TEXT,
-                    full_command TEXT,
-                    is_global BOOLEAN DEFAULT FALSE,
-                    created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    usage_count INTEGER DEFAULT 0,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id),
-                    FOREIGN KEY (group_id) REFERENCES groups (group_id)
-                )
-            ''')
-            
-            # جدول السجلات
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    group_id INTEGER,
-                    command TEXT,
-                    message TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    response_time REAL,
-                    status TEXT DEFAULT 'success'
-                )
-            ''')
-            
-            # جدول مراقبة النظام
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS system_monitoring (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    cpu_usage REAL,
-                    memory_usage REAL,
-                    disk_usage REAL,
-                    response_time REAL,
-                    active_users INTEGER,
-                    total_commands INTEGER,
-                    errors_count INTEGER
-                )
-            ''')
-            
-            conn.commit()
-            logging.info("تم إنشاء قاعدة البيانات بنجاح")
+        """إنشاء قاعدة البيانات أو ترقيتها إلى أحدث إصدار من المخطط"""
+        self.run_migrations()
+        logging.info("تم إنشاء قاعدة البيانات بنجاح")
+        
+        for name, problem in self.check_query_plans().items():
+            logging.warning(f"الاستعلام {name} لا يستخدم الفهرس المتوقع: {problem}")
+    
+    def get_schema_version(self) -> int:
+        """إصدار المخطط الحالي المخزن في PRAGMA user_version"""
+        with self.pool.reader() as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
+    
+    def run_migrations(self) -> List[Dict]:
+        """تطبيق الترحيلات غير المطبقة بالترتيب وتسجيل زمن كل منها
+        
+        كل ترحيل عادي يعمل في معاملة واحدة مع تحديث user_version، فإما أن يطبق كاملاً أو لا
+        يطبق. ترحيلات الفهارس تبني كل فهرس في معاملة قصيرة مستقلة حتى لا تحجز قفل الكتابة
+        طويلاً على قاعدة بيانات تعمل، ثم يُحدّث الإصدار بعد اكتمالها.
+        """
+        current = self.get_schema_version()
+        applied = []
+        for version, description, method_name, online in self.MIGRATIONS:
+            if version <= current:
+                continue
+            started = time.perf_counter()
+            method = getattr(self, method_name)
+            if online:
+                method()
+                with self.pool.writer() as conn:
+                    conn.execute(f'PRAGMA user_version = {int(version)}')
+            else:
+                with self.pool.writer() as conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    method(conn)
+                    conn.execute(f'PRAGMA user_version = {int(version)}')
+            duration = time.perf_counter() - started
+            applied.append({'version': version, 'description': description, 'duration': duration})
+            logging.info(f"تم تطبيق ترحيل قاعدة البيانات {version} ({description}) في {duration:.3f} ثانية")
+        self.migration_report = applied
+        return applied
+    
+    def _ensure_managed_indexes(self):
+        """إعادة بناء أي فهرس مُدار مفقود (شبكة أمان بعد العمليات التي تحذف الفهارس)"""
+        with self.pool.writer() as conn:
+            existing = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        missing = [name for name in self.MANAGED_INDEXES if name not in existing]
+        if missing:
+            logging.warning(f"فهارس مُدارة مفقودة، يعاد بناؤها: {', '.join(missing)}")
+            self._build_indexes_online(missing)
+    
+    def _build_indexes_online(self, names):
+        """بناء الفهارس واحداً تلو الآخر، كل فهرس في معاملة مستقلة"""
+        for name in names:
+            started = time.perf_counter()
+            with self.pool.writer() as conn:
+                conn.execute(self.MANAGED_INDEXES[name])
+            logging.info(f"تم بناء الفهرس {name} في {time.perf_counter() - started:.3f} ثانية")
+    
+    def _migration_base_schema(self, conn: sqlite3.Connection):
+        """الترحيل 1: إنشاء الجداول الأساسية"""
+        cursor = conn.cursor()
+        
+        # جدول المستخدمين
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                last_name TEXT,
+                language_code TEXT DEFAULT 'ar',
+                timezone TEXT DEFAULT 'Asia/Riyadh',
+                is_owner BOOLEAN DEFAULT FALSE,
+                is_admin BOOLEAN DEFAULT FALSE,
+                is_banned BOOLEAN DEFAULT FALSE,
+                ban_reason TEXT,
+                warnings INTEGER DEFAULT 0,
+                join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                total_commands INTEGER DEFAULT 0,
+                preferences TEXT DEFAULT '{}',
+                shortcuts TEXT DEFAULT '{}'
+            )
+        ''')
+        
+        # جدول المجموعات
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS groups (
+                group_id INTEGER PRIMARY KEY,
+                title TEXT,
+                type TEXT,
+                description TEXT,
+                invite_link TEXT,
+                member_count INTEGER DEFAULT 0,
+                admin_count INTEGER DEFAULT 0,
+                join_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                settings TEXT DEFAULT '{}',
+                banned_words TEXT DEFAULT '[]',
+                auto_responses TEXT DEFAULT '{}'
+            )
+        ''')
+        
+        # جدول التنبيهات
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                message TEXT,
+                reminder_time TIMESTAMP,
+                is_recurring BOOLEAN DEFAULT FALSE,
+                recurrence_pattern TEXT,
+                is_active BOOLEAN DEFAULT TRUE,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            )
+        ''')
+        
+        # جدول الاختصارات
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS shortcuts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                group_id INTEGER,
+                shortcut TEXT,
+                full_command TEXT,
+                is_global BOOLEAN DEFAULT FALSE,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                usage_count INTEGER DEFAULT 0,
+                FOREIGN KEY (user_id) REFERENCES users (user_id),
+                FOREIGN KEY (group_id) REFERENCES groups (group_id)
+            )
+        ''')
+        
+        # جدول السجلات
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                group_id INTEGER,
+                command TEXT,
+                message TEXT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                response_time REAL,
+                status TEXT DEFAULT 'success'
+            )
+        ''')
+        
+        # جدول مراقبة النظام
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS system_monitoring (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                cpu_usage REAL,
+                memory_usage REAL,
+                disk_usage REAL,
+                response_time REAL,
+                active_users INTEGER,
+                total_commands INTEGER,
+                errors_count INTEGER
+            )
+        ''')
+    
+    def _migration_counters(self, conn: sqlite3.Connection):
+        """الترحيل 3: عدادات إجمالية تحدّثها المشغلات بدلاً من COUNT و SUM في كل استعلام"""
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        # القيم الابتدائية من البيانات الحالية
+        cursor.execute('''
+            INSERT OR REPLACE INTO counters (name, value)
+            SELECT 'total_users', COUNT(*) FROM users
+            UNION ALL SELECT 'total_commands', COALESCE(SUM(total_commands), 0) FROM users
+            UNION ALL SELECT 'total_groups', COUNT(*) FROM groups
+        ''')
+        
+        for trigger_sql in (
+            '''CREATE TRIGGER IF NOT EXISTS trg_users_insert_counters AFTER INSERT ON users BEGIN
+                UPDATE counters SET value = value + 1 WHERE name = 'total_users';
+                UPDATE counters SET value = value + COALESCE(NEW.total_commands, 0) WHERE name = 'total_commands';
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_users_delete_counters AFTER DELETE ON users BEGIN
+                UPDATE counters SET value = value - 1 WHERE name = 'total_users';
+                UPDATE counters SET value = value - COALESCE(OLD.total_commands, 0) WHERE name = 'total_commands';
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_users_commands_counters AFTER UPDATE OF total_commands ON users
+            WHEN NEW.total_commands IS NOT OLD.total_commands BEGIN
+                UPDATE counters SET value = value + COALESCE(NEW.total_commands, 0) - COALESCE(OLD.total_commands, 0)
+                WHERE name = 'total_commands';
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_groups_insert_counters AFTER INSERT ON groups BEGIN
+                UPDATE counters SET value = value + 1 WHERE name = 'total_groups';
+            END''',
+            '''CREATE TRIGGER IF NOT EXISTS trg_groups_delete_counters AFTER DELETE ON groups BEGIN
+                UPDATE counters SET value = value - 1 WHERE name = 'total_groups';
+            END''',
+        ):
+            cursor.execute(trigger_sql)
+    
+    def get_counters(self) -> Dict[str, int]:
+        """قراءة العدادات الإجمالية المحفوظة"""
+        with self.pool.reader() as conn:
+            return {row['name']: row['value'] for row in conn.execute('SELECT name, value FROM counters')}
+    
+    # حدود أعمدة مدرج زمن الاستجابة بالثواني، والعمود الأخير لما يتجاوز آخر حد
+    LOG_HISTOGRAM_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    
+    def _migration_logs_hourly(self, conn: sqlite3.Connection):
+        """الترحيل 4: تجميع السجلات القديمة لكل ساعة ولكل أمر"""
+        histogram_columns = ',\n'.join(
+            f'                hist_{i} INTEGER DEFAULT 0' for i in range(len(self.LOG_HISTOGRAM_BOUNDS) + 1))
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS logs_hourly (
+                hour TEXT NOT NULL,
+                command TEXT NOT NULL,
+                count INTEGER DEFAULT 0,
+                error_count INTEGER DEFAULT 0,
+                response_time_sum REAL DEFAULT 0,
+                response_time_min REAL,
+                response_time_max REAL,
+{histogram_columns},
+                PRIMARY KEY (hour, command)
+            )
+        ''')
+    
+    def _migration_hot_indexes(self):
+        """الترحيل 2: فهارس الجداول كثيرة الاستخدام"""
+        self._build_indexes_online([
+            'idx_users_last_activity', 'idx_logs_user_time', 'idx_logs_timestamp',
+            'idx_system_monitoring_timestamp', 'idx_reminders_active_time',
+            'idx_shortcuts_user_shortcut',
+        ])
+    
+    def _migration_reminder_user_index(self):
+        """الترحيل 5: فهرس عدّ تذكيرات المستخدم النشطة وعرضها"""
+        self._build_indexes_online(['idx_reminders_user_active'])
+    
+    def explain_query(self, sql: str, params: tuple = ()) -> List[str]:
+        """خطة تنفيذ استعلام كما يعرضها EXPLAIN QUERY PLAN"""
+        with self.pool.uncached_reader() as conn:
+            return [row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+    
+    def check_query_plans(self) -> Dict[str, str]:
+        """التحقق من أن الاستعلامات الساخنة تستخدم فهارسها بدلاً من المسح الكامل
+        
+        تعيد قاموساً بالاستعلامات المخالفة وخطة تنفيذ كل منها، ويكون فارغاً عند السلامة.
+        """
+        problems = {}
+        for name, (sql, params, expected) in self.HOT_QUERIES.items():
+            try:
+                plan = self.explain_query(sql, params)
+            except sqlite3.Error as e:
+                problems[name] = str(e)
+                continue
+            if not any(expected in step for step in plan):
+                problems[name] = ' | '.join(plan)
+        return problems
     
     def add_user(self, user_id: int, username: str = None, first_name: str = None, 
                  last_name: str = None, language_code: str = 'ar') -> bool:
         """إضافة مستخدم جديد"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO users 
-                    (user_id, username, first_name, last_name, language_code, last_activity)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, username, first_name, last_name, language_code, datetime.datetime.now()))
-                conn.commit()
-                self.backup_to_json()
-                return True
+            with self.pool.writer() as conn:
+                conn.execute(self.USER_UPSERT_SQL, (user_id, username, first_name, last_name,
+                                                    language_code, datetime.datetime.now()))
+            self._on_users_written((user_id,))
+            return True
         except Exception as e:
             logging.error(f"خطأ في إضافة المستخدم: {e}")
             return False
     
+    def add_users_bulk(self, users, touch_activity: bool = False) -> int:
+        """إضافة أو تحديث مجموعة مستخدمين في معاملة واحدة (مثل أعضاء مجموعة)
+        
+        users: قواميس تحتوي user_id ويمكن أن تحتوي username و first_name و last_name
+        و language_code. لا يُعدّل last_activity إلا مع touch_activity، فالاستيراد
+        لا يعني أن العضو نشط. تعيد عدد الصفوف المكتوبة.
+        """
+        now = datetime.datetime.now() if touch_activity else None
+        user_ids = []
+        
+        def rows():
+            for user in users:
+                user_ids.append(user['user_id'])
+                yield (user['user_id'], user.get('username'), user.get('first_name'),
+                       user.get('last_name'), user.get('language_code') or 'ar', now)
+        
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany(self.USER_UPSERT_SQL, rows())
+        except Exception as e:
+            logging.error(f"خطأ في الإضافة المجمعة للمستخدمين: {e}")
+            return 0
+        
+        if touch_activity:
+            self._on_users_written(user_ids)
+        else:
+            self.user_cache.invalidate(user_ids)
+            self._mark_dirty(user_ids)
+        return len(user_ids)
+    
     def get_user(self, user_id: int) -> Optional[Dict]:
         """الحصول على بيانات مستخدم"""
+        return self._get_user(user_id, self.pool)
+    
+    def _get_user(self, user_id: int, pool: ConnectionPool) -> Optional[Dict]:
+        """قراءة مستخدم عبر الذاكرة المؤقتة ثم من المجمع المحدد"""
+        cached = self.user_cache.get(user_id)
+        if cached is not UserCache._MISSING:
+            return cached
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            generation = self.user_cache.generation()
+            with pool.reader() as conn:
                 cursor = conn.cursor()
                 cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
                 row = cursor.fetchone()
-                return dict(row) if row else None
+            user = dict(row) if row else None
+            self.user_cache.put(user_id, user, generation)
+            return user
         except Exception as e:
             logging.error(f"خطأ في الحصول على بيانات المستخدم: {e}")
             return None
@@ -163,45 +1389,97 @@ class DatabaseManager:
     def update_user_activity(self, user_id: int):
         """تحديث آخر نشاط للمستخدم"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     UPDATE users 
                     SET last_activity = ?, total_commands = total_commands + 1
                     WHERE user_id = ?
                 ''', (datetime.datetime.now(), user_id))
-                conn.commit()
+            self._on_users_written((user_id,))
         except Exception as e:
             logging.error(f"خطأ في تحديث نشاط المستخدم: {e}")
     
+    def set_user_banned(self, user_id: int, banned: bool = True, reason: str = None) -> bool:
+        """حظر مستخدم أو إلغاء حظره"""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('UPDATE users SET is_banned = ?, ban_reason = ? WHERE user_id = ?',
+                             (banned, reason if banned else None, user_id))
+            self.user_cache.invalidate((user_id,))
+            self._mark_dirty((user_id,))
+            return True
+        except Exception as e:
+            logging.error(f"خطأ في تحديث حظر المستخدم: {e}")
+            return False
+    
+    def set_user_admin(self, user_id: int, is_admin: bool = True) -> bool:
+        """منح صلاحية الإشراف لمستخدم أو سحبها"""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('UPDATE users SET is_admin = ? WHERE user_id = ?', (is_admin, user_id))
+            self.user_cache.invalidate((user_id,))
+            self._mark_dirty((user_id,))
+            return True
+        except Exception as e:
+            logging.error(f"خطأ في تحديث صلاحيات المستخدم: {e}")
+            return False
+    
     def add_group(self, group_id: int, title: str, group_type: str = 'group') -> bool:
         """إضافة مجموعة جديدة"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO groups 
-                    (group_id, title, type, last_activity)
-                    VALUES (?, ?, ?, ?)
-                ''', (group_id, title, group_type, datetime.datetime.now()))
-                conn.commit()
+            with self.pool.writer() as conn:
+                conn.execute(self.GROUP_UPSERT_SQL,
+                             (group_id, title, group_type, None, datetime.datetime.now(), None))
                 return True
         except Exception as e:
             logging.error(f"خطأ في إضافة المجموعة: {e}")
             return False
     
+    def upsert_groups_bulk(self, groups) -> int:
+        """إضافة أو تحديث مجموعة من المجموعات في معاملة واحدة
+        
+        groups: قواميس تحتوي group_id و title ويمكن أن تحتوي type و member_count.
+        تعيد عدد الصفوف المكتوبة.
+        """
+        now = datetime.datetime.now()
+        count = 0
+        
+        def rows():
+            nonlocal count
+            for group in groups:
+                count += 1
+                member_count = group.get('member_count')
+                yield (group['group_id'], group.get('title'), group.get('type', 'group'),
+                       member_count, now, member_count)
+        
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany(self.GROUP_UPSERT_SQL, rows())
+            return count
+        except Exception as e:
+            logging.error(f"خطأ في الإضافة المجمعة للمجموعات: {e}")
+            return 0
+    
     def log_command(self, user_id: int, group_id: int, command: str, 
                    response_time: float, status: str = 'success'):
         """تسجيل استخدام الأوامر"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO logs 
                     (user_id, group_id, command, response_time, status)
                     VALUES (?, ?, ?, ?, ?)
                 ''', (user_id, group_id, command, response_time, status))
-                conn.commit()
+        except Exception as e:
+            logging.error(f"خطأ في تسجيل الأمر: {e}")
+    
+    def record_command(self, user_id: int, group_id: int, command: str,
+                       response_time: float = 0, status: str = 'success'):
+        """تسجيل أمر منفذ وتحديث نشاط المستخدم عبر الكتابة المؤجلة"""
+        try:
+            self.write_buffer.put(user_id, group_id, command, response_time, status)
         except Exception as e:
             logging.error(f"خطأ في تسجيل الأمر: {e}")
     
@@ -210,7 +1488,7 @@ class DatabaseManager:
                         active_users: int, total_commands: int, errors_count: int):
         """تسجيل إحصائيات النظام"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.writer() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     INSERT INTO system_monitoring 
@@ -219,49 +1497,434 @@ class DatabaseManager:
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 ''', (cpu_usage, memory_usage, disk_usage, response_time, 
                       active_users, total_commands, errors_count))
-                conn.commit()
         except Exception as e:
             logging.error(f"خطأ في تسجيل إحصائيات النظام: {e}")
     
-    def backup_to_json(self):
-        """إنشاء نسخة احتياطية JSON"""
+    def add_reminder(self, user_id: int, message: str, reminder_time: datetime.datetime,
+                     recurrence_pattern: str = None) -> Optional[int]:
+        """إضافة تذكير جديد، وتعيد معرفه أو None عند تجاوز الحد أو حدوث خطأ"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                # نسخ احتياطي للمستخدمين
-                cursor.execute('SELECT * FROM users')
-                users = [dict(row) for row in cursor.fetchall()]
-                
-                # نسخ احتياطي للمجموعات
-                cursor.execute('SELECT * FROM groups')
-                groups = [dict(row) for row in cursor.fetchall()]
-                
-                # نسخ احتياطي للتنبيهات
-                cursor.execute('SELECT * FROM reminders WHERE is_active = 1')
-                reminders = [dict(row) for row in cursor.fetchall()]
+            with self.pool.writer() as conn:
+                active = conn.execute(self.USER_ACTIVE_REMINDERS_COUNT_SQL, (user_id,)).fetchone()[0]
+                if active >= config.MAX_REMINDERS_PER_USER:
+                    return None
+                cursor = conn.execute('''
+                    INSERT INTO reminders 
+                    (user_id, message, reminder_time, is_recurring, recurrence_pattern)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_id, message, reminder_time.strftime('%Y-%m-%d %H:%M:%S'),
+                      recurrence_pattern is not None, recurrence_pattern))
+                return cursor.lastrowid
+        except Exception as e:
+            logging.error(f"خطأ في إضافة التذكير: {e}")
+            return None
+    
+    def get_user_reminders(self, user_id: int) -> List[Dict]:
+        """تذكيرات المستخدم النشطة مرتبة حسب موعدها"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.execute(self.USER_REMINDERS_SQL, (user_id,))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"خطأ في الحصول على التذكيرات: {e}")
+            return []
+    
+    def cancel_reminder(self, user_id: int, reminder_id: int) -> bool:
+        """إلغاء تذكير نشط يملكه المستخدم"""
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.execute(
+                    'UPDATE reminders SET is_active = 0 WHERE id = ? AND user_id = ? AND is_active = 1',
+                    (reminder_id, user_id))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"خطأ في إلغاء التذكير: {e}")
+            return False
+    
+    def get_reminders_after(self, after_time: str, after_id: int, until: str,
+                            limit: int = config.REMINDER_LOAD_BATCH) -> List[Dict]:
+        """التذكيرات النشطة التالية للمفتاح (after_time, after_id) حتى الموعد until
+        
+        الترتيب (reminder_time, id) هو ترتيب الفهرس idx_reminders_active_time نفسه، فكل
+        دفعة بحث في نطاق من الفهرس دون فرز أو مسح للجدول.
+        """
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.execute(self.REMINDERS_WINDOW_SQL, (after_time, until, after_time, after_id, limit))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"خطأ في تحميل التذكيرات: {e}")
+            return []
+    
+    def complete_reminders(self, finished_ids: List[int], rescheduled: List[tuple]) -> bool:
+        """تعطيل التذكيرات المرسلة وتحديث موعد المتكررة منها في معاملة واحدة
+        
+        rescheduled: أزواج (الموعد التالي كنص، المعرف).
+        """
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany('UPDATE reminders SET is_active = 0 WHERE id = ?',
+                                 [(reminder_id,) for reminder_id in finished_ids])
+                conn.executemany('UPDATE reminders SET reminder_time = ? WHERE id = ?', rescheduled)
+            return True
+        except Exception as e:
+            logging.error(f"خطأ في تحديث التذكيرات المرسلة: {e}")
+            return False
+    
+    def get_group_banned_words(self, group_id: int) -> List[str]:
+        """قائمة الكلمات المحظورة في مجموعة"""
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute('SELECT banned_words FROM groups WHERE group_id = ?', (group_id,)).fetchone()
+            return json.loads(row['banned_words'] or '[]') if row else []
+        except Exception as e:
+            logging.error(f"خطأ في الحصول على الكلمات المحظورة: {e}")
+            return []
+    
+    def set_group_banned_words(self, group_id: int, words: List[str]) -> bool:
+        """حفظ قائمة الكلمات المحظورة لمجموعة"""
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.execute('UPDATE groups SET banned_words = ? WHERE group_id = ?',
+                                      (json.dumps(words, ensure_ascii=False), group_id))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"خطأ في حفظ الكلمات المحظورة: {e}")
+            return False
+    
+    def get_group_auto_responses(self, group_id: int) -> Dict:
+        """الردود التلقائية لمجموعة كما هي مخزنة"""
+        try:
+            with self.pool.reader() as conn:
+                row = conn.execute('SELECT auto_responses FROM groups WHERE group_id = ?', (group_id,)).fetchone()
+            return json.loads(row['auto_responses'] or '{}') if row else {}
+        except Exception as e:
+            logging.error(f"خطأ في الحصول على الردود التلقائية: {e}")
+            return {}
+    
+    def set_group_auto_responses(self, group_id: int, responses: Dict) -> bool:
+        """حفظ الردود التلقائية لمجموعة"""
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.execute('UPDATE groups SET auto_responses = ? WHERE group_id = ?',
+                                      (json.dumps(responses, ensure_ascii=False), group_id))
+                return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"خطأ في حفظ الردود التلقائية: {e}")
+            return False
+    
+    def get_user_preferences(self, user_id: int) -> types.MappingProxyType:
+        """تفضيلات المستخدم المحللة (للقراءة فقط)"""
+        return self.settings_cache.get('preferences', user_id)
+    
+    def set_user_preferences(self, user_id: int, **changes) -> types.MappingProxyType:
+        """تعديل تفضيلات المستخدم (القيمة None تحذف المفتاح)، وتُكتب مع الدفعة التالية"""
+        return self.settings_cache.update('preferences', user_id, changes)
+    
+    def get_user_json_shortcuts(self, user_id: int) -> types.MappingProxyType:
+        """عمود users.shortcuts المحلل (للقراءة فقط)"""
+        return self.settings_cache.get('shortcuts', user_id)
+    
+    def get_group_settings(self, group_id: int) -> types.MappingProxyType:
+        """إعدادات المجموعة المحللة (للقراءة فقط)"""
+        return self.settings_cache.get('settings', group_id)
+    
+    def set_group_settings(self, group_id: int, **changes) -> types.MappingProxyType:
+        """تعديل إعدادات المجموعة (القيمة None تحذف المفتاح)، وتُكتب مع الدفعة التالية"""
+        return self.settings_cache.update('settings', group_id, changes)
+    
+    def iter_shortcuts(self, batch_size: int = config.ACTIVE_USERS_BATCH_ROWS):
+        """مولد يمر على كل الاختصارات على دفعات مرتبة حسب المعرف"""
+        after_id = 0
+        while True:
+            try:
+                with self.pool.reader() as conn:
+                    rows = conn.execute('''
+                        SELECT id, user_id, group_id, shortcut, full_command, is_global FROM shortcuts 
+                        WHERE id > ? ORDER BY id LIMIT ?
+                    ''', (after_id, batch_size)).fetchall()
+            except Exception as e:
+                logging.error(f"خطأ في تحميل الاختصارات: {e}")
+                return
+            for row in rows:
+                yield dict(row)
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]['id']
+    
+    def add_shortcut(self, user_id: int, shortcut: str, full_command: str,
+                     group_id: int = None, is_global: bool = False) -> Optional[int]:
+        """إضافة اختصار أو تحديث أمره إن وُجد في النطاق نفسه
+        
+        تعيد معرف الاختصار، أو None عند تجاوز MAX_SHORTCUTS_PER_USER أو حدوث خطأ.
+        """
+        try:
+            with self.pool.writer() as conn:
+                existing = conn.execute(self.SHORTCUT_LOOKUP_SQL, (user_id, shortcut, group_id, is_global)).fetchone()
+                if existing:
+                    conn.execute('UPDATE shortcuts SET full_command = ? WHERE id = ?',
+                                 (full_command, existing['id']))
+                    return existing['id']
                 
-                backup_data = {
-                    'backup_date': datetime.datetime.now().isoformat(),
-                    'users': users,
-                    'groups': groups,
-                    'reminders': reminders,
-                    'total_users': len(users),
-                    'total_groups': len(groups),
-                    'total_reminders': len(reminders)
-                }
+                count = conn.execute(self.USER_SHORTCUTS_COUNT_SQL, (user_id,)).fetchone()[0]
+                if count >= config.MAX_SHORTCUTS_PER_USER:
+                    return None
+                cursor = conn.execute('''
+                    INSERT INTO shortcuts (user_id, group_id, shortcut, full_command, is_global)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (user_id, group_id, shortcut, full_command, is_global))
+                return cursor.lastrowid
+        except Exception as e:
+            logging.error(f"خطأ في إضافة الاختصار: {e}")
+            return None
+    
+    def delete_shortcut(self, user_id: int, shortcut: str, group_id: int = None,
+                        is_global: bool = False) -> Optional[int]:
+        """حذف اختصار من نطاقه، وتعيد معرفه أو None إن لم يوجد"""
+        try:
+            with self.pool.writer() as conn:
+                row = conn.execute(self.SHORTCUT_LOOKUP_SQL, (user_id, shortcut, group_id, is_global)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('DELETE FROM shortcuts WHERE id = ?', (row['id'],))
+                return row['id']
+        except Exception as e:
+            logging.error(f"خطأ في حذف الاختصار: {e}")
+            return None
+    
+    def get_user_shortcuts(self, user_id: int) -> List[Dict]:
+        """اختصارات المستخدم مع عدد مرات استخدامها"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.execute(self.USER_SHORTCUTS_SQL, (user_id,))
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logging.error(f"خطأ في الحصول على الاختصارات: {e}")
+            return []
+    
+    def add_shortcut_usage(self, counts: Dict[int, int]) -> bool:
+        """إضافة عدد مرات الاستخدام المتراكمة لعدة اختصارات في معاملة واحدة"""
+        if not counts:
+            return True
+        try:
+            with self.pool.writer() as conn:
+                conn.executemany('UPDATE shortcuts SET usage_count = usage_count + ? WHERE id = ?',
+                                 [(count, shortcut_id) for shortcut_id, count in counts.items()])
+            return True
+        except Exception as e:
+            logging.error(f"خطأ في تحديث استخدام الاختصارات: {e}")
+            return False
+    
+    # الجداول المضمنة في النسخة الاحتياطية JSON مع استعلام كل منها
+    JSON_BACKUP_TABLES = (
+        ('users', 'SELECT * FROM users'),
+        ('groups', 'SELECT * FROM groups'),
+        ('reminders', 'SELECT * FROM reminders WHERE is_active = 1'),
+    )
+    
+    def backup_to_json(self, json_file_path: str = None, compress: bool = None):
+        """إنشاء نسخة احتياطية JSON
+        
+        تُقرأ الصفوف على دفعات وتُكتب مباشرة إلى الملف (صف في كل سطر) فيبقى استهلاك
+        الذاكرة ثابتاً مهما كبر عدد المستخدمين. يُضغط الملف بـ gzip إذا انتهى بـ .gz.
+        """
+        file_path = json_file_path or self.json_backup_path
+        if compress is None:
+            compress = file_path.endswith('.gz')
+        is_default_path = json_file_path is None
+        
+        # التغييرات التي تحدث أثناء النسخ تذهب إلى الدفعة التزايدية التالية
+        if is_default_path:
+            with self.lock:
+                dirty_users, self._dirty_users = self._dirty_users, set()
+        temp_path = file_path + '.tmp'
+        try:
+            opener = gzip.open if compress else open
+            with self.pool.reader() as conn, opener(temp_path, 'wt', encoding='utf-8') as f:
+                f.write('{\n')
+                f.write(f'"backup_date": {json.dumps(datetime.datetime.now().isoformat())},\n')
+                totals = {}
                 
-                with open(self.json_backup_path, 'w', encoding='utf-8') as f:
-                    json.dump(backup_data, f, ensure_ascii=False, indent=2, default=str)
+                for table, query in self.JSON_BACKUP_TABLES:
+                    cursor = conn.execute(query)
+                    f.write(f'"{table}": [')
+                    count = 0
+                    while True:
+                        rows = cursor.fetchmany(config.JSON_BACKUP_CHUNK_ROWS)
+                        if not rows:
+                            break
+                        for row in rows:
+                            f.write(',\n' if count else '\n')
+                            f.write(json.dumps(dict(row), ensure_ascii=False, default=str))
+                            count += 1
+                    f.write('\n],\n')
+                    totals[f'total_{table}'] = count
                 
-                logging.info(f"تم إنشاء نسخة احتياطية JSON: {self.json_backup_path}")
+                f.write(',\n'.join(f'"{key}": {value}' for key, value in totals.items()))
+                f.write('\n}\n')
+            os.replace(temp_path, file_path)
+            
+            # اللقطة الكاملة تحتوي كل التغييرات السابقة فلا حاجة لسجل الفروقات
+            if is_default_path:
+                if os.path.exists(self.json_delta_path):
+                    os.remove(self.json_delta_path)
+                self._deltas_since_snapshot = 0
+            
+            logging.info(f"تم إنشاء نسخة احتياطية JSON: {file_path}")
                 
         except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if is_default_path:
+                self._mark_dirty(dirty_users)
             logging.error(f"خطأ في إنشاء النسخة الاحتياطية JSON: {e}")
     
+    def backup_incremental(self) -> int:
+        """إلحاق المستخدمين المعدلين فقط بسجل الفروقات، مع الدمج الدوري في لقطة كاملة"""
+        if (not os.path.exists(self.json_backup_path) or
+                self._deltas_since_snapshot >= config.JSON_BACKUP_COMPACT_EVERY):
+            self.backup_to_json()
+            return 0
+        
+        with self.lock:
+            dirty_users, self._dirty_users = self._dirty_users, set()
+        if not dirty_users:
+            return 0
+        
+        try:
+            backup_date = datetime.datetime.now().isoformat()
+            ids = list(dirty_users)
+            with self.pool.reader() as conn, \
+                    open(self.json_delta_path, 'a', encoding='utf-8') as f:
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor = conn.execute(
+                        f'SELECT * FROM users WHERE user_id IN ({placeholders})', chunk)
+                    for row in cursor:
+                        f.write(json.dumps({'backup_date': backup_date, 'table': 'users',
+                                            'row': dict(row)}, ensure_ascii=False, default=str))
+                        f.write('\n')
+            self._deltas_since_snapshot += 1
+            logging.info(f"تم إلحاق {len(ids)} مستخدم بالنسخة الاحتياطية التزايدية")
+            return len(ids)
+        except Exception as e:
+            self._mark_dirty(dirty_users)
+            logging.error(f"خطأ في النسخة الاحتياطية التزايدية: {e}")
+            return 0
+    
+    def create_snapshot(self) -> Optional[Dict]:
+        """إنشاء لقطة من قاعدة البيانات بواجهة النسخ الاحتياطي الحية في SQLite
+        
+        النسخ يتم في خطوة واحدة داخل معاملة قراءة: في نمط WAL لا تحجز القراءة قفل الكتابة،
+        بينما النسخ على دفعات يُعاد من البداية مع كل كتابة بين الدفعات فلا ينتهي أبداً
+        على قاعدة بيانات تكتب فيها الكتابة المؤجلة كل نصف ثانية.
+        """
+        base_name = os.path.splitext(os.path.basename(self.db_path))[0]
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        target_path = os.path.join(self.snapshot_dir, f'{base_name}-{stamp}.db')
+        temp_path = target_path + '.tmp'
+        
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            started = time.perf_counter()
+            target = sqlite3.connect(temp_path)
+            try:
+                with self.pool.reader() as conn:
+                    conn.backup(target, pages=-1)
+            finally:
+                target.close()
+            os.replace(temp_path, target_path)
+            
+            report = {
+                'path': target_path,
+                'created_at': datetime.datetime.now().isoformat(),
+                'duration': time.perf_counter() - started,
+                'size': os.path.getsize(target_path),
+                'removed': self._rotate_snapshots(base_name),
+            }
+            self.last_snapshot_report = report
+            self._last_snapshot_time = time.time()
+            logging.info(f"تم إنشاء لقطة قاعدة البيانات: {target_path} "
+                         f"({report['size']} بايت في {report['duration']:.2f} ثانية)")
+            return report
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            logging.error(f"خطأ في إنشاء لقطة قاعدة البيانات: {e}")
+            return None
+    
+    def _rotate_snapshots(self, base_name: str) -> List[str]:
+        """حذف أقدم اللقطات والإبقاء على MAX_BACKUP_FILES فقط"""
+        snapshots = sorted(
+            name for name in os.listdir(self.snapshot_dir)
+            if name.startswith(f'{base_name}-') and name.endswith('.db')
+        )
+        removed = []
+        for name in snapshots[:max(0, len(snapshots) - config.MAX_BACKUP_FILES)]:
+            os.remove(os.path.join(self.snapshot_dir, name))
+            removed.append(name)
+        return removed
+    
+    def get_snapshot_report(self) -> Optional[Dict]:
+        """تقرير آخر لقطة لقاعدة البيانات"""
+        return self.last_snapshot_report
+    
+    def _iter_json_backup(self, file_path: str):
+        """قراءة صفوف النسخة الاحتياطية على دفعات (الجدول، قائمة الصفوف)
+        
+        الصيغة الحالية تكتب كل صف في سطر مستقل فتُقرأ بشكل متدفق، أما النسخ القديمة
+        المنسقة بمسافات فتُحمّل كاملة كما كان سابقاً.
+        """
+        chunk_rows = config.JSON_BACKUP_CHUNK_ROWS
+        opener = gzip.open if file_path.endswith('.gz') else open
+        with opener(file_path, 'rt', encoding='utf-8') as f:
+            first_line = f.readline()
+            second_line = f.readline()
+            
+            if not second_line.startswith('"backup_date"'):
+                backup_data = json.loads(first_line + second_line + f.read())
+                for table, _ in self.JSON_BACKUP_TABLES:
+                    rows = backup_data.get(table, [])
+                    for start in range(0, len(rows), chunk_rows):
+                        yield table, rows[start:start + chunk_rows]
+                return
+            
+            # تُحلل الأسطر على دفعات كمصفوفة JSON واحدة لتقليل كلفة الاستدعاء لكل صف
+            table, lines = None, []
+            for line in f:
+                if line.startswith('{') and table:
+                    lines.append(line)
+                    if len(lines) < chunk_rows:
+                        continue
+                elif line.startswith('"') and line.rstrip().endswith('['):
+                    table = json.loads(line.split(':', 1)[0])
+                    continue
+                elif not line.startswith(']'):
+                    continue
+                
+                if lines:
+                    yield table, json.loads('[' + ''.join(lines).rstrip().rstrip(',') + ']')
+                    lines = []
+                if line.startswith(']'):
+                    table = None
+        
+        # تطبيق الفروقات المسجلة بعد اللقطة الكاملة
+        delta_path = os.path.splitext(file_path)[0] + '.delta.jsonl'
+        if os.path.exists(delta_path):
+            with open(delta_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        yield entry['table'], [entry['row']]
+    
     def restore_from_json(self, json_file_path: str = None) -> bool:
-        """استعادة البيانات من ملف JSON"""
+        """استعادة البيانات من ملف JSON
+        
+        تُستعاد كل الجداول المحفوظة في معاملة واحدة باستخدام executemany على دفعات،
+        وتُحذف الفهارس الثانوية قبل التحميل ثم يعاد بناؤها بعده داخل المعاملة نفسها، فإن
+        فشل التحميل عادت الفهارس مع الصفوف.
+        """
         try:
             file_path = json_file_path or self.json_backup_path
             
@@ -269,68 +1932,101 @@ class DatabaseManager:
                 logging.error(f"ملف النسخة الاحتياطية غير موجود: {file_path}")
                 return False
             
-            with open(file_path, 'r', encoding='utf-8') as f:
-                backup_data = json.load(f)
+            self.flush_pending()
+            started = time.perf_counter()
+            tables = [table for table, _ in self.JSON_BACKUP_TABLES]
+            counts = dict.fromkeys(tables, 0)
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # استعادة المستخدمين
-                for user in backup_data.get('users', []):
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO users 
-                        (user_id, username, first_name, last_name, language_code, 
-                         timezone, is_owner, is_admin, is_banned, ban_reason, 
-                         warnings, join_date, last_activity, total_commands, 
-                         preferences, shortcuts)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (user.get('user_id'), user.get('username'), 
-                          user.get('first_name'), user.get('last_name'),
-                          user.get('language_code', 'ar'), user.get('timezone', 'Asia/Riyadh'),
-                          user.get('is_owner', False), user.get('is_admin', False),
-                          user.get('is_banned', False), user.get('ban_reason'),
-                          user.get('warnings', 0), user.get('join_date'),
-                          user.get('last_activity'), user.get('total_commands', 0),
-                          user.get('preferences', '{}'), user.get('shortcuts', '{}')))
-                
-                conn.commit()
-                logging.info("تم استعادة البيانات من JSON بنجاح")
-                return True
+            try:
+                with self.pool.writer() as conn:
+                    # المعاملة تبدأ قبل حذف الفهارس: sqlite3 لا يفتحها إلا قبل أول DML، فكان كل
+                    # DROP INDEX يُثبّت وحده وتبقى الفهارس محذوفة إن فشل التحميل بعده
+                    conn.execute('BEGIN IMMEDIATE')
+                    cursor = conn.cursor()
+                    columns = {
+                        table: {row['name'] for row in cursor.execute(f'PRAGMA table_info({table})')}
+                        for table in tables
+                    }
+                    
+                    # حذف الفهارس الثانوية مؤقتاً لأن بناءها مرة واحدة أسرع من تحديثها مع كل صف
+                    placeholders = ','.join('?' * len(tables))
+                    indexes = cursor.execute(f'''
+                        SELECT name, sql FROM sqlite_master 
+                        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+                    ''', tables).fetchall()
+                    for index in indexes:
+                        cursor.execute(f'DROP INDEX "{index["name"]}"')
+                    
+                    # تُكتب كل دفعة بـ executemany، ويُجمع كل شكل أعمدة مختلف في دفعة مستقلة
+                    for table, rows in self._iter_json_backup(file_path):
+                        if table not in columns:
+                            continue
+                        shapes = set(map(tuple, rows))
+                        if len(shapes) == 1:
+                            groups = {shapes.pop(): rows}
+                        else:
+                            groups = {}
+                            for row in rows:
+                                groups.setdefault(tuple(row), []).append(row)
+                        for row_keys, group in groups.items():
+                            keys = tuple(key for key in row_keys if key in columns[table])
+                            if not keys:
+                                continue
+                            getter = operator.itemgetter(*keys)
+                            values = map(getter, group) if len(keys) > 1 else ((getter(row),) for row in group)
+                            cursor.executemany(
+                                f'INSERT OR REPLACE INTO {table} ({", ".join(keys)}) '
+                                f'VALUES ({", ".join("?" * len(keys))})', values)
+                            counts[table] += len(group)
+                    
+                    for index in indexes:
+                        cursor.execute(index['sql'])
+            finally:
+                self._ensure_managed_indexes()
+            self.user_cache.invalidate()
+            self.settings_cache.invalidate()
+            
+            duration = time.perf_counter() - started
+            total_rows = sum(counts.values())
+            self.last_restore_report = {
+                'file': file_path,
+                'rows': counts,
+                'duration': duration,
+                'rows_per_sec': total_rows / duration if duration else 0.0,
+            }
+            logging.info(f"تم استعادة البيانات من JSON بنجاح: {total_rows} صف في {duration:.2f} ثانية "
+                         f"({self.last_restore_report['rows_per_sec']:.0f} صف/ثانية)")
+            return True
                 
         except Exception as e:
             logging.error(f"خطأ في استعادة البيانات من JSON: {e}")
             return False
     
-    def get_stats(self) -> Dict:
-        """الحصول على إحصائيات عامة"""
+    def get_stats(self, max_age: float = None) -> Dict:
+        """الحصول على إحصائيات عامة (من الذاكرة المؤقتة إن كانت أحدث من max_age ثانية)"""
+        return self.stats_cache.get(max_age)
+    
+    def get_stats_cache_stats(self) -> Dict:
+        """إحصائيات الذاكرة المؤقتة للإحصائيات العامة"""
+        return self.stats_cache.get_stats()
+    
+    def _compute_stats(self, pool: ConnectionPool = None) -> Dict:
+        """حساب الإحصائيات العامة من قاعدة البيانات"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with (pool or self.pool).reader() as conn:
                 cursor = conn.cursor()
                 
-                # عدد المستخدمين
-                cursor.execute('SELECT COUNT(*) FROM users')
-                total_users = cursor.fetchone()[0]
-                
-                # عدد المستخدمين النشطين (آخر 24 ساعة)
-                cursor.execute('''
-                    SELECT COUNT(*) FROM users 
-                    WHERE last_activity > datetime('now', '-1 day')
-                ''')
-                active_users = cursor.fetchone()[0]
-                
-                # عدد المجموعات
-                cursor.execute('SELECT COUNT(*) FROM groups')
-                total_groups = cursor.fetchone()[0]
+                # العدادات الإجمالية تحدّثها المشغلات فلا حاجة لمسح الجداول
+                counters = {row['name']: row['value'] for row in cursor.execute('SELECT name, value FROM counters')}
+                total_users = counters.get('total_users', 0)
+                total_groups = counters.get('total_groups', 0)
+                total_commands = counters.get('total_commands', 0)
                 
-                # إجمالي الأوامر
-                cursor.execute('SELECT SUM(total_commands) FROM users')
-                total_commands = cursor.fetchone()[0] or 0
+                # عدد المستخدمين النشطين (آخر 24 ساعة) من نافذة النشاط في الذاكرة
+                active_users = self.activity_window.count()
                 
                 # آخر إحصائيات النظام
-                cursor.execute('''
-                    SELECT * FROM system_monitoring 
-                    ORDER BY timestamp DESC LIMIT 1
-                ''')
+                cursor.execute(self.LAST_SYSTEM_STATS_SQL)
                 last_stats = cursor.fetchone()
                 
                 return {
@@ -338,7 +2034,7 @@ class DatabaseManager:
                     'active_users': active_users,
                     'total_groups': total_groups,
                     'total_commands': total_commands,
-                    'last_system_stats': last_stats,
+                    'last_system_stats': tuple(last_stats) if last_stats else None,
                     'database_size': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
                 }
                 
@@ -346,45 +2042,277 @@ class DatabaseManager:
             logging.error(f"خطأ في الحصول على الإحصائيات: {e}")
             return {}
     
+    def _histogram_bucket(self, response_time: float) -> int:
+        """رقم عمود المدرج المناسب لزمن استجابة"""
+        for i, bound in enumerate(self.LOG_HISTOGRAM_BOUNDS):
+            if response_time <= bound:
+                return i
+        return len(self.LOG_HISTOGRAM_BOUNDS)
+    
+    def apply_log_retention(self, retention_days: int = config.LOG_RETENTION_DAYS,
+                            batch_size: int = config.LOG_RETENTION_BATCH_ROWS) -> Dict:
+        """تجميع سجلات الأوامر الأقدم من مدة الاحتفاظ في logs_hourly ثم حذفها
+        
+        يتم العمل على دفعات صغيرة، كل دفعة في معاملة قصيرة تليها استراحة، حتى لا يُحجز
+        قفل الكتابة طويلاً. تعيد تقريراً بعدد الصفوف المجمعة والمساحة المستعادة.
+        """
+        cutoff = (datetime.datetime.now(datetime.timezone.utc)
+                  - datetime.timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+        buckets_count = len(self.LOG_HISTOGRAM_BOUNDS) + 1
+        histogram_columns = ', '.join(f'hist_{i}' for i in range(buckets_count))
+        histogram_updates = ', '.join(f'hist_{i} = hist_{i} + excluded.hist_{i}' for i in range(buckets_count))
+        upsert_sql = f'''
+            INSERT INTO logs_hourly 
+            (hour, command, count, error_count, response_time_sum, 
+             response_time_min, response_time_max, {histogram_columns})
+            VALUES ({', '.join('?' * (7 + buckets_count))})
+            ON CONFLICT(hour, command) DO UPDATE SET
+                count = count + excluded.count,
+                error_count = error_count + excluded.error_count,
+                response_time_sum = response_time_sum + excluded.response_time_sum,
+                response_time_min = MIN(COALESCE(response_time_min, excluded.response_time_min),
+                                        COALESCE(excluded.response_time_min, response_time_min)),
+                response_time_max = MAX(COALESCE(response_time_max, excluded.response_time_max),
+                                        COALESCE(excluded.response_time_max, response_time_max)),
+                {histogram_updates}
+        '''
+        
+        started = time.perf_counter()
+        with self.pool.reader() as conn:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        
+        rolled_up = batches = 0
+        try:
+            while True:
+                with self.pool.writer() as conn:
+                    rows = conn.execute(self.LOG_RETENTION_BATCH_SQL, (cutoff, batch_size)).fetchall()
+                    if not rows:
+                        break
+                    
+                    aggregates = {}
+                    for row in rows:
+                        key = (str(row['timestamp'])[:13] + ':00:00', row['command'] or '')
+                        agg = aggregates.get(key)
+                        if agg is None:
+                            agg = aggregates[key] = [0, 0, 0.0, None, None] + [0] * buckets_count
+                        agg[0] += 1
+                        agg[1] += row['status'] != 'success'
+                        # السجلات دون زمن استجابة تُعد في count فقط، ومجموع المدرج هو عدد المقيسة منها
+                        response_time = row['response_time']
+                        if response_time is None:
+                            continue
+                        agg[2] += response_time
+                        agg[3] = response_time if agg[3] is None else min(agg[3], response_time)
+                        agg[4] = response_time if agg[4] is None else max(agg[4], response_time)
+                        agg[5 + self._histogram_bucket(response_time)] += 1
+                    
+                    conn.executemany(upsert_sql, [key + tuple(agg) for key, agg in aggregates.items()])
+                    conn.executemany('DELETE FROM logs WHERE id = ?', [(row['id'],) for row in rows])
+                
+                rolled_up += len(rows)
+                batches += 1
+                if len(rows) < batch_size:
+                    break
+                # استراحة بين الدفعات لإفساح المجال لعمليات الكتابة الأخرى
+                time.sleep(config.LOG_RETENTION_PAUSE_MS / 1000)
+        except Exception as e:
+            logging.error(f"خطأ في تطبيق سياسة الاحتفاظ بالسجلات: {e}")
+        
+        with self.pool.reader() as conn:
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        report = {
+            'cutoff': cutoff,
+            'rolled_up_rows': rolled_up,
+            'batches': batches,
+            'freed_pages': max(0, free_after - free_before),
+            'reclaimed_bytes': max(0, free_after - free_before) * page_size,
+            'duration': time.perf_counter() - started,
+        }
+        self.last_retention_report = report
+        if rolled_up:
+            logging.info(f"تم تجميع وحذف {rolled_up} سجل أقدم من {retention_days} يوم "
+                         f"(مساحة مستعادة: {report['reclaimed_bytes']} بايت)")
+        return report
+    
     def start_auto_backup(self):
         """بدء النسخ الاحتياطي التلقائي"""
         def backup_worker():
-            while True:
-                time.sleep(3600)  # كل ساعة
-                self.backup_to_json()
+            while not self._stop_event.wait(3600):  # كل ساعة
+                self.backup_incremental()
+                self.apply_log_retention()
+                if time.time() - self._last_snapshot_time >= config.BACKUP_INTERVAL_HOURS * 3600:
+                    self.create_snapshot()
         
-        backup_thread = threading.Thread(target=backup_worker, daemon=True)
-        backup_thread.start()
+        if self._backup_thread is not None:
+            return
+        self._backup_thread = threading.Thread(target=backup_worker, name='hina-backup', daemon=True)
+        self._backup_thread.start()
         logging.info("تم بدء النسخ الاحتياطي التلقائي")
     
-    def get_active_users(self, days=7):
-        """الحصول على المستخدمين النشطين في فترة معينة"""
+    def get_active_users_page(self, days: int = 7, after_user_id: int = -1 << 63,
+                              limit: int = config.ACTIVE_USERS_BATCH_ROWS) -> List[Dict]:
+        """صفحة من المستخدمين النشطين بعد معرف معين مرتبة حسب user_id
+        
+        الترقيم بالمفتاح (user_id > آخر معرف) يجعل كل صفحة بحثاً في نطاق المفتاح الأساسي
+        مهما كان موقعها، بدلاً من OFFSET الذي يعيد مسح الصفوف السابقة.
+        """
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
-            
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT user_id, username, first_name, last_activity
-                FROM users 
-                WHERE last_activity > ?
-                ORDER BY last_activity DESC
-            """, (cutoff_date,))
-            
-            users = []
-            for row in cursor.fetchall():
-                users.append({
-                    'user_id': row[0],
-                    'username': row[1],
-                    'first_name': row[2],
-                    'last_activity': row[3]
-                })
-            
-            return users
-            
+            with self.pool.reader() as conn:
+                cursor = conn.execute(self.ACTIVE_USERS_PAGE_SQL, (cutoff, after_user_id, limit))
+                return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
-            logger.error(f"خطأ في الحصول على المستخدمين النشطين: {e}")
+            logging.error(f"خطأ في الحصول على المستخدمين النشطين: {e}")
             return []
+    
+    def iter_active_users(self, days: int = 7, batch_size: int = config.ACTIVE_USERS_BATCH_ROWS):
+        """مولد يمر على المستخدمين النشطين على دفعات بذاكرة ثابتة
+        
+        كل دفعة تُقرأ في اتصال قراءة قصير، فلا تبقى معاملة قراءة مفتوحة طوال البث.
+        """
+        after_user_id = -1 << 63
+        while True:
+            page = self.get_active_users_page(days, after_user_id, batch_size)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after_user_id = page[-1]['user_id']
+    
+    def get_active_users(self, days=7) -> List[Dict]:
+        """الحصول على المستخدمين النشطين في فترة معينة (قائمة كاملة، للنتائج الصغيرة)"""
+        return list(self.iter_active_users(days))
+
+@instrument_methods('web.')
+class ReadOnlyDatabase:
+    """واجهة قراءة فقط لمسارات الويب فوق مجمع اتصالات mode=ro مستقل
+    
+    تشارك ذاكرة المستخدمين المؤقتة مع مدير قاعدة البيانات، لكن كل قراءة من القرص
+    تمر عبر اتصالاتها الخاصة، فلا تنافس البوت على اتصالاته ولا على قفل الكتابة.
+    """
+    
+    def __init__(self, manager: 'DatabaseManager', readers: int = config.WEB_READER_CONNECTIONS):
+        self.manager = manager
+        # قاعدة البيانات في الذاكرة لا تُفتح بمسار، فتُشارك عنوان مجمع المدير
+        uri = manager.pool.uri if manager.pool.in_memory else None
+        self.pool = ConnectionPool(manager.db_path, readers=readers, read_only=True, uri=uri)
+    
+    def get_user(self, user_id: int) -> Optional[Dict]:
+        """الحصول على بيانات مستخدم"""
+        return self.manager._get_user(user_id, self.pool)
+    
+    def get_stats(self, max_age: float = None) -> Dict:
+        """الإحصائيات العامة من ذاكرة المدير المشتركة (حساب واحد لكل الطلبات المتزامنة)"""
+        return self.manager.stats_cache.get(max_age)
+    
+    def get_lock_stats(self) -> Dict:
+        """أزمنة الانتظار على اتصالات البوت واتصالات الويب جنباً إلى جنب"""
+        return {'bot': self.manager.get_pool_stats(), 'web': self.pool.get_stats()}
+    
+    def close(self):
+        self.pool.close()
+
+class AsyncDatabase:
+    """واجهة غير متزامنة فوق DatabaseManager تنفذ الاستعلامات في خيوط مخصصة
+    
+    كل دالة عامة في المدير متاحة هنا كدالة قابلة للانتظار بنفس المعاملات والنتيجة،
+    حتى لا تعطل عمليات SQLite حلقة أحداث البوت.
+    """
+    
+    def __init__(self, manager: DatabaseManager, workers: int = config.DB_EXECUTOR_WORKERS):
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hina-db')
+    
+    async def run(self, func, *args, **kwargs):
+        """تنفيذ دالة متزامنة في خيوط قاعدة البيانات وانتظار نتيجتها"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    def __getattr__(self, name: str):
+        attr = getattr(self.manager, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        
+        return wrapper
+    
+    def shutdown(self, wait: bool = True):
+        """إيقاف خيوط التنفيذ"""
+        self.executor.shutdown(wait=wait)
+
+class LazyInstance:
+    """وكيل لمثيل مشترك لا يُنشأ إلا عند أول وصول إلى إحدى سماته
+    
+    يبقي استيراد الوحدة رخيصاً: لا جداول ولا اتصالات ولا خيوط حتى يُستخدم المثيل فعلاً.
+    """
+    
+    def __init__(self, factory):
+        object.__setattr__(self, '_factory', factory)
+    
+    def __getattr__(self, name: str):
+        return getattr(self._factory(), name)
+    
+    def __setattr__(self, name: str, value):
+        setattr(self._factory(), name, value)
+    
+    def __repr__(self) -> str:
+        return f'<LazyInstance {self._factory.__name__}>'
+
+# المثيل المشترك في العملية، يُنشأ عند أول استدعاء لـ get_db()
+_db_instance = None
+_async_db_instance = None
+_db_closed = False
+_instance_lock = threading.Lock()
+
+def get_db() -> DatabaseManager:
+    """مدير قاعدة البيانات المشترك، يُنشأ وتبدأ خيوطه الخلفية عند أول استدعاء
+    
+    بعد close_db() ترفع RuntimeError بدل إنشاء مدير جديد بخيوطه، فالخيوط التي ما زالت
+    تعمل أثناء الإيقاف (المراقبة، الويب) لا تعيد تشغيل قاعدة البيانات.
+    """
+    global _db_instance
+    if _db_instance is None:
+        with _instance_lock:
+            if _db_closed:
+                raise RuntimeError('قاعدة البيانات المشتركة مغلقة')
+            if _db_instance is None:
+                manager = DatabaseManager()
+                manager.start()
+                _db_instance = manager
+    return _db_instance
+
+def get_async_db() -> AsyncDatabase:
+    """الواجهة غير المتزامنة فوق المدير المشترك"""
+    global _async_db_instance
+    if _async_db_instance is None:
+        manager = get_db()
+        with _instance_lock:
+            if _db_instance is not manager:
+                raise RuntimeError('قاعدة البيانات المشتركة مغلقة')
+            if _async_db_instance is None:
+                _async_db_instance = AsyncDatabase(manager)
+    return _async_db_instance
+
+def close_db(reopen: bool = False):
+    """إيقاف خيوط المثيل المشترك وإغلاق اتصالاته
+    
+    مع reopen=True ينشئ الاستخدام التالي مثيلاً جديداً (للقياسات والاختبارات)، وإلا
+    يبقى المثيل المشترك مغلقاً حتى نهاية العملية.
+    """
+    global _db_instance, _async_db_instance, _db_closed
+    with _instance_lock:
+        manager, executor = _db_instance, _async_db_instance
+        _db_instance = _async_db_instance = None
+        _db_closed = not reopen
+    if executor is not None:
+        executor.shutdown()
+    if manager is not None:
+        manager.close()
 
-# إنشاء مثيل قاعدة البيانات
-db = DatabaseManager()
+# وكلاء المثيل المشترك للاستيراد المباشر (from database import db, async_db)
+db = LazyInstance(get_db)
+async_db = LazyInstance(get_async_db)
 
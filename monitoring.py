@@ -14,6 +14,7 @@ from typing import Dict, List, Optional
 import asyncio
 from telegram import Bot
 from database import db
+from timeseries import metrics_store
 import config
 
 class SystemMonitor:
@@ -22,6 +23,8 @@ class SystemMonitor:
         self.owner_id = owner_id
         self.monitoring_active = True
         self.last_alert_time = {}
+        self.metrics = metrics_store
+        self.last_db_log_time = time.time()
         self.alert_cooldown = 300  # 5 دقائق بين التنبيهات
         
         # عتبات التنبيه
@@ -184,17 +187,17 @@ class SystemMonitor:
                     alert_message = "\n".join(alerts)
                     asyncio.create_task(self.send_alert(alert_message, "system_health"))
                 
-                # حفظ الإحصائيات في قاعدة البيانات
+                # حفظ القياس في السلاسل الزمنية، ومتوسط الساعة فقط في قاعدة البيانات
                 db_stats = db.get_stats()
-                db.log_system_stats(
-                    cpu_usage=stats.get('cpu_usage', 0),
-                    memory_usage=stats.get('memory_usage', 0),
-                    disk_usage=stats.get('disk_usage', 0),
-                    response_time=response_time,
-                    active_users=db_stats.get('active_users', 0),
-                    total_commands=db_stats.get('total_commands', 0),
-                    errors_count=0  # سيتم تحديثه لاحقاً
-                )
+                self.metrics.append_many({
+                    'cpu_usage': stats.get('cpu_usage', 0),
+                    'memory_usage': stats.get('memory_usage', 0),
+                    'disk_usage': stats.get('disk_usage', 0),
+                    'response_time': response_time,
+                    'active_users': db_stats.get('active_users', 0),
+                })
+                if time.time() - self.last_db_log_time >= config.SYSTEM_STATS_DB_INTERVAL:
+                    self.log_hourly_stats(db_stats)
                 
                 # حفظ الإحصائيات في ملف JSON للمراقبة الويب
                 self.save_stats_for_web(stats)
@@ -206,6 +209,26 @@ class SystemMonitor:
             # انتظار 60 ثانية قبل الفحص التالي
             time.sleep(60)
     
+    def log_hourly_stats(self, db_stats: Dict):
+        """حفظ متوسطات المقاييس منذ آخر حفظ في جدول system_monitoring"""
+        since = self.last_db_log_time
+        self.last_db_log_time = time.time()
+        averages = {metric: self.metrics.average(metric, since) or 0
+                    for metric in ('cpu_usage', 'memory_usage', 'disk_usage', 'response_time', 'active_users')}
+        db.log_system_stats(
+            cpu_usage=averages['cpu_usage'],
+            memory_usage=averages['memory_usage'],
+            disk_usage=averages['disk_usage'],
+            response_time=averages['response_time'],
+            active_users=int(averages['active_users']),
+            total_commands=db_stats.get('total_commands', 0),
+            errors_count=0  # سيتم تحديثه لاحقاً
+        )
+    
+    def get_metric_history(self, metric: str, hours: int = 24, step: int = 300) -> List[Dict]:
+        """تاريخ مقياس خلال آخر hours ساعة مجمعاً على فترات طولها step ثانية"""
+        return self.metrics.downsample(metric, step, start=time.time() - hours * 3600)
+    
     def save_stats_for_web(self, stats: Dict):
         """حفظ الإحصائيات لواجهة الويب"""
         try:
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+نظام جدولة التذكيرات لبوت Hina
+يحمل نافذة التذكيرات القادمة فقط من جدول reminders في كومة صغرى ويستيقظ عند أقرب موعد
+"""
+
+import calendar
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+import config
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# أنماط التكرار المدعومة
+RECURRENCE_PATTERNS = ('hourly', 'daily', 'weekly', 'monthly')
+
+def format_time(when: datetime) -> str:
+    """صيغة الموعد المخزنة في reminder_time"""
+    return when.strftime(TIME_FORMAT)
+
+def next_occurrence(when: datetime, pattern: str) -> Optional[datetime]:
+    """الموعد التالي لتذكير متكرر، أو None لنمط غير معروف"""
+    if pattern == 'hourly':
+        return when + timedelta(hours=1)
+    if pattern == 'daily':
+        return when + timedelta(days=1)
+    if pattern == 'weekly':
+        return when + timedelta(weeks=1)
+    if pattern == 'monthly':
+        year, month = (when.year + 1, 1) if when.month == 12 else (when.year, when.month + 1)
+        day = min(when.day, calendar.monthrange(year, month)[1])
+        return when.replace(year=year, month=month, day=day)
+    return None
+
+class ReminderScheduler:
+    """مرسل التذكيرات المستحقة في خيط مستقل
+    
+    يحتفظ في الذاكرة فقط بالتذكيرات المستحقة خلال النافذة القادمة (حتى REMINDER_LOAD_BATCH
+    تذكير)، ويُكمل التحميل بالترقيم بالمفتاح (reminder_time, id) كلما نقصت الكومة أو انتهت
+    النافذة. لا توجد حلقة فحص دورية: الخيط ينام حتى أقرب موعد أو نهاية النافذة أو إضافة
+    تذكير أقرب. حالة كل تذكير محفوظة في الجدول، فإعادة التشغيل تستأنف من أقدم تذكير نشط.
+    """
+    
+    def __init__(self, manager, send: Callable[[Dict], None],
+                 window_seconds: int = config.REMINDER_WINDOW_SECONDS,
+                 batch_size: int = config.REMINDER_LOAD_BATCH):
+        self.manager = manager
+        self.send = send
+        self.window = timedelta(seconds=window_seconds)
+        self.batch_size = max(2, batch_size)
+        
+        # الكومة: (الموعد، المعرف، المستخدم، النص، نمط التكرار)
+        self._heap = []
+        self._queued = set()
+        self._cancelled = set()
+        
+        # آخر مفتاح محمل، ونهاية النافذة الحالية، وهل حُمّلت النافذة كاملة
+        self._cursor = ('', 0)
+        self._horizon = None
+        self._window_complete = False
+        
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self.stats = {'loads': 0, 'loaded': 0, 'dispatched': 0, 'rescheduled': 0, 'wakeups': 0}
+    
+    def start(self):
+        """بدء خيط الإرسال"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """إيقاف خيط الإرسال"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def add(self, user_id: int, message: str, when: datetime,
+            recurrence_pattern: str = None) -> Optional[int]:
+        """إنشاء تذكير وجدولته، وتعيد معرفه أو None عند تجاوز الحد"""
+        # الكتابة مع القفل حتى لا يقرأ المحمّل الصف الجديد قبل مقارنته بالمؤشر فيُجدول مرتين
+        with self._condition:
+            reminder_id = self.manager.add_reminder(user_id, message, when, recurrence_pattern)
+            if reminder_id is not None:
+                self._schedule((format_time(when), reminder_id), user_id, message, recurrence_pattern)
+        return reminder_id
+    
+    def cancel(self, user_id: int, reminder_id: int) -> bool:
+        """إلغاء تذكير يملكه المستخدم"""
+        if not self.manager.cancel_reminder(user_id, reminder_id):
+            return False
+        with self._condition:
+            if reminder_id in self._queued:
+                self._cancelled.add(reminder_id)
+        return True
+    
+    def _schedule(self, key: tuple, user_id: int, message: str, pattern: Optional[str]):
+        """إدخال تذكير جديد أو معاد جدولته في الكومة إن كان ضمن ما حُمّل (يُستدعى مع القفل)"""
+        when = datetime.strptime(key[0], TIME_FORMAT)
+        if key <= self._cursor:
+            self._push(when, key[1], user_id, message, pattern)
+        elif self._horizon is not None and when <= self._horizon:
+            # بعد المؤشر لكن داخل النافذة: يعيد المحمّل قراءته بالترتيب الصحيح
+            self._window_complete = False
+        else:
+            return
+        self._condition.notify()
+    
+    def _push(self, when: datetime, reminder_id: int, user_id: int, message: str, pattern: Optional[str]):
+        heapq.heappush(self._heap, (when, reminder_id, user_id, message, pattern))
+        self._queued.add(reminder_id)
+    
+    def _load(self):
+        """تحميل الدفعة التالية من النافذة الحالية (يُستدعى مع القفل)"""
+        rows = self.manager.get_reminders_after(self._cursor[0], self._cursor[1],
+                                                format_time(self._horizon), self.batch_size)
+        for row in rows:
+            self._push(datetime.fromisoformat(str(row['reminder_time'])), row['id'],
+                       row['user_id'], row['message'], row['recurrence_pattern'])
+        if rows:
+            self._cursor = (str(rows[-1]['reminder_time']), rows[-1]['id'])
+        self._window_complete = len(rows) < self.batch_size
+        self.stats['loads'] += 1
+        self.stats['loaded'] += len(rows)
+    
+    def _take_due(self, now: datetime) -> list:
+        """سحب التذكيرات المستحقة من الكومة (يُستدعى مع القفل)"""
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            item = heapq.heappop(self._heap)
+            self._queued.discard(item[1])
+            if item[1] in self._cancelled:
+                self._cancelled.discard(item[1])
+                continue
+            due.append(item)
+        return due
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                now = datetime.now()
+                if self._horizon is None or now >= self._horizon:
+                    self._horizon = now + self.window
+                    self._window_complete = False
+                if not self._window_complete and len(self._heap) < self.batch_size // 2:
+                    self._load()
+                due = self._take_due(now)
+                if not due:
+                    wake = self._heap[0][0] if self._heap else self._horizon
+                    if not self._window_complete and len(self._heap) < self.batch_size // 2:
+                        continue
+                    self.stats['wakeups'] += 1
+                    self._condition.wait(max(0.0, (min(wake, self._horizon) - now).total_seconds()))
+                    continue
+            try:
+                self._dispatch(due)
+            except Exception as e:
+                logging.error(f"خطأ في إرسال التذكيرات: {e}")
+    
+    def _dispatch(self, due: list):
+        """إرسال دفعة مستحقة ثم تحديث حالتها في قاعدة البيانات بمعاملة واحدة"""
+        now = datetime.now()
+        finished, rescheduled = [], []
+        for when, reminder_id, user_id, message, pattern in due:
+            try:
+                self.send({'id': reminder_id, 'user_id': user_id, 'message': message,
+                           'reminder_time': when, 'recurrence_pattern': pattern})
+            except Exception as e:
+                logging.error(f"خطأ في إرسال التذكير {reminder_id}: {e}")
+            
+            # التكرار يُحسب عند الإرسال فقط، مع تخطي المواعيد الفائتة أثناء التوقف
+            following = next_occurrence(when, pattern) if pattern else None
+            while following is not None and following <= now:
+                following = next_occurrence(following, pattern)
+            if following is None:
+                finished.append(reminder_id)
+            else:
+                rescheduled.append((format_time(following), reminder_id, user_id, message, pattern))
+        
+        with self._condition:
+            self.manager.complete_reminders(finished, [(key, reminder_id) for key, reminder_id, *_ in rescheduled])
+            self.stats['dispatched'] += len(due)
+            self.stats['rescheduled'] += len(rescheduled)
+            for key, reminder_id, user_id, message, pattern in rescheduled:
+                self._schedule((key, reminder_id), user_id, message, pattern)
+    
+    def get_stats(self) -> Dict:
+        """حجم الكومة وعدد عمليات التحميل والإرسال والاستيقاظ"""
+        with self._condition:
+            stats = dict(self.stats)
+            stats['queued'] = len(self._heap)
+            stats['next_due'] = self._heap[0][0] if self._heap else None
+            stats['horizon'] = self._horizon
+        return stats
+
+def to_zone(when: datetime, tz) -> datetime:
+    """وقت الخادم المحلي (كما يُخزن في reminder_time) بتوقيت المنطقة tz، دون معلومات المنطقة"""
+    return when.astimezone(tz).replace(tzinfo=None)
+
+def from_zone(when: datetime, tz) -> datetime:
+    """وقت بتوقيت المنطقة tz محولاً إلى وقت الخادم المحلي الذي يقارن به المجدول"""
+    localize = getattr(tz, 'localize', None)  # مناطق pytz تحتاج localize لا replace
+    aware = localize(when) if localize else when.replace(tzinfo=tz)
+    return aware.astimezone().replace(tzinfo=None)
+
+def parse_reminder_time(value: str, now: datetime = None, tz=None) -> Optional[datetime]:
+    """تحويل معامل الموعد إلى وقت الخادم المحلي: عدد دقائق (30) أو ساعة اليوم (14:30)
+    
+    الساعة تُقرأ بتوقيت منطقة المستخدم tz إن أُعطيت، كما يعرضها أمر الوقت.
+    """
+    now = now or datetime.now()
+    if value.isdigit():
+        return (now + timedelta(minutes=int(value))).replace(microsecond=0)
+    try:
+        clock = datetime.strptime(value, '%H:%M')
+    except ValueError:
+        return None
+    local_now = to_zone(now, tz) if tz is not None else now
+    when = local_now.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+    if when <= local_now:
+        when += timedelta(days=1)
+    return from_zone(when, tz) if tz is not None else when
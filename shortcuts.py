@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+نظام الاختصارات لبوت Hina
+شجرة بادئات لكل نطاق (مستخدم، مجموعة، عام) تُبنى من جدول shortcuts عند البدء
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import config
+
+# مفتاح نهاية الاختصار داخل عقد الشجرة (لا يمكن أن يكون حرفاً)
+_END = None
+
+class ShortcutTrie:
+    """شجرة بادئات من قواميس متداخلة، كل عقدة نهاية تحمل (معرف الاختصار، الأمر الكامل)"""
+    
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+    
+    def insert(self, shortcut: str, entry: Tuple[int, str]):
+        node = self.root
+        for char in shortcut:
+            node = node.setdefault(char, {})
+        if _END not in node:
+            self.size += 1
+        node[_END] = entry
+    
+    def remove(self, shortcut: str) -> bool:
+        """حذف اختصار مع تنظيف العقد الفارغة"""
+        path = []
+        node = self.root
+        for char in shortcut:
+            child = node.get(char)
+            if child is None:
+                return False
+            path.append((node, char))
+            node = child
+        if _END not in node:
+            return False
+        del node[_END]
+        self.size -= 1
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+        return True
+    
+    def match(self, text: str) -> Optional[Tuple[int, Tuple[int, str]]]:
+        """أطول اختصار في بداية النص ينتهي عند نهاية كلمة: (طوله، المدخل)"""
+        node = self.root
+        best = None
+        for index, char in enumerate(text):
+            node = node.get(char)
+            if node is None:
+                break
+            if _END in node and (index + 1 == len(text) or text[index + 1].isspace()):
+                best = (index + 1, node[_END])
+        return best
+
+class ShortcutStore:
+    """الاختصارات المحملة في الذاكرة مع توسيعها في مسار الرسائل
+    
+    الترتيب: اختصارات المستخدم ثم اختصارات المجموعة ثم الاختصارات العامة. تُجمع
+    عدادات الاستخدام في الذاكرة وتُكتب دفعة واحدة كل SHORTCUT_USAGE_FLUSH_SECONDS.
+    """
+    
+    def __init__(self, manager, flush_interval: float = config.SHORTCUT_USAGE_FLUSH_SECONDS):
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self._tries = {}
+        self._lock = threading.Lock()
+        self._usage = {}
+        self._usage_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @staticmethod
+    def _scope(user_id: int, group_id: Optional[int], is_global: bool) -> tuple:
+        if is_global:
+            return ('global',)
+        if group_id is not None:
+            return ('group', group_id)
+        return ('user', user_id)
+    
+    def load(self) -> int:
+        """بناء الأشجار من الجدول، وتعيد عدد الاختصارات المحملة"""
+        tries = {}
+        count = 0
+        for row in self.manager.iter_shortcuts():
+            scope = self._scope(row['user_id'], row['group_id'], row['is_global'])
+            tries.setdefault(scope, ShortcutTrie()).insert(row['shortcut'], (row['id'], row['full_command']))
+            count += 1
+        with self._lock:
+            self._tries = tries
+        logging.info(f"تم تحميل {count} اختصار")
+        return count
+    
+    def start(self):
+        """بدء خيط كتابة عدادات الاستخدام"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_worker, name='shortcut-usage', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush_usage()
+    
+    def _flush_worker(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush_usage()
+    
+    def flush_usage(self):
+        """كتابة عدادات الاستخدام المتراكمة في معاملة واحدة"""
+        with self._usage_lock:
+            usage, self._usage = self._usage, {}
+        if usage and not self.manager.add_shortcut_usage(usage):
+            # إعادة العدادات حتى لا تضيع عند فشل الكتابة
+            with self._usage_lock:
+                for shortcut_id, count in usage.items():
+                    self._usage[shortcut_id] = self._usage.get(shortcut_id, 0) + count
+    
+    def add(self, user_id: int, shortcut: str, full_command: str,
+            group_id: int = None, is_global: bool = False) -> Optional[int]:
+        """إنشاء اختصار أو تعديله، وتعيد معرفه أو None عند تجاوز الحد"""
+        shortcut_id = self.manager.add_shortcut(user_id, shortcut, full_command, group_id, is_global)
+        if shortcut_id is not None:
+            scope = self._scope(user_id, group_id, is_global)
+            with self._lock:
+                self._tries.setdefault(scope, ShortcutTrie()).insert(shortcut, (shortcut_id, full_command))
+        return shortcut_id
+    
+    def delete(self, user_id: int, shortcut: str, group_id: int = None, is_global: bool = False) -> bool:
+        """حذف اختصار من الجدول ومن الشجرة"""
+        shortcut_id = self.manager.delete_shortcut(user_id, shortcut, group_id, is_global)
+        if shortcut_id is None:
+            return False
+        scope = self._scope(user_id, group_id, is_global)
+        with self._lock:
+            trie = self._tries.get(scope)
+            if trie is not None:
+                trie.remove(shortcut)
+                if not trie.size:
+                    del self._tries[scope]
+        with self._usage_lock:
+            self._usage.pop(shortcut_id, None)
+        return True
+    
+    def resolve(self, text: str, user_id: int, group_id: int = None) -> Optional[Tuple[int, int, str]]:
+        """أول تطابق حسب النطاق: (طول الاختصار، معرفه، الأمر الكامل)"""
+        scopes = [('user', user_id)]
+        if group_id is not None:
+            scopes.append(('group', group_id))
+        scopes.append(('global',))
+        for scope in scopes:
+            trie = self._tries.get(scope)
+            if trie is None:
+                continue
+            found = trie.match(text)
+            if found is not None:
+                length, (shortcut_id, full_command) = found
+                return length, shortcut_id, full_command
+        return None
+    
+    def expand(self, text: str, user_id: int, group_id: int = None) -> str:
+        """استبدال الاختصار في بداية الرسالة بأمره الكامل مع إبقاء بقية النص"""
+        found = self.resolve(text, user_id, group_id)
+        if found is None:
+            return text
+        length, shortcut_id, full_command = found
+        with self._usage_lock:
+            self._usage[shortcut_id] = self._usage.get(shortcut_id, 0) + 1
+        return full_command + text[length:]
+    
+    def get_stats(self) -> Dict:
+        """عدد الأشجار والاختصارات والعدادات غير المكتوبة"""
+        tries = list(self._tries.values())
+        return {
+            'scopes': len(tries),
+            'shortcuts': sum(trie.size for trie in tries),
+            'pending_usage': sum(self._usage.values()),
+        }
@@ -12,6 +12,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List
 import config
+from timeseries import metrics_store
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,7 @@ class SmartMonitoring:
     def __init__(self, bot_instance):
         self.bot = bot_instance
         self.start_time = time.time()
-        self.ping_history = []
+        self.metrics = metrics_store
         self.restart_count_today = 0
         self.last_restart_date = datetime.now().date()
         self.broadcast_count_today = 0
@@ -93,15 +94,8 @@ class SmartMonitoring:
             
             ping_time = (time.time() - start_time) * 1000  # بالمللي ثانية
             
-            # إضافة للتاريخ
-            self.ping_history.append({
-                'time': datetime.now(),
-                'ping': ping_time
-            })
-            
-            # الاحتفاظ بآخر 100 قياس فقط
-            if len(self.ping_history) > 100:
-                self.ping_history.pop(0)
+            # إضافة للتاريخ (حلقة ثابتة الحجم تستبدل أقدم القياسات تلقائياً)
+            self.metrics.append('ping', ping_time)
             
             return ping_time
             
@@ -252,28 +246,31 @@ class SmartMonitoring:
 ˼👨‍💻┊الـمـطـوࢪ˹ ⟣⊰ 『 @{config.OWNER_USERNAME} 』
             """
             
-            # الحصول على قائمة المستخدمين والمجموعات من قاعدة البيانات
-            from database import DatabaseManager
-            db = DatabaseManager()
-            
-            # إرسال للمستخدمين النشطين
-            active_users = db.get_active_users(days=7)  # المستخدمين النشطين في آخر 7 أيام
+            # المرور على المستخدمين النشطين في آخر 7 أيام صفحة بصفحة بدلاً من تحميلهم كلهم
+            from database import async_db
             
             sent_count = 0
-            for user in active_users:
-                try:
-                    await self.bot.application.bot.send_message(
-                        chat_id=user['user_id'],
-                        text=startup_text,
-                        parse_mode='Markdown'
-                    )
-                    sent_count += 1
-                    
-                    # تأخير بسيط لتجنب حدود التيليجرام
-                    await asyncio.sleep(0.1)
-                    
-                except Exception as e:
-                    logger.debug(f"فشل إرسال البث للمستخدم {user['user_id']}: {e}")
+            after_user_id = -1 << 63
+            while True:
+                active_users = await async_db.get_active_users_page(days=7, after_user_id=after_user_id)
+                for user in active_users:
+                    try:
+                        await self.bot.application.bot.send_message(
+                            chat_id=user['user_id'],
+                            text=startup_text,
+                            parse_mode='Markdown'
+                        )
+                        sent_count += 1
+                        
+                        # تأخير بسيط لتجنب حدود التيليجرام
+                        await asyncio.sleep(0.1)
+                        
+                    except Exception as e:
+                        logger.debug(f"فشل إرسال البث للمستخدم {user['user_id']}: {e}")
+                
+                if len(active_users) < config.ACTIVE_USERS_BATCH_ROWS:
+                    break
+                after_user_id = active_users[-1]['user_id']
             
             # حفظ البيانات
             self.save_monitoring_data()
@@ -319,10 +316,11 @@ class SmartMonitoring:
     
     def get_monitoring_stats(self):
         """الحصول على إحصائيات المراقبة"""
-        if not self.ping_history:
+        ping_history = self.metrics.latest('ping', 10)
+        if not ping_history:
             return "لا توجد بيانات مراقبة متاحة"
         
-        recent_pings = [p['ping'] for p in self.ping_history[-10:]]
+        recent_pings = [ping for _, ping in ping_history]
         avg_ping = sum(recent_pings) / len(recent_pings)
         
         stats_text = f"""
@@ -336,8 +334,8 @@ class SmartMonitoring:
 📈 **آخر 5 قياسات بنج:**
         """
         
-        for ping_data in self.ping_history[-5:]:
-            stats_text += f"• {ping_data['time'].strftime('%H:%M')} - {ping_data['ping']:.0f}ms\n"
+        for timestamp, ping in ping_history[-5:]:
+            stats_text += f"• {datetime.fromtimestamp(timestamp).strftime('%H:%M')} - {ping:.0f}ms\n"
         
         return stats_text
 
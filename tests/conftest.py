@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+إعدادات مشتركة لاختبارات Hina-Bot
+"""
+
+import os
+import sys
+
+import pytest
+
+# إضافة مجلد المشروع إلى مسار Python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """مدير قاعدة بيانات في الذاكرة دون خيوط خلفية، داخل مجلد مؤقت"""
+    monkeypatch.chdir(tmp_path)
+    from database import DatabaseManager
+    instance = DatabaseManager(':memory:', json_backup_path=str(tmp_path / 'users_backup.json'))
+    yield instance
+    instance.close()
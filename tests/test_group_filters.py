@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات فلاتر المجموعات: الكلمات المحظورة والردود التلقائية
+"""
+
+from auto_responses import AutoResponder, ResponseMatcher, has_nested_quantifier
+from banned_words import BannedWordsFilter
+
+class RacingManager:
+    """مدير وهمي تُعدّل فيه القائمة بين قراءتها وحفظ الآلة"""
+    
+    def __init__(self):
+        self.words = {1: ['قديمة']}
+        self.responses = {1: {'exact': {'مرحبا': 'قديم'}}}
+        self.on_read = None
+    
+    def _read(self, value):
+        if self.on_read is not None:
+            callback, self.on_read = self.on_read, None
+            callback()
+        return value
+    
+    def get_group_banned_words(self, group_id):
+        return self._read(list(self.words.get(group_id, [])))
+    
+    def set_group_banned_words(self, group_id, words):
+        self.words[group_id] = list(words)
+        return True
+    
+    def get_group_auto_responses(self, group_id):
+        return self._read({key: dict(value) for key, value in self.responses.get(group_id, {}).items()})
+    
+    def set_group_auto_responses(self, group_id, responses):
+        self.responses[group_id] = responses
+        return True
+
+def test_banned_words_edit_during_build_is_not_lost():
+    manager = RacingManager()
+    words_filter = BannedWordsFilter(manager)
+    manager.on_read = lambda: words_filter.set_words(1, ['جديدة'])
+    
+    assert words_filter.check(1, 'كلمة قديمة') == 'قديمة'
+    assert words_filter.check(1, 'كلمة قديمة') is None
+    assert words_filter.check(1, 'كلمة جديدة') == 'جديدة'
+
+def test_banned_words_cached_without_edits():
+    manager = RacingManager()
+    words_filter = BannedWordsFilter(manager)
+    
+    words_filter.check(1, 'نص')
+    words_filter.check(1, 'نص')
+    assert words_filter.builds == 1
+
+def test_auto_responses_edit_during_build_is_not_lost():
+    manager = RacingManager()
+    responder = AutoResponder(manager)
+    manager.on_read = lambda: responder.set_response(1, 'exact', 'مرحبا', 'جديد')
+    
+    assert responder.respond(1, 'مرحبا') == 'قديم'
+    assert responder.respond(1, 'مرحبا') == 'جديد'
+
+def test_regex_triggers_keep_case_classes_and_diacritics():
+    matcher = ResponseMatcher({'regex': {r'Hello\s+World': 'en', 'مَرحبا': 'ar', r'^\S+\d$': 'code'}})
+    
+    assert matcher.match('hello   WORLD') == 'en'
+    assert matcher.match('مرحبا يا هينا') == 'ar'
+    assert matcher.match('مَرْحَبَا') == 'ar'
+    assert matcher.match('abc1') == 'code'
+    assert matcher.match('ab c1') is None
+
+def test_nested_quantifiers_are_rejected():
+    for pattern in (r'(a+)+b', r'(a*b?)*', r'(?:x|y+)*'):
+        assert has_nested_quantifier(pattern)
+    for pattern in (r'(ab)+', r'\d{2}-\d{2}', r'Hello\s+World', r'(a|b)*c'):
+        assert not has_nested_quantifier(pattern)
+    
+    responder = AutoResponder(RacingManager())
+    assert not responder.set_response(1, 'regex', r'(a+)+b', 'بطيء')
+    assert responder.set_response(1, 'regex', r'(ab)+', 'سريع')
+    
+    # المحفزات المخزنة قبل هذا الفحص تُتجاهل عند البناء
+    assert ResponseMatcher({'regex': {r'(a+)+b': 'بطيء'}}).size == 0
+
+def test_suspended_group_stays_silent_until_edited():
+    manager = RacingManager()
+    responder = AutoResponder(manager)
+    responder.suspend(1)
+    assert responder.respond(1, 'مرحبا') is None
+    
+    responder.set_response(1, 'exact', 'اهلا', 'اهلين')
+    assert responder.respond(1, 'مرحبا') == 'قديم'
+
+def test_regex_backreferences_keep_their_meaning():
+    pattern = r'(b)\1'
+    alone = ResponseMatcher({'regex': {pattern: 'bb'}})
+    mixed = ResponseMatcher({'regex': {'hello': 'en', pattern: 'bb', r'x+y': 'xy'}})
+    
+    assert alone.match('bb') == 'bb'
+    assert mixed.match('bb') == 'bb'
+    assert mixed.match('ba') is None
+    assert mixed.match('HELLO') == 'en'
+    assert mixed.match('xxy') == 'xy'
+    assert mixed.regex is not None and len(mixed.separate_regex) == 1
+
+def test_only_the_group_whose_match_overruns_is_suspended():
+    import threading
+    import time
+    from auto_responses import MatchWorkers
+    
+    manager = RacingManager()
+    manager.responses[2] = {'exact': {'مرحبا': 'اهلا'}}
+    responder = AutoResponder(manager)
+    release = threading.Event()
+    slow = responder._matcher(1)
+    slow.match = lambda text: release.wait(5) and None
+    workers = MatchWorkers(workers=1, max_extra=1)
+    try:
+        stuck = workers.submit(responder.respond, 1, 'مرحبا')
+        time.sleep(0.02)
+        queued = workers.submit(responder.respond, 2, 'مرحبا')
+        time.sleep(0.05)
+        
+        # المجموعة 2 تنتظر في الطابور فقط، فلا تُحسب عليها المهلة
+        assert responder.suspend_overrunning(0.01) == [1]
+        assert responder.suspend_overrunning(0.01) == []
+        assert responder.is_suspended(1) and not responder.is_suspended(2)
+        
+        assert workers.add_worker()
+        assert not workers.add_worker()
+        assert queued.result(timeout=1) == 'اهلا'
+        assert not stuck.done()
+    finally:
+        release.set()
+        workers.shutdown()
+    assert responder.respond(1, 'مرحبا') is None
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات استعادة النسخة الاحتياطية JSON: الفشل لا يترك قاعدة البيانات دون فهارس
+"""
+
+def _index_names(manager):
+    with manager.pool.writer() as conn:
+        return {row['name'] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")}
+
+def test_failed_restore_keeps_indexes_and_rows(manager, tmp_path):
+    for user_id in range(1, 4):
+        manager.add_user(user_id, f'user{user_id}', 'اسم')
+    path = str(tmp_path / 'backup.json')
+    manager.backup_to_json(path, compress=False)
+    indexes = _index_names(manager)
+    assert set(manager.MANAGED_INDEXES) <= indexes
+    
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    row = next(i for i, line in enumerate(lines) if line.startswith('{') and '"user_id": 2' in line)
+    lines[row] = '{"user_id": 2, "username": \n'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    
+    with manager.pool.writer() as conn:
+        conn.execute('DELETE FROM users WHERE user_id = 1')
+    assert not manager.restore_from_json(path)
+    
+    assert _index_names(manager) == indexes
+    with manager.pool.reader() as conn:
+        assert [row[0] for row in conn.execute('SELECT user_id FROM users ORDER BY user_id')] == [2, 3]
+    assert manager.check_query_plans() == {}
+
+def test_restore_round_trip(manager, tmp_path):
+    manager.add_user(7, 'hina', 'هينا')
+    path = str(tmp_path / 'backup.json')
+    manager.backup_to_json(path, compress=False)
+    with manager.pool.writer() as conn:
+        conn.execute('DELETE FROM users')
+    
+    assert manager.restore_from_json(path)
+    assert manager.get_user(7)['username'] == 'hina'
+    assert set(manager.MANAGED_INDEXES) <= _index_names(manager)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات تجميع سجلات الأوامر القديمة في logs_hourly
+"""
+
+def _insert_old_logs(manager, rows):
+    with manager.pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO logs (user_id, command, response_time, status, timestamp) "
+            "VALUES (1, 'ping', ?, ?, '2000-01-01 10:15:00')", rows)
+
+def _hourly(manager):
+    with manager.pool.reader() as conn:
+        return dict(conn.execute("SELECT * FROM logs_hourly WHERE command = 'ping'").fetchone())
+
+def test_null_response_time_is_counted_but_not_timed(manager):
+    _insert_old_logs(manager, [(0.5, 'success'), (None, 'error'), (1.5, 'success')])
+    manager.apply_log_retention()
+    
+    hourly = _hourly(manager)
+    histogram = [value for key, value in hourly.items() if key.startswith('hist_')]
+    assert hourly['count'] == 3
+    assert hourly['error_count'] == 1
+    assert hourly['response_time_sum'] == 2.0
+    assert hourly['response_time_min'] == 0.5
+    assert hourly['response_time_max'] == 1.5
+    assert sum(histogram) == 2
+
+def test_untimed_batch_keeps_existing_min_and_max(manager):
+    _insert_old_logs(manager, [(0.5, 'success')])
+    manager.apply_log_retention()
+    _insert_old_logs(manager, [(None, 'error')])
+    manager.apply_log_retention()
+    
+    hourly = _hourly(manager)
+    assert hourly['count'] == 2
+    assert (hourly['response_time_min'], hourly['response_time_max']) == (0.5, 0.5)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات خطط تنفيذ الاستعلامات الساخنة
+تفشل عند تراجع أي استعلام إلى مسح كامل أو فهرس غير المتوقع
+"""
+
+import datetime
+
+import pytest
+
+from database import DatabaseManager
+
+@pytest.mark.parametrize('name', sorted(DatabaseManager.HOT_QUERIES))
+def test_hot_query_uses_expected_plan(manager, name):
+    sql, params, expected = manager.HOT_QUERIES[name]
+    plan = manager.explain_query(sql, params)
+    assert any(expected in step for step in plan), plan
+
+def test_hot_queries_cover_every_shared_query():
+    """كل استعلام مشترك معرف في المدير مسجل في HOT_QUERIES"""
+    checked = {sql for sql, _, _ in DatabaseManager.HOT_QUERIES.values()}
+    shared = {name for name in vars(DatabaseManager)
+              if name.endswith('_SQL') and not name.endswith('UPSERT_SQL')}
+    missing = [name for name in shared if getattr(DatabaseManager, name) not in checked]
+    assert not missing
+
+def test_plans_hold_with_statistics(manager):
+    """الخطط نفسها بعد ANALYZE على بيانات أغلب تذكيراتها نشطة"""
+    now = datetime.datetime.now()
+    manager.add_users_bulk([{'user_id': i, 'username': f'user_{i}'} for i in range(1, 501)], touch_activity=True)
+    with manager.pool.writer() as conn:
+        conn.executemany(
+            'INSERT INTO reminders (user_id, message, reminder_time, is_active) VALUES (?, ?, ?, ?)',
+            [(i % 500 + 1, 'تذكير', (now + datetime.timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'), 1)
+             for i in range(5000)])
+        conn.executemany(
+            'INSERT INTO logs (user_id, command, response_time, status) VALUES (?, ?, ?, ?)',
+            [(i % 500 + 1, 'ping', 0.01, 'success') for i in range(5000)])
+        conn.execute('ANALYZE')
+    assert manager.check_query_plans() == {}
+
+def test_dropped_index_is_reported_on_the_same_manager(manager):
+    """حذف فهرس يظهر في الفحص التالي رغم الجمل المحضرة في اتصالات المجمع"""
+    assert manager.check_query_plans() == {}
+    with manager.pool.writer() as conn:
+        conn.execute('DROP INDEX idx_users_last_activity')
+    
+    problems = manager.check_query_plans()
+    assert 'SCAN users' in problems['activity_window']
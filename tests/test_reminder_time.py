@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات قراءة موعد التذكير بتوقيت منطقة المستخدم
+"""
+
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from reminders import from_zone, parse_reminder_time, to_zone
+
+@pytest.fixture
+def utc_host(monkeypatch):
+    """خادم يعمل بتوقيت UTC"""
+    monkeypatch.setenv('TZ', 'UTC')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_clock_time_is_read_in_user_timezone(utc_host):
+    riyadh = ZoneInfo('Asia/Riyadh')
+    now = datetime(2026, 10, 17, 10, 0)  # 13:00 في الرياض
+    
+    when = parse_reminder_time('14:30', now=now, tz=riyadh)
+    assert when == datetime(2026, 10, 17, 11, 30)
+    assert to_zone(when, riyadh) == datetime(2026, 10, 17, 14, 30)
+
+def test_past_clock_time_rolls_to_next_day_in_user_timezone(utc_host):
+    riyadh = ZoneInfo('Asia/Riyadh')
+    now = datetime(2026, 10, 17, 22, 0)  # 01:00 من اليوم التالي في الرياض
+    
+    assert parse_reminder_time('00:30', now=now, tz=riyadh) == datetime(2026, 10, 18, 21, 30)
+    assert parse_reminder_time('02:00', now=now, tz=riyadh) == datetime(2026, 10, 17, 23, 0)
+
+def test_minutes_and_server_time_are_unchanged(utc_host):
+    now = datetime(2026, 10, 17, 10, 0)
+    assert parse_reminder_time('30', now=now, tz=ZoneInfo('Asia/Riyadh')) == datetime(2026, 10, 17, 10, 30)
+    assert parse_reminder_time('14:30', now=now) == datetime(2026, 10, 17, 14, 30)
+    assert parse_reminder_time('25:00', now=now) is None
+
+def test_zone_round_trip(utc_host):
+    tokyo = ZoneInfo('Asia/Tokyo')
+    when = datetime(2026, 1, 1, 9, 0)
+    assert from_zone(to_zone(when, tokyo), tokyo) == when
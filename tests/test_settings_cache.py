@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات ذاكرة أعمدة JSON: تعديل صف غير موجود لا يضيع عند الكتابة
+"""
+
+def _stored_settings(manager, group_id):
+    with manager.pool.reader() as conn:
+        row = conn.execute('SELECT settings FROM groups WHERE group_id = ?', (group_id,)).fetchone()
+    return row[0] if row else None
+
+def test_change_for_missing_row_stays_pending_until_row_exists(manager):
+    manager.set_group_settings(-100, welcome='اهلا')
+    assert manager.settings_cache.flush() == 0
+    
+    stats = manager.get_settings_cache_stats()
+    assert stats['dirty'] == 1 and stats['missing_rows'] == 1
+    assert manager.get_group_settings(-100)['welcome'] == 'اهلا'
+    
+    manager.add_group(-100, 'مجموعة', 'supergroup')
+    assert manager.settings_cache.flush() == 1
+    assert _stored_settings(manager, -100) == '{"welcome":"اهلا"}'
+    stats = manager.get_settings_cache_stats()
+    assert stats['dirty'] == 0 and stats['missing_rows'] == 0
+
+def test_existing_rows_are_written_alongside_missing_ones(manager):
+    manager.add_user(1, 'user', 'User')
+    manager.set_user_preferences(1, lang='ar')
+    manager.set_user_preferences(2, lang='en')
+    
+    assert manager.settings_cache.flush() == 1
+    assert manager.get_settings_cache_stats()['dirty'] == 1
+    with manager.pool.reader() as conn:
+        assert conn.execute('SELECT preferences FROM users WHERE user_id = 1').fetchone()[0] == '{"lang":"ar"}'
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات المثيل المشترك لقاعدة البيانات
+"""
+
+import threading
+
+import pytest
+
+import database
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    """مثيل مشترك داخل مجلد مؤقت يُعاد ضبطه بعد الاختبار"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, '_db_closed', False)
+    yield database
+    database.close_db(reopen=True)
+
+def _worker_threads():
+    names = ('hina-write-behind', 'hina-settings-flush', 'hina-backup')
+    return [thread for thread in threading.enumerate() if thread.name in names]
+
+def test_import_creates_nothing(shared):
+    assert shared._db_instance is None
+
+def test_use_after_close_does_not_restart_workers(shared):
+    shared.db.get_stats()
+    assert len(_worker_threads()) == 3
+    
+    shared.close_db()
+    with pytest.raises(RuntimeError):
+        shared.db.get_stats()
+    with pytest.raises(RuntimeError):
+        shared.get_async_db()
+    assert shared._db_instance is None
+    assert not _worker_threads()
+
+def test_reopen_allows_a_fresh_instance(shared):
+    first = shared.get_db()
+    shared.close_db(reopen=True)
+    second = shared.get_db()
+    assert second is not first
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات الذاكرة المؤقتة المشتركة للإحصائيات العامة
+"""
+
+def test_web_and_bot_share_one_stats_computation(manager):
+    manager.add_user(1, 'user', 'User')
+    manager.get_stats()
+    manager.web.get_stats()
+    manager.get_stats()
+    
+    stats = manager.get_stats_cache_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 2
+
+def test_stats_are_computed_on_web_connections(manager):
+    manager.add_user(1, 'user', 'User')
+    bot_reads = manager.pool.get_stats()['reader_acquires']
+    web_reads = manager.web.pool.get_stats()['reader_acquires']
+    
+    assert manager.web.get_stats()['total_users'] == 1
+    assert manager.pool.get_stats()['reader_acquires'] == bot_reads
+    assert manager.web.pool.get_stats()['reader_acquires'] == web_reads + 1
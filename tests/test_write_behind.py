@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات مخزن الكتابة المؤجلة لسجلات الأوامر
+"""
+
+import time
+
+def test_flush_pending_waits_for_batch_held_by_worker(manager, monkeypatch):
+    """flush_pending لا تعود قبل كتابة كل ما أُضيف قبلها، حتى مع خيط التفريغ العامل"""
+    buffer = manager.write_buffer
+    write = buffer._write
+    
+    def slow_write(items):
+        # إبطاء الكتابة حتى يمسك خيط التفريغ دفعة مسحوبة لم تُكتب بعد
+        time.sleep(0.005)
+        return write(items)
+    
+    monkeypatch.setattr(buffer, '_write', slow_write)
+    buffer.flush_interval = 0.001
+    buffer.start()
+    manager.add_user(1, 'user', 'User')
+    
+    for round_number in range(1, 21):
+        for _ in range(20):
+            manager.record_command(1, None, 'ping', 0.01)
+        time.sleep(0.002)
+        manager.flush_pending()
+        with manager.pool.reader() as conn:
+            written = conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0]
+        assert written == round_number * 20
+
+def test_stop_writes_remaining_items(manager):
+    manager.add_user(1, 'user', 'User')
+    for _ in range(5):
+        manager.record_command(1, None, 'ping', 0.01)
+    manager.write_buffer.stop()
+    with manager.pool.reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 5
+        assert conn.execute('SELECT total_commands FROM users WHERE user_id = 1').fetchone()[0] == 5
+
+def test_failed_flush_keeps_items_for_next_flush(manager, monkeypatch):
+    """دفعة فشلت كتابتها لا تضيع، وتُكتب مع التفريغ التالي بسجلاتها وعداداتها"""
+    import contextlib
+    import sqlite3
+    
+    manager.add_user(1, 'user', 'User')
+    for _ in range(3):
+        manager.record_command(1, None, 'ping', 0.01)
+    
+    buffer = manager.write_buffer
+    writer = buffer.pool.writer
+    
+    @contextlib.contextmanager
+    def locked_writer():
+        raise sqlite3.OperationalError('database is locked')
+        yield
+    
+    monkeypatch.setattr(buffer.pool, 'writer', locked_writer)
+    buffer.flush()
+    assert buffer.get_stats()['pending'] == 3
+    assert buffer.get_stats()['failed_flushes'] == 1
+    
+    monkeypatch.setattr(buffer.pool, 'writer', writer)
+    manager.record_command(1, None, 'ping', 0.01)
+    manager.flush_pending()
+    with manager.pool.reader() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM logs').fetchone()[0] == 4
+        assert conn.execute('SELECT total_commands FROM users WHERE user_id = 1').fetchone()[0] == 4
+    assert buffer.get_stats()['pending'] == 0
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+مخزن السلاسل الزمنية لمقاييس النظام
+كل مقياس حلقة ثابتة الحجم من سجلات ثابتة العرض (وقت + قيمة) في ملف معيّن بالذاكرة
+"""
+
+import os
+import mmap
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+
+# ترويسة الملف: التوقيع، الإصدار، السعة، موضع الكتابة التالي، عدد السجلات
+_HEADER = struct.Struct('<4sIIII')
+_HEADER_SIZE = 32
+_MAGIC = b'HNTS'
+_VERSION = 1
+
+# السجل: الوقت بالثواني منذ 1970 (uint32) والقيمة (float32) = 8 بايت
+_RECORD = struct.Struct('<If')
+
+class RingSeries:
+    """حلقة ثابتة السعة لمقياس واحد محفوظة في ملف معيّن بالذاكرة
+    
+    الكتابة تستبدل أقدم سجل عند امتلاء الحلقة، والسجلات مرتبة زمنياً فيكون
+    البحث عن نطاق زمني بحثاً ثنائياً.
+    """
+    
+    def __init__(self, path: str, capacity: int = config.TIMESERIES_CAPACITY):
+        self.path = path
+        size = _HEADER_SIZE + capacity * _RECORD.size
+        exists = os.path.exists(path) and os.path.getsize(path) >= _HEADER_SIZE
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        
+        if exists:
+            magic, version, stored_capacity, head, count = _HEADER.unpack_from(self._file.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f'ملف سلسلة زمنية غير صالح: {path}')
+            capacity = stored_capacity
+            size = _HEADER_SIZE + capacity * _RECORD.size
+        else:
+            head = count = 0
+        
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self.capacity = capacity
+        self._head = head
+        self._count = count
+        self._lock = threading.Lock()
+        self._write_header()
+    
+    def _write_header(self):
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, self.capacity, self._head, self._count)
+    
+    def _record(self, index: int) -> Tuple[int, float]:
+        """السجل رقم index بالترتيب الزمني (0 هو الأقدم)"""
+        slot = (self._head - self._count + index) % self.capacity
+        return _RECORD.unpack_from(self._map, _HEADER_SIZE + slot * _RECORD.size)
+    
+    def append(self, value: float, when: float = None):
+        """إضافة قيمة جديدة (تستبدل الأقدم عند امتلاء الحلقة)"""
+        timestamp = int(when if when is not None else time.time())
+        with self._lock:
+            _RECORD.pack_into(self._map, _HEADER_SIZE + self._head * _RECORD.size, timestamp, value)
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._write_header()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def _bisect(self, timestamp: float) -> int:
+        """أول سجل وقته >= timestamp"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def range(self, start: float = 0, end: float = None) -> List[Tuple[int, float]]:
+        """السجلات التي يقع وقتها في [start, end]"""
+        with self._lock:
+            first = self._bisect(start)
+            last = self._count if end is None else self._bisect(int(end) + 1)
+            return [self._record(i) for i in range(first, last)]
+    
+    def latest(self, count: int = 1) -> List[Tuple[int, float]]:
+        """آخر count سجل بالترتيب الزمني"""
+        with self._lock:
+            return [self._record(i) for i in range(max(0, self._count - count), self._count)]
+    
+    def flush(self):
+        self._map.flush()
+    
+    def close(self):
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+
+def downsample(records: List[Tuple[int, float]], step: int) -> List[Dict]:
+    """تجميع السجلات في فترات طولها step ثانية: المتوسط والأدنى والأعلى والعدد"""
+    buckets = []
+    current = None
+    for timestamp, value in records:
+        bucket_start = timestamp - timestamp % step
+        if current is None or current['time'] != bucket_start:
+            current = {'time': bucket_start, 'avg': 0.0, 'min': value, 'max': value, 'count': 0}
+            buckets.append(current)
+        current['avg'] += value
+        current['min'] = min(current['min'], value)
+        current['max'] = max(current['max'], value)
+        current['count'] += 1
+    for bucket in buckets:
+        bucket['avg'] /= bucket['count']
+    return buckets
+
+class TimeSeriesStore:
+    """مجموعة حلقات المقاييس داخل مجلد واحد، ملف لكل مقياس"""
+    
+    def __init__(self, directory: str = config.METRICS_DIR, capacity: int = config.TIMESERIES_CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self._series = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def series(self, metric: str) -> RingSeries:
+        """حلقة المقياس، تُفتح أو تُنشأ عند أول استخدام"""
+        series = self._series.get(metric)
+        if series is None:
+            with self._lock:
+                series = self._series.get(metric)
+                if series is None:
+                    series = RingSeries(os.path.join(self.directory, f'{metric}.ts'), self.capacity)
+                    self._series[metric] = series
+        return series
+    
+    def append(self, metric: str, value: float, when: float = None):
+        self.series(metric).append(value, when)
+    
+    def append_many(self, values: Dict[str, float], when: float = None):
+        """إضافة عدة مقاييس بالوقت نفسه"""
+        when = time.time() if when is None else when
+        for metric, value in values.items():
+            if value is not None:
+                self.series(metric).append(value, when)
+    
+    def range(self, metric: str, start: float = 0, end: float = None) -> List[Tuple[int, float]]:
+        return self.series(metric).range(start, end)
+    
+    def latest(self, metric: str, count: int = 1) -> List[Tuple[int, float]]:
+        return self.series(metric).latest(count)
+    
+    def downsample(self, metric: str, step: int, start: float = 0, end: float = None) -> List[Dict]:
+        """قيم المقياس في النطاق مجمعة على فترات طولها step ثانية"""
+        return downsample(self.range(metric, start, end), step)
+    
+    def average(self, metric: str, start: float = 0, end: float = None) -> Optional[float]:
+        """متوسط المقياس في النطاق، أو None إن لم توجد قيم"""
+        records = self.range(metric, start, end)
+        return sum(value for _, value in records) / len(records) if records else None
+    
+    def get_stats(self) -> Dict:
+        """عدد السجلات وحجم الملف لكل مقياس"""
+        return {
+            metric: {
+                'records': len(series),
+                'capacity': series.capacity,
+                'file_bytes': _HEADER_SIZE + series.capacity * _RECORD.size,
+            }
+            for metric, series in list(self._series.items())
+        }
+    
+    def close(self):
+        with self._lock:
+            for series in self._series.values():
+                series.close()
+            self._series.clear()
+
+# مخزن مشترك بين نظامي المراقبة
+metrics_store = TimeSeriesStore()
@@ -91,7 +91,7 @@ def logout():
 def dashboard():
     """لوحة التحكم الرئيسية"""
     user = telegram_auth.get_current_user()
-    user_data = db.get_user(user['id'])
+    user_data = db.web.get_user(user['id'])
     stats = load_web_stats()
     
     # إحصائيات المستخدم
@@ -113,7 +113,7 @@ def dashboard():
 def profile():
     """صفحة الملف الشخصي"""
     user = telegram_auth.get_current_user()
-    user_data = db.get_user(user['id'])
+    user_data = db.web.get_user(user['id'])
     
     return render_template('profile.html', user=user, user_data=user_data)
 
@@ -121,7 +121,7 @@ def profile():
 @telegram_auth.require_owner
 def admin():
     """لوحة إدارة البوت (للمالك فقط)"""
-    stats = db.get_stats()
+    stats = db.web.get_stats()
     system_stats = load_web_stats()
     
     return render_template('admin.html', 
@@ -146,7 +146,7 @@ def api_stats():
 def api_user_stats():
     """API لإحصائيات المستخدم"""
     user = telegram_auth.get_current_user()
-    user_data = db.get_user(user['id'])
+    user_data = db.web.get_user(user['id'])
     
     if not user_data:
         return jsonify({'error': 'المستخدم غير موجود'}), 404
@@ -70,11 +70,27 @@ def api_health():
 def api_database():
     """معلومات قاعدة البيانات"""
     try:
-        db_stats = db.get_stats()
+        db_stats = db.web.get_stats()
         return jsonify(db_stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/database/locks')
+def api_database_locks():
+    """أزمنة انتظار الأقفال لاتصالات البوت واتصالات الويب"""
+    try:
+        return jsonify(db.web.get_lock_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/database/metrics')
+def api_database_metrics():
+    """قياسات الزمن وانتظار الأقفال لكل دالة في قاعدة البيانات"""
+    try:
+        return jsonify(db.get_query_metrics())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/logs')
 def api_logs():
     """الحصول على السجلات الأخيرة"""